@@ -19,8 +19,6 @@ import sys
 import os
 import json
 import logging
-import io
-import contextlib
 import asyncio
 import uuid as uuid_mod
 from pathlib import Path
@@ -55,7 +53,7 @@ from database.models import (
     AgentInteraction, Reminder, MedicationLog, DailyTask,
     DoctorRecommendation, CaretakerPatientLink,
     MonitoringCheckIn, MonitoringQuestion, MonitoringResponse,
-    TelemetryLog, DeviceToken, NotificationLog,
+    DeviceToken, NotificationLog,
 )
 # Medical agent imports are deferred inside specific tools to prevent CrewAI startup crashes
 
@@ -446,13 +444,23 @@ async def get_patient_vitals_history(patient_id: str, limit: int = 20) -> str:
 #  CATEGORY 2: AI ANALYSIS & INTELLIGENCE (5 tools)
 # ══════════════════════════════════════════════════════════════════════
 
-def _run_crew_agent_safely(crew_fn):
-    """Helper to run CrewAI operations with stdout/stderr capture."""
-    f_out = io.StringIO()
-    f_err = io.StringIO()
-    with contextlib.redirect_stdout(f_out), contextlib.redirect_stderr(f_err):
-        result = crew_fn()
-    return result
+def _run_crew_agent_safely(crew_fn, run_id: str = None):
+    """
+    Helper to run CrewAI operations with run-scoped stdout/stderr capture.
+
+    Must be called inside the worker thread: the capture lives in a ContextVar,
+    so concurrent tool calls each get their own buffer instead of racing on a
+    process-wide redirect_stdout (which would also corrupt the stdio transport).
+    """
+    from medical_agents.run_capture import capture_run
+
+    run_id = run_id or f"mcp-{uuid_mod.uuid4().hex[:12]}"
+    with capture_run(run_id) as sink:
+        try:
+            return crew_fn()
+        except Exception:
+            logger.error(f"Crew run {run_id} failed. Captured output tail:\n{sink.getvalue()[-2000:]}")
+            raise
 
 
 @mcp.tool()
@@ -508,12 +516,20 @@ async def run_full_analysis(
             f"Reported Symptoms: {initial_symptoms}\n"
         )
 
+        from token_budget import enforce_budget, metered, TokenBudgetExceeded, FEATURE_ANALYSIS
+        try:
+            budget = enforce_budget(db, patient_id, FEATURE_ANALYSIS)
+        except TokenBudgetExceeded as e:
+            return f"❌ {str(e)}"
+
         try:
             from medical_agents.crew import MedicalCrew
-            medical_crew = MedicalCrew(patient_id=str(patient_id))
-            crew_result = await asyncio.to_thread(
-                lambda: _run_crew_agent_safely(lambda: medical_crew.run(formatted_input))
-            )
+            medical_crew = MedicalCrew(patient_id=str(patient_id), degraded=budget.degraded)
+            run_pipeline = medical_crew.run_triage if budget.degraded else medical_crew.run
+            with metered(patient_id, FEATURE_ANALYSIS):
+                crew_result = await asyncio.to_thread(
+                    lambda: _run_crew_agent_safely(lambda: run_pipeline(formatted_input))
+                )
             return json.dumps(crew_result, indent=2, default=str)
         except Exception as e:
             return f"❌ Analysis failed: {str(e)}"
@@ -814,29 +830,22 @@ async def ingest_telemetry(
         if not patient:
             return "❌ Patient not found."
 
-        log = TelemetryLog(
-            patient_id=patient_id,
-            heart_rate=heart_rate,
-            blood_pressure=blood_pressure,
-            spo2=spo2,
-        )
-        db.add(log)
-        db.commit()
-
-        # Check anomalies
-        try:
-            from severity_engine import check_telemetry_anomalies, evaluate_vitals_severity
-            is_anomaly = check_telemetry_anomalies(patient_id, db)
+        # Same path as the HTTP endpoints: insert, rollups, the patient's
+        # anomaly window, and escalation when the anomaly is sustained
+        from telemetry_stream import ingest_readings
+        outcome = ingest_readings(db, [{
+            "patient_id": str(patient.id),
+            "heart_rate": heart_rate,
+            "blood_pressure": blood_pressure,
+            "spo2": spo2,
+        }]).get(str(patient.id), {})
 
-            if is_anomaly:
-                severity = evaluate_vitals_severity(heart_rate, blood_pressure, spo2)
-                return json.dumps({
-                    "status": "alert_triggered",
-                    "severity": severity,
-                    "message": f"⚠️ Sustained anomaly detected for {patient.name}!",
-                })
-        except Exception as e:
-            logger.warning(f"Anomaly check failed: {e}")
+        if outcome.get("alert_triggered"):
+            return json.dumps({
+                "status": "alert_triggered",
+                "severity": outcome["severity"],
+                "message": f"⚠️ Sustained anomaly detected for {patient.name}!",
+            })
 
         return json.dumps({"status": "ok", "alert_triggered": False})
 
@@ -1167,6 +1176,12 @@ async def generate_daily_health_plan(patient_id: str) -> str:
         if existing > 0:
             return "❌ Tasks already generated for today. Use a different date or regenerate via the web UI."
 
+        from token_budget import enforce_budget, metered, TokenBudgetExceeded, FEATURE_PLANNING
+        try:
+            budget = enforce_budget(db, patient_id, FEATURE_PLANNING)
+        except TokenBudgetExceeded as e:
+            return f"❌ {str(e)}"
+
     try:
         from routes.patient_context import build_patient_context
 
@@ -1178,21 +1193,18 @@ async def generate_daily_health_plan(patient_id: str) -> str:
             patient_data_str = json.dumps(context, default=str)
 
         from medical_agents.crew import MedicalCrew
-        crew = MedicalCrew(patient_id=str(patient_id))
-        result = await asyncio.to_thread(
-            lambda: _run_crew_agent_safely(lambda: crew.run_planning_crew(patient_data_str))
-        )
+        crew = MedicalCrew(patient_id=str(patient_id), degraded=budget.degraded)
+        with metered(patient_id, FEATURE_PLANNING):
+            result = await asyncio.to_thread(
+                lambda: _run_crew_agent_safely(lambda: crew.run_planning_crew(patient_data_str))
+            )
 
-        output_str = str(result)
-        try:
-            start = output_str.find("[")
-            end = output_str.rfind("]") + 1
-            if start != -1 and end > 0:
-                json_content = json.loads(output_str[start:end])
-            else:
-                json_content = json.loads(output_str)
-        except Exception as e:
-            return f"❌ AI output parse error: {e}. Raw: {output_str[:200]}..."
+        from medical_agents.output_parsing import parse_list
+        from medical_agents.tasks import DAILY_PLAN_TASK
+        json_content = parse_list(result, DAILY_PLAN_TASK.output_schema, "Task Planner Agent")
+        if not json_content:
+            output_str = str(getattr(result, "raw", result))
+            return f"❌ AI output parse error. Raw: {output_str[:200]}..."
 
         # Save tasks to DB
         with get_db() as db:
@@ -1200,24 +1212,16 @@ async def generate_daily_health_plan(patient_id: str) -> str:
             today = date.today()
 
             for item in json_content:
-                valid_sources = {"AI_GENERATED", "KB_BASELINE", "SMART_REMEDIATION"}
-                source = item.get("source", "AI_GENERATED")
-                source = source if source in valid_sources else "AI_GENERATED"
-
-                valid_priorities = {"LOW", "NORMAL", "HIGH", "CRITICAL"}
-                priority = item.get("priority", "NORMAL")
-                priority = priority if priority in valid_priorities else "NORMAL"
-
                 new_task = DailyTask(
                     id=uuid_mod.uuid4(),
                     patient_id=patient_id,
-                    task_description=item.get("task_description", "Unnamed Task"),
-                    category=item.get("category", "General"),
+                    task_description=item["task_description"],
+                    category=item["category"],
                     scheduled_date=datetime.combine(today, datetime.min.time()),
                     status_patient="PENDING",
                     status_caretaker="PENDING",
-                    source=source,
-                    priority=priority,
+                    source=item["source"],
+                    priority=item["priority"],
                 )
                 db.add(new_task)
                 generated_tasks.append({
@@ -0,0 +1,308 @@
+"""
+Admission Control — load shedding for the LLM-heavy endpoints.
+
+Each LLM feature has its own controller with a concurrency limit and a
+bounded wait queue. A request is admitted, queued with an estimated start
+time, or rejected (429 + Retry-After), based on:
+  - current in-flight runs and queue depth
+  - an EWMA of recent run durations (to estimate when a queued run starts)
+  - limiter headroom: while a provider is rate limiting us (reported by the
+    crews' retry loop), new work on that provider would only sit in backoff,
+    so the queue ETA includes the remaining rate-limit window and long
+    windows shed load. Analysis and planning share the Groq keys; monitoring
+    runs on Gemini and is not throttled by Groq backoffs.
+
+Requests whose vitals evaluate RED (severity_engine) are always admitted,
+even above the concurrency limit.
+
+Settings (env vars, per feature prefix ANALYSIS / PLANNING / MONITORING):
+  ADMISSION_<FEATURE>_CONCURRENCY   runs executing at once
+  ADMISSION_<FEATURE>_QUEUE         runs allowed to wait for a slot
+  ADMISSION_MAX_WAIT_S              longest estimated wait accepted for
+                                    background work, e.g. /analyze (default 600)
+  ADMISSION_SYNC_MAX_WAIT_S         longest wait a synchronous request may block
+                                    in the queue before getting 429 (default 60)
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("admission")
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+ADMISSION_MAX_WAIT_S = int(os.getenv("ADMISSION_MAX_WAIT_S", "600"))
+ADMISSION_SYNC_MAX_WAIT_S = int(os.getenv("ADMISSION_SYNC_MAX_WAIT_S", "60"))
+EWMA_ALPHA = 0.3
+
+ADMITTED = "ADMITTED"
+QUEUED = "QUEUED"
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, feature: str, retry_after: int, reason: str):
+        self.feature = feature
+        self.retry_after = max(int(retry_after), 1)
+        self.reason = reason
+        super().__init__(f"{feature} is at capacity ({reason}). Retry after {self.retry_after}s.")
+
+
+class AdmissionTicket:
+    """Result of an admission decision. Call release() once the run finishes."""
+
+    def __init__(self, controller: "AdmissionController", status: str, critical: bool,
+                 queue_position: int = 0, eta_seconds: float = 0.0):
+        self.controller = controller
+        self.status = status
+        self.critical = critical
+        self.queue_position = queue_position
+        self.eta_seconds = eta_seconds
+        self.estimated_start = datetime.utcnow() + timedelta(seconds=eta_seconds)
+        self._started_at: Optional[float] = None
+        self._released = False
+
+    @property
+    def queued(self) -> bool:
+        return self.status == QUEUED
+
+    def wait_for_slot(self, max_wait_s: Optional[float] = None):
+        """
+        Block until a queued ticket holds a slot (no-op if already admitted).
+        With `max_wait_s`, gives up after that long: the ticket leaves the
+        queue and AdmissionRejected is raised.
+        """
+        if self.status == QUEUED:
+            self.controller._wait_for_slot(self, max_wait_s)
+        self._started_at = time.monotonic()
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        duration = time.monotonic() - self._started_at if self._started_at else None
+        self.controller._release(self, duration)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "critical": self.critical,
+            "queue_position": self.queue_position,
+            "estimated_start": self.estimated_start.isoformat(),
+            "eta_seconds": round(self.eta_seconds, 1),
+        }
+
+
+class AdmissionController:
+    def __init__(self, feature: str, max_concurrent: int, max_queue: int, initial_duration_s: float):
+        self.feature = feature
+        self.max_concurrent = max(max_concurrent, 1)
+        self.max_queue = max(max_queue, 0)
+        self.avg_duration_s = initial_duration_s
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted_total = 0
+        self.rejected_total = 0
+        self.rate_limited_until = 0.0   # time.monotonic() deadline
+        self._cond = threading.Condition()
+
+    # -- signals -------------------------------------------------------------
+
+    def note_rate_limited(self, wait_seconds: float):
+        """A run hit a provider rate limit and is backing off for `wait_seconds`."""
+        with self._cond:
+            self.rate_limited_until = max(self.rate_limited_until, time.monotonic() + wait_seconds)
+
+    def _rate_limit_remaining(self) -> float:
+        return max(self.rate_limited_until - time.monotonic(), 0.0)
+
+    def _eta(self, position: int) -> float:
+        """Seconds until the run at queue `position` (1-based) gets a slot."""
+        waves = math.ceil(position / self.max_concurrent)
+        return self._rate_limit_remaining() + waves * self.avg_duration_s
+
+    # -- decisions -----------------------------------------------------------
+
+    def try_admit(self, critical: bool = False, max_wait_s: int = ADMISSION_MAX_WAIT_S) -> AdmissionTicket:
+        """Admit, queue, or raise AdmissionRejected. Never blocks."""
+        with self._cond:
+            if critical:
+                # Critical vitals bypass limits entirely
+                self.in_flight += 1
+                self.admitted_total += 1
+                return AdmissionTicket(self, ADMITTED, critical=True)
+
+            rate_limit_remaining = self._rate_limit_remaining()
+            if rate_limit_remaining > max_wait_s:
+                self.rejected_total += 1
+                raise AdmissionRejected(self.feature, rate_limit_remaining, "provider rate limited")
+
+            if self.in_flight < self.max_concurrent and self.queued == 0 and rate_limit_remaining == 0:
+                self.in_flight += 1
+                self.admitted_total += 1
+                return AdmissionTicket(self, ADMITTED, critical=False)
+
+            position = self.queued + 1
+            eta = self._eta(position)
+            if self.queued >= self.max_queue or eta > max_wait_s:
+                self.rejected_total += 1
+                raise AdmissionRejected(self.feature, eta, f"{self.in_flight} running, {self.queued} queued")
+
+            self.queued += 1
+            self.admitted_total += 1
+            return AdmissionTicket(self, QUEUED, critical=False, queue_position=position, eta_seconds=eta)
+
+    def _wait_for_slot(self, ticket: AdmissionTicket, max_wait_s: Optional[float] = None):
+        deadline = time.monotonic() + max_wait_s if max_wait_s is not None else None
+        with self._cond:
+            while self.in_flight >= self.max_concurrent or self._rate_limit_remaining() > 0:
+                timeout = max(min(self._rate_limit_remaining(), 5.0), 0.5)
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        # Leave the queue; the ticket is spent, so release() is a no-op
+                        self.queued -= 1
+                        self.rejected_total += 1
+                        ticket._released = True
+                        self._cond.notify_all()
+                        raise AdmissionRejected(
+                            self.feature, self._eta(max(self.queued, 1)),
+                            f"no slot within {max_wait_s:.0f}s",
+                        )
+                    timeout = min(timeout, remaining)
+                self._cond.wait(timeout=timeout)
+            self.queued -= 1
+            self.in_flight += 1
+            ticket.status = ADMITTED
+
+    def _release(self, ticket: AdmissionTicket, duration: Optional[float]):
+        with self._cond:
+            if ticket.status == QUEUED:
+                # Released before it ever got a slot (e.g. request failed early)
+                self.queued -= 1
+            else:
+                self.in_flight -= 1
+            if duration is not None and not ticket.critical:
+                self.avg_duration_s = EWMA_ALPHA * duration + (1 - EWMA_ALPHA) * self.avg_duration_s
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "feature": self.feature,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "avg_duration_s": round(self.avg_duration_s, 1),
+                "rate_limited_for_s": round(self._rate_limit_remaining(), 1),
+                "next_start_eta_s": round(self._eta(self.queued + 1), 1) if self.in_flight >= self.max_concurrent else 0.0,
+                "admitted_total": self.admitted_total,
+                "rejected_total": self.rejected_total,
+            }
+
+
+def _controller(feature: str, concurrency: str, queue: str, initial_duration_s: float) -> AdmissionController:
+    return AdmissionController(
+        feature,
+        max_concurrent=int(os.getenv(f"ADMISSION_{feature}_CONCURRENCY", concurrency)),
+        max_queue=int(os.getenv(f"ADMISSION_{feature}_QUEUE", queue)),
+        initial_duration_s=initial_duration_s,
+    )
+
+
+analysis_admission = _controller("ANALYSIS", "2", "8", 240.0)
+planning_admission = _controller("PLANNING", "2", "4", 60.0)
+monitoring_admission = _controller("MONITORING", "4", "8", 15.0)
+
+CONTROLLERS = {
+    "ANALYSIS": analysis_admission,
+    "PLANNING": planning_admission,
+    "MONITORING": monitoring_admission,
+}
+
+
+# Features that share a provider's rate limits (analysis and planning crews
+# use the same Groq keys; monitoring questions are generated by Gemini)
+PROVIDER_CONTROLLERS = {
+    "groq": (analysis_admission, planning_admission),
+    "gemini": (monitoring_admission,),
+}
+
+
+def note_rate_limited(wait_seconds: float, provider: str = "groq"):
+    """A provider is rate limiting us: back off every feature that runs on it."""
+    for controller in PROVIDER_CONTROLLERS.get(provider, ()):
+        controller.note_rate_limited(wait_seconds)
+
+
+def on_crew_event(event: Dict[str, Any]):
+    """Crew on_event hook: feeds RATE_LIMITED events (Groq crews) into the limiter headroom."""
+    if event.get("status") == "RATE_LIMITED":
+        note_rate_limited(event.get("wait_s", 0))
+
+
+@contextmanager
+def holding(ticket: AdmissionTicket, max_wait_s: Optional[float] = None):
+    """
+    Wait for the ticket's slot (at most `max_wait_s`, if given), hold it for
+    the block, release it afterwards.
+    """
+    try:
+        ticket.wait_for_slot(max_wait_s)
+        yield ticket
+    finally:
+        ticket.release()
+
+
+@contextmanager
+def admitted(controller: AdmissionController, critical: bool = False):
+    """
+    Synchronous endpoints: admit (waiting in the queue if needed) for the
+    duration of the block. Raises AdmissionRejected when shedding load, or
+    when no slot frees up within ADMISSION_SYNC_MAX_WAIT_S.
+    """
+    ticket = controller.try_admit(critical=critical, max_wait_s=ADMISSION_SYNC_MAX_WAIT_S)
+    with holding(ticket, max_wait_s=ADMISSION_SYNC_MAX_WAIT_S):
+        yield ticket
+
+
+# ---------------------------------------------------------------------------
+# Critical-vitals detection
+# ---------------------------------------------------------------------------
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(float(str(value).strip()))
+    except (TypeError, ValueError):
+        return None
+
+
+def vitals_are_critical(heart_rate=None, blood_pressure=None, spo2=None) -> bool:
+    from severity_engine import evaluate_vitals_severity
+    return evaluate_vitals_severity(_to_int(heart_rate), blood_pressure, _to_int(spo2)) == "RED"
+
+
+def patient_is_critical(db, patient_id, within_minutes: int = 30) -> bool:
+    """True if the patient's most recent telemetry or vitals log (within the window) is RED."""
+    from database.models import TelemetryLog, monitoring_logs
+
+    since = datetime.utcnow() - timedelta(minutes=within_minutes)
+    telemetry = db.query(TelemetryLog).filter(
+        TelemetryLog.patient_id == patient_id,
+        TelemetryLog.timestamp >= since,
+    ).order_by(TelemetryLog.timestamp.desc()).first()
+    if telemetry and vitals_are_critical(telemetry.heart_rate, telemetry.blood_pressure, telemetry.spo2):
+        return True
+
+    vitals_log = db.query(monitoring_logs).filter(
+        monitoring_logs.patient_id == patient_id,
+        monitoring_logs.created_at >= since,
+    ).order_by(monitoring_logs.created_at.desc()).first()
+    return bool(vitals_log and vitals_are_critical(vitals_log.heart_rate, vitals_log.blood_pressure))
@@ -0,0 +1,157 @@
+"""
+Alert Deduplication — cooldown windows for telemetry and check-in escalations.
+
+A patient in a sustained anomaly used to raise a new `alerts` row and push
+every caretaker (and the patient) on every reading, i.e. every 30 seconds;
+check-in escalations repeated the same way per submission. Escalations now
+go through alert_deduplicator.should_fire(), keyed by
+(patient, alert class, severity):
+
+  - the first escalation fires and opens a cooldown for that key,
+  - repeats at the same or a lower severity are suppressed until it expires,
+  - a higher severity (ORANGE -> RED) always fires and opens its own cooldown.
+
+The cooldowns are cached in memory, so suppressing a repeat costs no query.
+A key that is not cached, or whose cooldown expired, is claimed in
+alert_suppressions with a conditional upsert. That keeps workers (and
+restarts) from firing the same alert twice. If the table cannot be reached,
+the alert fires (fail open).
+
+should_fire() does not commit: the claim is part of the caller's
+transaction and commits with the alert row. If the alert write fails, the
+rollback undoes the claim too, and the caller calls release() to drop the
+cached cooldown, so the next escalation fires instead of being suppressed
+for a whole cooldown with no alert raised. Until the caller commits, the
+claimed row stays locked, and other workers wait on it instead of firing.
+
+Settings (env vars):
+  ALERT_COOLDOWN_TELEMETRY_SECONDS   (default 900)
+  ALERT_COOLDOWN_MONITORING_SECONDS  (default 3600)
+  ALERT_DEDUP_MAX_KEYS               (patient/class pairs cached, default 100000)
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from database.models import AlertSuppression
+from severity_rules import SEVERITY_ORDER
+
+logger = logging.getLogger("alert_dedup")
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+ALERT_CLASS_TELEMETRY = "TELEMETRY"
+ALERT_CLASS_MONITORING = "MONITORING"
+
+ALERT_COOLDOWNS = {
+    ALERT_CLASS_TELEMETRY: int(os.getenv("ALERT_COOLDOWN_TELEMETRY_SECONDS", "900")),
+    ALERT_CLASS_MONITORING: int(os.getenv("ALERT_COOLDOWN_MONITORING_SECONDS", "3600")),
+}
+ALERT_DEDUP_MAX_KEYS = int(os.getenv("ALERT_DEDUP_MAX_KEYS", "100000"))
+
+
+class AlertDeduplicator:
+    def __init__(self, max_keys: int = ALERT_DEDUP_MAX_KEYS):
+        self.max_keys = max_keys
+        # (patient_id, alert_class) -> {severity: [suppressed_until, suppressed_count]}
+        self._state: "OrderedDict[Tuple[str, str], Dict[str, List]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.fired = 0
+        self.suppressed = 0
+
+    def should_fire(self, db: Session, patient_id, alert_class: str, severity: str) -> bool:
+        """
+        True if this escalation should raise an alert; False while it is in
+        cooldown. The claim is left uncommitted in `db`: commit it together
+        with the alert, or roll back and release() it.
+        """
+        now = datetime.utcnow()
+        key = (str(patient_id), alert_class)
+        with self._lock:
+            state = self._state.get(key)
+            if state is not None:
+                self._state.move_to_end(key)
+                covering = self._covering(state, severity, now)
+                if covering is not None:
+                    state[covering][1] += 1
+                    self.suppressed += 1
+                    return False
+        return self._claim(db, patient_id, alert_class, severity, now)
+
+    @staticmethod
+    def _covering(state: Dict[str, List], severity: str, now: datetime):
+        """The active cooldown at this severity or above, if any."""
+        rank = SEVERITY_ORDER.get(severity, 0)
+        for other, (until, _) in state.items():
+            if SEVERITY_ORDER.get(other, 0) >= rank and until > now:
+                return other
+        return None
+
+    def _claim(self, db: Session, patient_id, alert_class: str, severity: str, now: datetime) -> bool:
+        key = (str(patient_id), alert_class)
+        until = now + timedelta(seconds=ALERT_COOLDOWNS.get(alert_class, 900))
+        with self._lock:
+            previous = self._state.get(key, {}).get(severity)
+        suppressed_count = previous[1] if previous else 0
+
+        try:
+            # Savepoint: a failed lookup must not abort the caller's transaction
+            with db.begin_nested():
+                rows = db.query(AlertSuppression).filter(
+                    AlertSuppression.patient_id == patient_id,
+                    AlertSuppression.alert_class == alert_class,
+                ).all()
+                state = {r.severity: [r.suppressed_until, 0] for r in rows}
+
+                claimed = False
+                if self._covering(state, severity, now) is None:
+                    table = AlertSuppression.__table__
+                    values = {"last_fired_at": now, "suppressed_until": until, "suppressed_count": suppressed_count}
+                    stmt = (
+                        pg_insert(table)
+                        .values(patient_id=patient_id, alert_class=alert_class, severity=severity, **values)
+                        .on_conflict_do_update(
+                            index_elements=["patient_id", "alert_class", "severity"],
+                            set_=values,
+                            where=table.c.suppressed_until <= now,  # another worker may have just fired
+                        )
+                        .returning(table.c.patient_id)
+                    )
+                    claimed = db.execute(stmt).first() is not None
+                    state[severity] = [until, 0]
+        except Exception as e:
+            logger.error(f"Alert dedup lookup failed for {alert_class}/{severity} on patient {patient_id}, firing: {e}")
+            return True
+
+        with self._lock:
+            self._state[key] = state
+            self._state.move_to_end(key)
+            while len(self._state) > self.max_keys:
+                self._state.popitem(last=False)
+            if claimed:
+                self.fired += 1
+            else:
+                self.suppressed += 1
+        return claimed
+
+    def release(self, patient_id, alert_class: str, severity: str):
+        """Forget a claim whose alert was never written (the caller rolled back)."""
+        with self._lock:
+            state = self._state.get((str(patient_id), alert_class))
+            if state is not None and state.pop(severity, None) is not None:
+                self.fired -= 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"keys": len(self._state), "fired": self.fired, "suppressed": self.suppressed}
+
+
+alert_deduplicator = AlertDeduplicator()
@@ -0,0 +1,370 @@
+"""
+Crew Executor — decides where the 5-agent analysis crew runs.
+
+Modes (CREW_EXECUTOR env var):
+  thread   (default) Run MedicalCrew.run in a worker thread of the API process,
+           exactly like the original asyncio.to_thread call.
+  process  Run crews in a pool of worker processes. Each worker pre-imports
+           CrewAI once at startup, receives the formatted patient input and
+           streams stage events back to the API process through a queue.
+           CrewAI's verbose printing, heavy imports and GIL-bound JSON work no
+           longer compete with WebSocket heartbeats and HTTP requests, and a
+           hung run can be killed without touching the API worker.
+
+Other settings:
+  CREW_POOL_SIZE            Worker processes per API worker (default 2). This
+                            is independent of the number of uvicorn workers.
+  CREW_RUN_TIMEOUT          Seconds before a process-mode run is abandoned and
+                            its worker killed (default 1800).
+  CREW_MAX_TASKS_PER_CHILD  Recycle a worker after N runs so memory-heavy
+                            crews cannot grow a worker forever (default 20).
+
+In both modes a run's verbose CrewAI output is captured by
+medical_agents.run_capture into its own log file (CREW_RUN_LOG_DIR/<run_id>.log)
+so concurrent analyses never interleave on the console.
+
+Every run is also instrumented by medical_agents.run_metrics (stage timings,
+retries/backoff, cooldowns, HITL waits, tokens, estimated cost). The metrics
+travel back with the result (or with CrewRunError on failure) and are stored
+as one analysis_run_metrics row per run.
+"""
+
+import os
+import sys
+import queue
+import signal
+import asyncio
+import logging
+import threading
+import multiprocessing
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from admission import on_crew_event
+
+logger = logging.getLogger("crew_executor")
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+CREW_EXECUTOR = os.getenv("CREW_EXECUTOR", "thread").lower()
+CREW_POOL_SIZE = int(os.getenv("CREW_POOL_SIZE", "2"))
+CREW_RUN_TIMEOUT = int(os.getenv("CREW_RUN_TIMEOUT", "1800"))
+CREW_MAX_TASKS_PER_CHILD = int(os.getenv("CREW_MAX_TASKS_PER_CHILD", "20"))
+
+_platform_dir = Path(__file__).resolve().parent
+_shared_dir = _platform_dir.parent / "Shared"
+_ai_agents_dir = _shared_dir / "AI_Agents"
+
+# async callback receiving one event dict per stage transition
+EventCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class CrewRunError(Exception):
+    """A crew run failed; carries whatever metrics were collected before the failure."""
+
+    def __init__(self, message: str, metrics: Optional[Dict[str, Any]] = None):
+        super().__init__(message, metrics)
+        self.message = message
+        self.metrics = metrics or {}
+
+    def __str__(self):
+        return self.message
+
+
+def _output_str(res):
+    """CrewOutput objects do not pickle reliably — ship only their raw text."""
+    if isinstance(res, dict):
+        return res
+    if hasattr(res, "raw"):
+        return res.raw
+    return str(res)
+
+
+# ---------------------------------------------------------------------------
+# Worker-process side
+# ---------------------------------------------------------------------------
+
+def _worker_init():
+    """Pool initializer: mirror main.py's sys.path setup and pre-warm CrewAI."""
+    for path in (_shared_dir, _ai_agents_dir, _platform_dir):
+        if str(path) not in sys.path:
+            sys.path.insert(0, str(path))
+
+    # Ctrl+C / uvicorn reloads are handled by the parent process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    import medical_agents.crew  # noqa: F401 — heavy import paid once per worker
+
+
+def _run_crew_captured(run_id: str, patient_id: str, formatted_input: str, on_event, degraded: bool = False) -> Dict[str, Any]:
+    """
+    Run the crew with its console output routed to the run's own log file and
+    its metrics collected. The result carries them under "metrics".
+    `degraded` (token budget soft limit) runs the 3-stage triage path instead.
+    """
+    from medical_agents.crew import MedicalCrew
+    from medical_agents.run_capture import capture_run
+    from medical_agents.run_metrics import RunMetricsCollector, collecting
+
+    collector = RunMetricsCollector(run_id)
+    with capture_run(run_id, log_to_file=True), collecting(collector):
+        try:
+            medical_crew = MedicalCrew(patient_id=patient_id, degraded=degraded)
+            run_pipeline = medical_crew.run_triage if degraded else medical_crew.run
+            result = dict(run_pipeline(formatted_input, on_event=on_event))
+        except Exception as e:
+            raise CrewRunError(f"{type(e).__name__}: {e}", collector.to_dict()) from None
+
+    result["metrics"] = collector.to_dict()
+    return result
+
+
+def _run_in_worker(run_id: str, patient_id: str, formatted_input: str, events, degraded: bool = False) -> Dict[str, Any]:
+    """Executed inside a pool worker. Stage events go back through `events`."""
+    events.put({"run_id": run_id, "type": "WORKER_STARTED", "pid": os.getpid()})
+
+    def on_event(event):
+        events.put({"run_id": run_id, "type": "STAGE", **event})
+
+    result = _run_crew_captured(run_id, patient_id, formatted_input, on_event, degraded)
+    return {key: _output_str(value) for key, value in result.items()}
+
+
+# ---------------------------------------------------------------------------
+# API-process side
+# ---------------------------------------------------------------------------
+
+def _resolve(future: asyncio.Future, result=None, error: BaseException = None):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class CrewProcessPool:
+    """Pool of pre-warmed worker processes plus a thread pumping their events."""
+
+    def __init__(self, size: int, max_tasks_per_child: int):
+        # "spawn" keeps workers clean of the parent's threads, DB pool and sockets
+        ctx = multiprocessing.get_context("spawn")
+        self._manager = ctx.Manager()
+        self._events = self._manager.Queue()
+        self._pool = ctx.Pool(
+            processes=size,
+            initializer=_worker_init,
+            maxtasksperchild=max_tasks_per_child,
+        )
+        self._lock = threading.Lock()
+        self._listeners: Dict[str, tuple] = {}   # run_id -> (loop, callback)
+        self._worker_pids: Dict[str, int] = {}   # run_id -> pid running it
+        self._stopping = threading.Event()
+        self._pump = threading.Thread(target=self._pump_events, name="crew-event-pump", daemon=True)
+        self._pump.start()
+        logger.info(f"Crew process pool started with {size} workers")
+
+    def _pump_events(self):
+        while not self._stopping.is_set():
+            try:
+                event = self._events.get(timeout=1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+
+            run_id = event.pop("run_id", None)
+            with self._lock:
+                if event.get("type") == "WORKER_STARTED":
+                    self._worker_pids[run_id] = event["pid"]
+                    continue
+                listener = self._listeners.get(run_id)
+
+            if listener:
+                loop, callback = listener
+                asyncio.run_coroutine_threadsafe(callback(event), loop)
+
+    def _kill_worker(self, run_id: str):
+        with self._lock:
+            pid = self._worker_pids.get(run_id)
+        if pid is None:
+            return
+        try:
+            # The pool notices the dead worker and spawns a fresh replacement
+            os.kill(pid, signal.SIGTERM)
+            logger.warning(f"Killed crew worker pid={pid} for run {run_id}")
+        except ProcessLookupError:
+            pass
+
+    async def run(
+        self,
+        run_id: str,
+        patient_id: str,
+        formatted_input: str,
+        on_event: Optional[EventCallback],
+        degraded: bool = False,
+    ) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        with self._lock:
+            if on_event is not None:
+                self._listeners[run_id] = (loop, on_event)
+
+        self._pool.apply_async(
+            _run_in_worker,
+            (run_id, patient_id, formatted_input, self._events, degraded),
+            callback=lambda result: loop.call_soon_threadsafe(_resolve, future, result),
+            error_callback=lambda exc: loop.call_soon_threadsafe(_resolve, future, None, exc),
+        )
+
+        try:
+            return await asyncio.wait_for(future, timeout=CREW_RUN_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._kill_worker(run_id)
+            raise TimeoutError(f"Crew run exceeded {CREW_RUN_TIMEOUT}s and was terminated.")
+        finally:
+            with self._lock:
+                self._listeners.pop(run_id, None)
+                self._worker_pids.pop(run_id, None)
+
+    def shutdown(self):
+        self._stopping.set()
+        self._pool.terminate()
+        self._pool.join()
+        self._manager.shutdown()
+        logger.info("Crew process pool stopped.")
+
+
+_process_pool: Optional[CrewProcessPool] = None
+_pool_lock = threading.Lock()
+
+
+def _get_process_pool() -> CrewProcessPool:
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            _process_pool = CrewProcessPool(CREW_POOL_SIZE, CREW_MAX_TASKS_PER_CHILD)
+        return _process_pool
+
+
+async def _run_in_thread(run_id: str, patient_id: str, formatted_input: str, on_event: Optional[EventCallback], degraded: bool = False):
+    loop = asyncio.get_running_loop()
+
+    def forward_event(event):
+        if on_event is not None:
+            asyncio.run_coroutine_threadsafe(on_event({"type": "STAGE", **event}), loop)
+
+    return await asyncio.to_thread(_run_crew_captured, run_id, patient_id, formatted_input, forward_event, degraded)
+
+
+def _parse_iso(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def save_run_metrics(patient_id: str, run_id: str, metrics: Dict[str, Any], status: str, error: str = None):
+    """
+    Persist one analysis_run_metrics row and meter the run's tokens into the
+    daily budget ledger. Never raises — metrics must not fail a run.
+    """
+    from database.session import SessionLocal
+    from database.models import AnalysisRunMetric
+    from token_budget import record_usage, FEATURE_ANALYSIS
+
+    record_usage(patient_id, FEATURE_ANALYSIS, metrics)
+
+    db = SessionLocal()
+    try:
+        db.add(AnalysisRunMetric(
+            patient_id=patient_id,
+            run_id=run_id,
+            executor=CREW_EXECUTOR,
+            status=status,
+            started_at=_parse_iso(metrics.get("started_at")),
+            finished_at=_parse_iso(metrics.get("finished_at")),
+            total_duration_s=metrics.get("total_duration_s"),
+            stage_timings=metrics.get("stage_timings"),
+            retry_count=metrics.get("retry_count", 0),
+            backoff_seconds=metrics.get("backoff_seconds", 0.0),
+            cooldown_seconds=metrics.get("cooldown_seconds", 0.0),
+            hitl_wait_seconds=metrics.get("hitl_wait_seconds", 0.0),
+            hitl_questions=metrics.get("hitl_questions", 0),
+            token_usage=metrics.get("token_usage"),
+            prompt_tokens=metrics.get("prompt_tokens", 0),
+            completion_tokens=metrics.get("completion_tokens", 0),
+            estimated_cost_usd=metrics.get("estimated_cost_usd", 0.0),
+            error=error[:1000] if error else None,
+        ))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to store metrics for run {run_id}: {e}")
+    finally:
+        db.close()
+
+
+async def run_analysis_crew(
+    patient_id: str,
+    formatted_input: str,
+    on_event: Optional[EventCallback] = None,
+    degraded: bool = False,
+) -> Dict[str, Any]:
+    """
+    Run the analysis crew with the configured executor.
+    Returns {"risk_assessment": ..., "decision_action": ..., "metrics": {...}}.
+    The run's metrics are stored whether it succeeds or fails.
+    `degraded` selects the triage fast path (token budget soft limit).
+    """
+    run_id = f"{'triage' if degraded else 'analysis'}-{patient_id}-{uuid.uuid4().hex[:8]}"
+    logger.info(f"Crew run {run_id} ({CREW_EXECUTOR} mode) — output in {run_id}.log")
+
+    async def dispatch_event(event: Dict[str, Any]):
+        # Rate-limit backoffs feed admission control before reaching the caller
+        on_crew_event(event)
+        if on_event is not None:
+            await on_event(event)
+
+    try:
+        if CREW_EXECUTOR == "process":
+            result = await _get_process_pool().run(run_id, patient_id, formatted_input, dispatch_event, degraded)
+        else:
+            result = await _run_in_thread(run_id, patient_id, formatted_input, dispatch_event, degraded)
+    except CrewRunError as e:
+        await asyncio.to_thread(save_run_metrics, patient_id, run_id, e.metrics, "FAILED", str(e))
+        raise
+    except Exception as e:
+        # Timeouts / dead workers: no metrics made it back, record the failure anyway
+        await asyncio.to_thread(save_run_metrics, patient_id, run_id, {}, "FAILED", f"{type(e).__name__}: {e}")
+        raise
+
+    metrics = result.get("metrics", {})
+    logger.info(
+        f"Crew run {run_id} finished in {metrics.get('total_duration_s')}s — "
+        f"retries={metrics.get('retry_count')}, tokens={metrics.get('prompt_tokens', 0) + metrics.get('completion_tokens', 0)}, "
+        f"est. cost=${metrics.get('estimated_cost_usd')}"
+    )
+    await asyncio.to_thread(save_run_metrics, patient_id, run_id, metrics, "COMPLETED")
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Lifecycle
+# ---------------------------------------------------------------------------
+
+def start_crew_executor():
+    """Pre-start the worker pool so the first analysis doesn't pay the warm-up."""
+    if CREW_EXECUTOR == "process":
+        _get_process_pool()
+    else:
+        logger.info("Crew executor running in thread mode.")
+
+
+def stop_crew_executor():
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown()
+            _process_pool = None
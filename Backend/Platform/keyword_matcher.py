@@ -0,0 +1,65 @@
+"""
+Keyword Matcher — one compiled pass for many keyword lists.
+
+The severity rules and condition-tag detection each lower-cased the text and
+looped `kw in text` over several Python lists. KeywordMatcher compiles every
+list into one case-insensitive alternation (longest keyword first) anchored
+at a word start, so a single scan reports every category hit along with the
+keywords that caused it (rule hits become explainable).
+
+The alternation sits inside a lookahead, so matches may overlap ("congestive
+heart failure" hits both "congestive heart" and "heart failure"). At one
+start position the regex only reports the longest keyword; a prefix-hit
+table credits the shorter keywords it begins with ("chest pain" also counts
+as "chest" if both are listed).
+
+Keywords must start at a word boundary but may end mid-word, so inflections
+still match ("palpitation" hits "palpitations"; "cuts" no longer hits
+"haircuts").
+"""
+
+import re
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class KeywordMatcher:
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        # keyword -> categories it belongs to
+        owners: Dict[str, List[str]] = {}
+        for category, keywords in groups.items():
+            for kw in keywords:
+                kw = kw.strip().lower()
+                if kw and category not in owners.setdefault(kw, []):
+                    owners[kw].append(category)
+
+        # Prefix-hit table: matched keyword -> every (category, keyword) it implies
+        self._hits: Dict[str, List[Tuple[str, str]]] = {}
+        for kw in owners:
+            self._hits[kw] = [
+                (category, other)
+                for other, categories in owners.items()
+                if kw.startswith(other)
+                for category in categories
+            ]
+
+        self.categories = list(groups)
+        if owners:
+            alternation = "|".join(re.escape(kw) for kw in sorted(owners, key=len, reverse=True))
+            self._pattern = re.compile(rf"(?<!\w)(?=({alternation}))", re.IGNORECASE)
+        else:
+            self._pattern = None
+
+    def scan(self, text: str) -> Dict[str, List[str]]:
+        """{category: [keywords hit, in order of appearance]} for every category hit in `text`."""
+        found: Dict[str, List[str]] = {}
+        if not text or self._pattern is None:
+            return found
+        for match in self._pattern.finditer(text):
+            for category, kw in self._hits[match.group(1).lower()]:
+                keywords = found.setdefault(category, [])
+                if kw not in keywords:
+                    keywords.append(kw)
+        return found
+
+    def hit_categories(self, text: str) -> Set[str]:
+        return set(self.scan(text))
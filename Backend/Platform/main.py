@@ -1,7 +1,7 @@
 import json
 import logging
 from typing import Optional, Dict, Any, List
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect, status
+from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
@@ -32,7 +32,6 @@ print(f"DEBUG: sys.path[1]: {sys.path[1]}")
 # Database imports
 from database.session import engine, Base, get_db, SessionLocal
 from database.models import Patient, monitoring_logs, ai_assesments, alerts, AgentInteraction, User, UserRole
-from medical_agents.crew import MedicalCrew
 
 # Auth imports
 from auth.dependencies import get_current_active_user, require_roles
@@ -49,6 +48,7 @@ from routes.medications import router as medications_router
 from routes.tasks import router as tasks_router
 from routes.health_summary import router as health_summary_router
 from routes.monitoring import router as monitoring_router
+from routes.admin import router as admin_router
 from notifications.router import router as notifications_router
 import requests
 
@@ -63,6 +63,8 @@ with engine.connect() as conn:
     migrations = [
         "ALTER TABLE daily_tasks ADD COLUMN IF NOT EXISTS source VARCHAR DEFAULT 'AI_GENERATED'",
         "ALTER TABLE daily_tasks ADD COLUMN IF NOT EXISTS priority VARCHAR DEFAULT 'NORMAL'",
+        "ALTER TABLE monitoring_responses ADD COLUMN IF NOT EXISTS severity_rule_version VARCHAR",
+        "CREATE INDEX IF NOT EXISTS ix_telemetry_logs_patient_id_timestamp ON telemetry_logs (patient_id, timestamp)",
     ]
     for sql in migrations:
         try:
@@ -116,18 +118,36 @@ app.include_router(medications_router)
 app.include_router(tasks_router)
 app.include_router(health_summary_router)
 app.include_router(monitoring_router)
+app.include_router(admin_router)
 app.include_router(notifications_router)
 
-# --- Scheduler Lifecycle ---
-from scheduler import start_scheduler, stop_scheduler
+# --- Scheduler & Crew Executor Lifecycle ---
+from scheduler_leader import start_scheduler_election, stop_scheduler_election
+from crew_executor import start_crew_executor, stop_crew_executor, run_analysis_crew
+from token_budget import enforce_budget, TokenBudgetExceeded, FEATURE_ANALYSIS
+from admission import analysis_admission, AdmissionRejected, vitals_are_critical
+from plan_jobs import start_plan_jobs, stop_plan_jobs
+from telemetry_gateway import serve_gateway
+from telemetry_partitions import ensure_partitions
 
 @app.on_event("startup")
 def on_startup():
-    start_scheduler()
+    # Every instance, before the first insert: today's telemetry partition must exist
+    ensure_partitions()
+    start_scheduler_election()
+    start_crew_executor()
+    start_plan_jobs()
+
+@app.on_event("startup")
+async def bind_websocket_loop():
+    # Plan jobs publish from worker threads via manager.broadcast_threadsafe
+    manager.bind_loop(asyncio.get_running_loop())
 
 @app.on_event("shutdown")
 def on_shutdown():
-    stop_scheduler()
+    stop_scheduler_election()
+    stop_crew_executor()
+    stop_plan_jobs()
 
 # Setup Logging
 logging.basicConfig(
@@ -186,6 +206,9 @@ class AnalysisInitResponse(BaseModel):
     message: str
     patient_id: str
     status_endpoint: str
+    # Set when admission control queued the run (HTTP 202)
+    queue_position: Optional[int] = None
+    estimated_start: Optional[datetime] = None
 
 class InteractionResponse(BaseModel):
     interaction_id: str
@@ -203,69 +226,35 @@ class StatusResponse(BaseModel):
 class AnswerRequest(BaseModel):
     answer: str
 
-# --- Helper Functions ---
-
-import re
-
-import json_repair
-
-def clean_json_string(json_str: Any) -> Dict[str, Any]:
-    """
-    Cleans markdown code blocks and handles mixed text/JSON content
-    using the robust json_repair library.
-    """
-    # If already a dict, return it
-    if isinstance(json_str, dict):
-        return json_str
-
-    if hasattr(json_str, 'raw'):
-        json_str = json_str.raw
-        
-    # Ensure it's a string
-    json_str = str(json_str)
-    
-    # Remove markdown code blocks if present
-    # json_repair handles this well usually, but stripping explicitly is safer
-    if "```json" in json_str:
-        json_str = json_str.split("```json")[1].split("```")[0]
-    elif "```" in json_str:
-        json_str = json_str.split("```")[1].split("```")[0]
-    
-    json_str = json_str.strip()
-
-    try:
-        # json_repair.loads handles:
-        # - Unescaped newlines in strings
-        # - Missing closing braces/quotes
-        # - Trailing commas
-        # - Single quotes
-        decoded = json_repair.loads(json_str)
-        if isinstance(decoded, dict):
-            return decoded
-        # Sometimes it returns a string if it couldn't find an object
-        logger.warning(f"json_repair returned type {type(decoded)} instead of dict: {decoded}")
-        return {}
-        
-    except Exception as e:
-        logger.error(f"json_repair failed: {e}. Input preview: {json_str[:100]}...")
-        return {}
+# --- Crew Output Parsing ---
+from medical_agents.output_parsing import parse_object
+from medical_agents.tasks import RISK_ASSESSMENT_TASK, DECISION_ACTION_TASK
 
 # --- WebSocket Manager ---
 from websocket_manager import manager
 import asyncio
 
-async def run_crew_background(crew_input: dict, patient_id_str: str):
+async def run_crew_background(crew_input: dict, patient_id_str: str, degraded: bool = False, ticket=None):
     """
     Background task to run the crew and save results.
+    `degraded` runs the triage fast path (token budget soft limit reached).
+    `ticket` is the admission-control ticket; a queued run waits for its slot.
     """
     db = SessionLocal()
     try:
+        if ticket is not None and ticket.queued:
+            await manager.broadcast({
+                "status": "QUEUED",
+                "message": f"Analysis queued (position {ticket.queue_position}), estimated start {ticket.estimated_start.strftime('%H:%M:%S')} UTC",
+                "estimated_start": ticket.estimated_start.isoformat(),
+            }, patient_id_str)
+            await asyncio.to_thread(ticket.wait_for_slot)
+        elif ticket is not None:
+            ticket.wait_for_slot()
+
         logger.info(f"Starting background analysis for patient {patient_id_str}")
         await manager.broadcast({"status": "RUNNING", "message": "Starting analysis..."}, patient_id_str)
         
-        # Instantiate Crew with patient_id for Tool usage
-        medical_crew = MedicalCrew(patient_id=patient_id_str)
-        
         # --- NEW: Fetch Medication History (Last 3 days) ---
         from database.models import MedicationLog, DailyTask, CaretakerPatientLink
         from notifications.service import NotificationService
@@ -396,10 +385,25 @@ async def run_crew_background(crew_input: dict, patient_id_str: str):
         
         logger.info(f"--- CREW INPUT START ---\n{formatted_input}\n--- CREW INPUT END ---")
         
-        # NOTE: Run in separate thread to avoid blocking main event loop (WebSocket heartbeats)
+        # NOTE: Runs in a worker thread or worker process (CREW_EXECUTOR) so the
+        # main event loop (WebSocket heartbeats) is never blocked by the crew
         await manager.broadcast({"status": "RUNNING", "message": "AI Agents analyzing vitals..."}, patient_id_str)
-        
-        crew_result = await asyncio.to_thread(medical_crew.run, formatted_input)
+
+        async def on_stage_event(event: dict):
+            if event.get("status") == "RATE_LIMITED":
+                await manager.broadcast({
+                    "status": "RUNNING",
+                    "message": f"{event['stage']}: AI provider busy, retrying in {event['wait_s']:.0f}s...",
+                    "stage": event["stage"],
+                }, patient_id_str)
+            elif event.get("status") == "STARTED":
+                await manager.broadcast({
+                    "status": "RUNNING",
+                    "message": f"[{event['index']}/{event['total']}] {event['stage']} in progress...",
+                    "stage": event["stage"],
+                }, patient_id_str)
+
+        crew_result = await run_analysis_crew(patient_id_str, formatted_input, on_event=on_stage_event, degraded=degraded)
         
         await manager.broadcast({"status": "RUNNING", "message": "Processing results..."}, patient_id_str)
         
@@ -413,19 +417,15 @@ async def run_crew_background(crew_input: dict, patient_id_str: str):
         logger.info(f"Raw Risk Output: {raw_risk}")
         logger.info(f"Raw Decision Output: {raw_decision}")
         
-        risk_output = clean_json_string(raw_risk)
-        decision_output = clean_json_string(raw_decision)
+        # Strict parse + schema coercion (risk_score -> int, doctor_note -> str, ...)
+        risk_output = parse_object(raw_risk, RISK_ASSESSMENT_TASK.output_schema, "Risk Assessment Agent")
+        decision_output = parse_object(raw_decision, DECISION_ACTION_TASK.output_schema, "Decision & Action Agent")
         
         logger.info(f"Parsed Risk Output: {risk_output}")
 
         # Extract fields
         risk_level = risk_output.get("risk_level", "UNKNOWN")
-        risk_score = risk_output.get("risk_score", 0) 
-        if not isinstance(risk_score, int):
-            try:
-                risk_score = int(risk_score)
-            except:
-                risk_score = 0
+        risk_score = risk_output.get("risk_score", 0)
                 
         reasoning = risk_output
         
@@ -443,10 +443,6 @@ async def run_crew_background(crew_input: dict, patient_id_str: str):
         doctor_note = decision_output.get("doctor_note", "No specific note provided.")
         urgency = decision_output.get("urgency", "Normal")
 
-        # Ensure doctor_note is a string for DB
-        if isinstance(doctor_note, dict) or isinstance(doctor_note, list):
-            doctor_note = json.dumps(doctor_note)
-
         
         is_critical = risk_level in ["HIGH", "CRITICAL"] or risk_score >= 80
 
@@ -501,6 +497,8 @@ async def run_crew_background(crew_input: dict, patient_id_str: str):
         logger.error(f"Background task failed for {patient_id_str}: {e}")
         await manager.broadcast({"status": "FAILED", "error": str(e)}, patient_id_str)
     finally:
+        if ticket is not None:
+            ticket.release()
         db.close()
 
 class EscalateRequest(BaseModel):
@@ -638,41 +636,8 @@ def escalate_to_doctor(
 
 
 # --- Condition Tag Auto-Detection ---
-
-# Maps keywords found in known_conditions/symptoms text → standardized condition_tags
-_CONDITION_KEYWORD_MAP = {
-    "HYPERTENSION": [
-        "hypertension", "high bp", "high blood pressure", "elevated bp",
-        "htn", "bp high",
-    ],
-    "DIABETES_TYPE_2": [
-        "diabetes", "diabetic", "type 2", "type ii", "blood sugar",
-        "insulin", "metformin", "hyperglycemia",
-    ],
-    "POST_SURGERY": [
-        "surgery", "post-surgery", "post surgery", "operation",
-        "surgical", "post-op", "postop",
-    ],
-    "HEART_FAILURE": [
-        "heart failure", "chf", "congestive heart", "cardiac failure",
-        "cardiomyopathy", "ejection fraction",
-    ],
-    "COPD": [
-        "copd", "chronic obstructive", "emphysema", "chronic bronchitis",
-    ],
-    "HEART_ATTACK_RECOVERY": [
-        "heart attack", "myocardial infarction", "mi recovery",
-        "cardiac arrest", "stemi", "nstemi",
-    ],
-    "CARDIAC_ARRHYTHMIA": [
-        "arrhythmia", "atrial fibrillation", "afib", "a-fib",
-        "irregular heartbeat", "palpitation",
-    ],
-    "GENERAL_CARDIAC": [
-        "cardiac", "heart disease", "coronary", "angina",
-        "chest pain", "heart problem",
-    ],
-}
+# Keyword lists live in severity_engine.CONDITION_KEYWORD_MAP (compiled matcher)
+from severity_engine import detect_condition_tags
 
 
 def _detect_condition_tags(known_conditions: str, symptoms: str) -> list:
@@ -680,12 +645,7 @@ def _detect_condition_tags(known_conditions: str, symptoms: str) -> list:
     Scan known_conditions and symptoms text for keywords and return
     matching standardized condition tags.
     """
-    combined = f"{known_conditions} {symptoms}".lower()
-    tags = []
-    for tag, keywords in _CONDITION_KEYWORD_MAP.items():
-        if any(kw in combined for kw in keywords):
-            tags.append(tag)
-    return tags
+    return detect_condition_tags(f"{known_conditions}\n{symptoms}")
 
 
 # --- Routes ---
@@ -694,13 +654,19 @@ def _detect_condition_tags(known_conditions: str, symptoms: str) -> list:
 def analyze_patient(
     request: PatientRequest,
     background_tasks: BackgroundTasks,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_roles([UserRole.ADMIN, UserRole.NURSE, UserRole.DOCTOR, UserRole.PATIENT]))
 ):
     """
     Ingest patient data and start AI analysis in background.
     Requires authentication: ADMIN, NURSE, or DOCTOR role.
+
+    Admission control: 200 when the run starts now, 202 with an estimated
+    start when it is queued, 429 + Retry-After when shedding load. Requests
+    with RED vitals are always admitted.
     """
+    ticket = None
     try:
         logger.info(f"Received analysis request for patient: {request.name}")
 
@@ -755,6 +721,20 @@ def analyze_patient(
             patient.updated_at = datetime.utcnow()
             db.commit()
 
+        # 1.2. Token budget: hard limit rejects, soft limit runs the triage fast path
+        try:
+            budget = enforce_budget(db, patient.id, FEATURE_ANALYSIS)
+        except TokenBudgetExceeded as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+        # 1.3. Admission control (before anything is written for this run)
+        try:
+            ticket = analysis_admission.try_admit(
+                critical=vitals_are_critical(request.heart_rate, request.blood_pressure),
+            )
+        except AdmissionRejected as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
         # 1.5. CLEANUP: Invalidate any stuck/pending interactions from previous runs
         stuck_interactions = db.query(AgentInteraction).filter(
             AgentInteraction.patient_id == patient.id,
@@ -838,15 +818,26 @@ def analyze_patient(
         }
 
         # 4. Start Background Task
-        background_tasks.add_task(run_crew_background, crew_input, str(patient.id))
+        background_tasks.add_task(run_crew_background, crew_input, str(patient.id), budget.degraded, ticket)
+
+        message = "Triage analysis started in background (token budget soft limit reached)." if budget.degraded else "Analysis started in background."
+        if ticket.queued:
+            response.status_code = status.HTTP_202_ACCEPTED
+            message = f"Analysis queued at position {ticket.queue_position}."
 
         return AnalysisInitResponse(
-            message="Analysis started in background.",
+            message=message,
             patient_id=str(patient.id),
-            status_endpoint=f"/api/v1/status/{patient.id}"
+            status_endpoint=f"/api/v1/status/{patient.id}",
+            queue_position=ticket.queue_position if ticket.queued else None,
+            estimated_start=ticket.estimated_start if ticket.queued else None,
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
+        if ticket is not None:
+            ticket.release()
         logger.error(f"Error starting analysis: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -970,6 +961,11 @@ def provide_answer(
 
     return {"message": "Answer recorded. Agent will resume shortly."}
 
+@app.websocket("/ws/telemetry/gateway")
+async def telemetry_gateway_endpoint(websocket: WebSocket):
+    """Long-lived telemetry channel for device gateways (see telemetry_gateway.py for the protocol)."""
+    await serve_gateway(websocket)
+
 @app.websocket("/ws/{patient_id}")
 async def websocket_endpoint(websocket: WebSocket, patient_id: str, db: Session = Depends(get_db)):
     # 1. Auth via Token (Query Param)
@@ -0,0 +1,120 @@
+"""
+Plan Fingerprint — the canonical planning context that plan_reuse hashes.
+
+build_patient_context is reduced to the parts that change what the planner
+would produce. Numbers are bucketed at the thresholds the planner's rules
+actually branch on (compliance < 50%, adherence < 80%, risk level, ...),
+day-specific noise (dates in anomaly strings, exact scores) is dropped, and
+lists and free-text clinical fields become sorted, lower-cased term sets.
+
+Pure functions with no database imports, so plan_reuse, the task routes and
+the tests can all hash a context directly.
+"""
+
+import re
+import json
+import hashlib
+from typing import Any, Dict, List, Optional
+
+# Bucket edges follow the planner prompt's rules (tasks.py DAILY_PLAN_TASK)
+COMPLIANCE_EDGES = (50, 80)
+ADHERENCE_EDGES = (80,)
+SCORE_EDGES = (20, 40, 60, 80)
+AGE_EDGES = (40, 60, 75)
+
+
+def _bucket(value, edges) -> Optional[int]:
+    """Index of the bucket `value` falls in (None stays None)."""
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return sum(1 for edge in edges if value >= edge)
+
+
+def _names(items) -> List[str]:
+    """Order-insensitive, case-insensitive list of strings (dict items reduced to their name)."""
+    names = []
+    for item in items or []:
+        if isinstance(item, dict):
+            item = item.get("name") or item.get("medicine_name") or item.get("task") or json.dumps(item, sort_keys=True)
+        names.append(str(item).strip().lower())
+    return sorted(set(names))
+
+
+def _clinical_terms(value, key: str) -> List[str]:
+    """
+    Normalized, order-insensitive terms of a free-text clinical field.
+
+    Patient.known_conditions / reported_symptoms / current_medications are
+    stored as {"known_conditions": "..."}, {"initial_symptoms": "..."} and
+    {"medications": "..."}; the text under `key` (or a plain string / list)
+    is split on commas, semicolons and newlines.
+    """
+    if isinstance(value, dict):
+        value = value.get(key)
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        value = "\n".join(str(v) for v in value)
+    terms = re.split(r"[,;\n]+", str(value))
+    return sorted({" ".join(term.lower().split()) for term in terms if term.strip()})
+
+
+def planning_fingerprint(context: Dict[str, Any]) -> Dict[str, Any]:
+    """The parts of build_patient_context that change what the planner would produce."""
+    profile = context.get("profile") or {}
+    compliance = context.get("compliance") or {}
+    adherence = context.get("medication_adherence") or {}
+    vitals = context.get("vitals_summary") or {}
+    risk = context.get("risk") or {}
+    health = context.get("health_score") or {}
+    signals = context.get("monitoring_signals") or {}
+
+    return {
+        "profile": {
+            "age": _bucket(profile.get("age"), AGE_EDGES),
+            "gender": str(profile.get("gender") or "").lower(),
+            "known_conditions": _clinical_terms(profile.get("known_conditions"), "known_conditions"),
+            "condition_tags": _names(profile.get("condition_tags")),
+            "current_medications": _clinical_terms(profile.get("current_medications"), "medications"),
+            "reported_symptoms": _clinical_terms(profile.get("reported_symptoms"), "initial_symptoms"),
+        },
+        "compliance": {
+            "overall": _bucket(compliance.get("overall_7d_rate"), COMPLIANCE_EDGES),
+            "by_category": {
+                category: _bucket(stats.get("completion_rate"), COMPLIANCE_EDGES)
+                for category, stats in (compliance.get("by_category") or {}).items()
+            },
+        },
+        "repeatedly_skipped_tasks": _names(context.get("repeatedly_skipped_tasks")),
+        "medication_adherence": {
+            "rate": _bucket(adherence.get("rate_7d"), ADHERENCE_EDGES),
+            "missed": _names(adherence.get("missed_medications")),
+        },
+        # "BP 150/95 on 03/14" -> "bp": which vitals are off, not when
+        "anomaly_kinds": sorted({str(a).split(" ")[0].lower() for a in vitals.get("anomalies") or []}),
+        "risk": {
+            "level": risk.get("level"),
+            "score": _bucket(risk.get("score"), SCORE_EDGES),
+            "trend": risk.get("trend"),
+        },
+        "active_alerts": _names(a.get("type") if isinstance(a, dict) else a for a in context.get("active_alerts") or []),
+        "health_score": {
+            "score": _bucket(health.get("score"), SCORE_EDGES),
+            "trend": health.get("trend"),
+        },
+        "recent_recommendations": _names(context.get("recent_recommendations")),
+        "monitoring": {
+            "red_flags": bool(signals.get("red_flag_count_7d")),
+            "orange_flags": bool(signals.get("orange_flag_count_7d")),
+            "trend": signals.get("trend"),
+        },
+    }
+
+
+def context_hash(context: Dict[str, Any]) -> str:
+    canonical = json.dumps(planning_fingerprint(context), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
@@ -0,0 +1,211 @@
+"""
+Plan Generation Jobs — daily-plan generation off the request threads.
+
+A planning crew run can take minutes (retry backoff included). Run inside a
+sync endpoint it pins one of anyio's threadpool workers for that long, so a
+few concurrent users stall unrelated endpoints. The generate/regenerate
+routes therefore only do the cheap parts inline (precomputed, reused or
+KB-only plans return 200 immediately) and otherwise enqueue a job here and
+answer 202 with its id.
+
+Jobs are idempotent per patient per day: plan_generation_jobs has one row
+per (patient, day); while it is QUEUED or RUNNING every further request gets
+the same job back. A finished row is re-queued by the next regenerate (or a
+retry after FAILED). Active rows older than PLAN_JOB_STALE_MINUTES (process
+died mid-run) count as finished.
+
+Progress is pushed to the patient's WebSocket as
+    {"type": "PLAN_JOB", "job": {...}}
+and can be polled at GET /api/v1/tasks/jobs/{job_id}.
+
+Settings (env vars):
+  PLAN_JOB_WORKERS          jobs executing at once in this process (default 2)
+  PLAN_JOB_STALE_MINUTES    (default 30)
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from database.session import SessionLocal
+from database.models import PlanGenerationJob
+from admission import AdmissionTicket, holding
+from plan_fingerprint import context_hash
+from task_planner import ai_tasks_for_day, build_planning_input, run_planner, save_plan
+from websocket_manager import manager
+
+logger = logging.getLogger("plan_jobs")
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+PLAN_JOB_WORKERS = int(os.getenv("PLAN_JOB_WORKERS", "2"))
+PLAN_JOB_STALE_MINUTES = int(os.getenv("PLAN_JOB_STALE_MINUTES", "30"))
+
+JOB_QUEUED = "QUEUED"
+JOB_RUNNING = "RUNNING"
+JOB_COMPLETED = "COMPLETED"
+JOB_FAILED = "FAILED"
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+KIND_GENERATE = "GENERATE"
+KIND_REGENERATE = "REGENERATE"
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def job_to_dict(job: PlanGenerationJob) -> Dict[str, Any]:
+    return {
+        "job_id": str(job.id),
+        "patient_id": str(job.patient_id),
+        "plan_date": job.plan_date.isoformat(),
+        "kind": job.kind,
+        "status": job.status,
+        "task_count": job.task_count,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "poll_url": f"/api/v1/tasks/jobs/{job.id}",
+    }
+
+
+def _is_active(job: PlanGenerationJob) -> bool:
+    if job.status not in ACTIVE_STATUSES:
+        return False
+    since = job.started_at or job.created_at
+    return since is not None and since >= datetime.utcnow() - timedelta(minutes=PLAN_JOB_STALE_MINUTES)
+
+
+# ---------------------------------------------------------------------------
+# Enqueueing
+# ---------------------------------------------------------------------------
+
+def active_job(db: Session, patient_id, day: date = None) -> Optional[PlanGenerationJob]:
+    """The patient's queued or running job for `day`, if any."""
+    job = db.query(PlanGenerationJob).filter(
+        PlanGenerationJob.patient_id == patient_id,
+        PlanGenerationJob.plan_date == (day or datetime.utcnow().date()),
+    ).first()
+    return job if job and _is_active(job) else None
+
+
+def claim_job(db: Session, patient_id, kind: str, requested_by=None, day: date = None) -> Tuple[PlanGenerationJob, bool]:
+    """
+    Queue the patient's job for `day`. Returns (job, created); created is False
+    when another request already has an active job, which is returned instead.
+    """
+    day = day or datetime.utcnow().date()
+    db.execute(
+        pg_insert(PlanGenerationJob.__table__)
+        .values(patient_id=patient_id, plan_date=day, kind=kind, status=JOB_FAILED, created_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["patient_id", "plan_date"])
+    )
+    job = db.query(PlanGenerationJob).filter(
+        PlanGenerationJob.patient_id == patient_id,
+        PlanGenerationJob.plan_date == day,
+    ).with_for_update().one()
+
+    if _is_active(job):
+        db.commit()
+        return job, False
+
+    job.kind = kind
+    job.status = JOB_QUEUED
+    job.requested_by = requested_by
+    job.task_count = None
+    job.error = None
+    job.created_at = datetime.utcnow()
+    job.started_at = None
+    job.finished_at = None
+    db.commit()
+    db.refresh(job)
+    return job, True
+
+
+def submit_job(job: PlanGenerationJob, degraded: bool, ticket: AdmissionTicket):
+    """Run a claimed job on the plan-job pool; it holds `ticket` while the crew runs."""
+    _get_executor().submit(_run_job, job.id, job.patient_id, job.kind, degraded, ticket)
+
+
+# ---------------------------------------------------------------------------
+# Execution
+# ---------------------------------------------------------------------------
+
+def _publish(job: PlanGenerationJob):
+    manager.broadcast_threadsafe({"type": "PLAN_JOB", "job": job_to_dict(job)}, str(job.patient_id))
+
+
+def _run_job(job_id, patient_id, kind: str, degraded: bool, ticket: AdmissionTicket):
+    db = SessionLocal()
+    job = None
+    try:
+        job = db.query(PlanGenerationJob).filter(PlanGenerationJob.id == job_id).one()
+        with holding(ticket):
+            job.status = JOB_RUNNING
+            job.started_at = datetime.utcnow()
+            db.commit()
+            _publish(job)
+
+            if kind == KIND_REGENERATE:
+                # Delete today's AI-generated tasks (keep MANUAL ones)
+                ai_tasks_for_day(db, patient_id).delete(synchronize_session="fetch")
+                db.commit()
+
+            context = build_planning_input(db, patient_id)
+            if "error" in context:
+                raise ValueError(context["error"])
+            items = run_planner(patient_id, context, degraded=degraded)
+
+        tasks = save_plan(db, patient_id, items, plan_hash=context_hash(context))
+        job.status = JOB_COMPLETED
+        job.task_count = len(tasks)
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        logger.info(f"Plan job {job_id} completed: {len(tasks)} tasks for patient {patient_id}")
+    except Exception as e:
+        logger.error(f"Plan job {job_id} failed for patient {patient_id}: {e}")
+        db.rollback()
+        ticket.release()
+        if job is not None:
+            job.status = JOB_FAILED
+            job.error = str(e)[:500]
+            job.finished_at = datetime.utcnow()
+            db.commit()
+    finally:
+        if job is not None:
+            _publish(job)
+        db.close()
+
+
+# ---------------------------------------------------------------------------
+# Lifecycle
+# ---------------------------------------------------------------------------
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(PLAN_JOB_WORKERS, 1), thread_name_prefix="plan-job")
+        return _executor
+
+
+def start_plan_jobs():
+    _get_executor()
+    logger.info(f"✅ Plan job pool started ({PLAN_JOB_WORKERS} workers)")
+
+
+def stop_plan_jobs():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+            logger.info("🛑 Plan job pool stopped.")
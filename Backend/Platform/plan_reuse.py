@@ -0,0 +1,86 @@
+"""
+Plan Reuse — skip the planning crew when a patient's context hasn't shifted.
+
+build_patient_context is reduced to a canonical fingerprint (see
+plan_fingerprint). Its SHA-256 is stored with every plan in `daily_plans`.
+
+When today's hash equals the hash of a plan from the last
+PLAN_REUSE_LOOKBACK_DAYS days whose tasks the patient actually completed
+(>= PLAN_REUSE_MIN_COMPLIANCE percent), that plan is cloned for today.
+
+Settings (env vars):
+  PLAN_REUSE_LOOKBACK_DAYS    (default 7)
+  PLAN_REUSE_MIN_COMPLIANCE   percent of the plan's tasks completed (default 60)
+"""
+
+import os
+import logging
+from datetime import datetime, date, timedelta
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from database.models import DailyPlan
+
+logger = logging.getLogger("plan_reuse")
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+PLAN_REUSE_LOOKBACK_DAYS = int(os.getenv("PLAN_REUSE_LOOKBACK_DAYS", "7"))
+PLAN_REUSE_MIN_COMPLIANCE = int(os.getenv("PLAN_REUSE_MIN_COMPLIANCE", "60"))
+
+PLAN_SOURCE_PLANNER = "PLANNER"
+PLAN_SOURCE_REUSED = "REUSED"
+
+
+# ---------------------------------------------------------------------------
+# Lookup / recording
+# ---------------------------------------------------------------------------
+
+def plan_compliance(db: Session, plan: DailyPlan) -> Optional[float]:
+    """Percent of the plan's AI tasks the patient completed on its day (None if none were scheduled)."""
+    from task_planner import ai_tasks_for_day
+
+    tasks = ai_tasks_for_day(db, plan.patient_id, plan.plan_date).all()
+    if not tasks:
+        return None
+    completed = sum(1 for t in tasks if t.status_patient == "COMPLETED")
+    return completed / len(tasks) * 100
+
+
+def find_reusable_plan(db: Session, patient_id, plan_hash: str, day: date = None) -> Optional[DailyPlan]:
+    """Most recent earlier plan with the same context hash and acceptable compliance."""
+    day = day or datetime.utcnow().date()
+    candidates = db.query(DailyPlan).filter(
+        DailyPlan.patient_id == patient_id,
+        DailyPlan.context_hash == plan_hash,
+        DailyPlan.plan_date >= day - timedelta(days=PLAN_REUSE_LOOKBACK_DAYS),
+        DailyPlan.plan_date < day,
+    ).order_by(DailyPlan.plan_date.desc()).all()
+
+    for plan in candidates:
+        compliance = plan_compliance(db, plan)
+        if compliance is not None and compliance >= PLAN_REUSE_MIN_COMPLIANCE:
+            return plan
+    return None
+
+
+def record_plan(db: Session, patient_id, day: date, plan_hash: str, items: List[dict],
+                reused_from: DailyPlan = None) -> DailyPlan:
+    """Store `day`'s plan (replacing an earlier one for the same day). Caller commits."""
+    db.query(DailyPlan).filter(
+        DailyPlan.patient_id == patient_id,
+        DailyPlan.plan_date == day,
+    ).delete(synchronize_session=False)
+    plan = DailyPlan(
+        patient_id=patient_id,
+        plan_date=day,
+        context_hash=plan_hash,
+        source=PLAN_SOURCE_REUSED if reused_from else PLAN_SOURCE_PLANNER,
+        reused_from_id=reused_from.id if reused_from else None,
+        tasks=items,
+        created_at=datetime.utcnow(),
+    )
+    db.add(plan)
+    return plan
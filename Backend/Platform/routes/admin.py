@@ -0,0 +1,187 @@
+import math
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Optional
+
+from database.session import get_db
+from database.models import User, UserRole, AnalysisRunMetric, LLMTokenLedger
+from auth.dependencies import require_roles
+import token_budget
+import admission
+import scheduler_leader
+from medical_agents.output_parsing import parse_stats
+
+router = APIRouter(prefix="/api/v1/admin", tags=["Admin"])
+
+# Scalar columns summarised by the run-metrics endpoint
+_RUN_METRIC_FIELDS = [
+    "total_duration_s",
+    "retry_count",
+    "backoff_seconds",
+    "cooldown_seconds",
+    "hitl_wait_seconds",
+    "prompt_tokens",
+    "completion_tokens",
+    "estimated_cost_usd",
+]
+
+
+# --- Helpers ---
+
+def _percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile over an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return round(sorted_values[min(rank, len(sorted_values) - 1)], 4)
+
+
+def _distribution(values: List[float]) -> Dict[str, Optional[float]]:
+    values = sorted(v for v in values if v is not None)
+    return {
+        "count": len(values),
+        "p50": _percentile(values, 50),
+        "p90": _percentile(values, 90),
+        "p99": _percentile(values, 99),
+        "max": round(values[-1], 4) if values else None,
+    }
+
+
+# --- Endpoints ---
+
+@router.get("/run-metrics/summary")
+def run_metrics_summary(
+    days: int = Query(7, ge=1, le=90),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_roles([UserRole.ADMIN]))
+):
+    """
+    p50/p90/p99 of analysis-run duration, retries, backoff, HITL wait, tokens
+    and cost over the last N days, plus per-stage duration percentiles.
+    """
+    since = datetime.utcnow() - timedelta(days=days)
+    runs = db.query(AnalysisRunMetric).filter(AnalysisRunMetric.created_at >= since).all()
+
+    stage_durations: Dict[str, List[float]] = {}
+    for run in runs:
+        for stage, timing in (run.stage_timings or {}).items():
+            if timing.get("duration_s") is not None:
+                stage_durations.setdefault(stage, []).append(timing["duration_s"])
+
+    status_counts: Dict[str, int] = {}
+    for run in runs:
+        status_counts[run.status] = status_counts.get(run.status, 0) + 1
+
+    return {
+        "window_days": days,
+        "runs": len(runs),
+        "by_status": status_counts,
+        "total_estimated_cost_usd": round(sum(r.estimated_cost_usd or 0.0 for r in runs), 4),
+        "metrics": {
+            field: _distribution([getattr(r, field) for r in runs])
+            for field in _RUN_METRIC_FIELDS
+        },
+        "stages": {stage: _distribution(values) for stage, values in stage_durations.items()},
+    }
+
+
+@router.get("/run-metrics")
+def list_run_metrics(
+    limit: int = Query(50, ge=1, le=500),
+    patient_id: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_roles([UserRole.ADMIN]))
+):
+    """Most recent analysis runs with their full metrics."""
+    query = db.query(AnalysisRunMetric)
+    if patient_id:
+        query = query.filter(AnalysisRunMetric.patient_id == patient_id)
+    runs = query.order_by(AnalysisRunMetric.created_at.desc()).limit(limit).all()
+
+    return [
+        {
+            "id": str(r.id),
+            "patient_id": str(r.patient_id),
+            "run_id": r.run_id,
+            "executor": r.executor,
+            "status": r.status,
+            "started_at": r.started_at.isoformat() if r.started_at else None,
+            "finished_at": r.finished_at.isoformat() if r.finished_at else None,
+            "total_duration_s": r.total_duration_s,
+            "stage_timings": r.stage_timings,
+            "retry_count": r.retry_count,
+            "backoff_seconds": r.backoff_seconds,
+            "cooldown_seconds": r.cooldown_seconds,
+            "hitl_wait_seconds": r.hitl_wait_seconds,
+            "hitl_questions": r.hitl_questions,
+            "token_usage": r.token_usage,
+            "prompt_tokens": r.prompt_tokens,
+            "completion_tokens": r.completion_tokens,
+            "estimated_cost_usd": r.estimated_cost_usd,
+            "error": r.error,
+        }
+        for r in runs
+    ]
+
+
+@router.get("/token-budget")
+def token_budget_usage(
+    day: Optional[date] = None,
+    top: int = Query(20, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_roles([UserRole.ADMIN]))
+):
+    """Token consumption for a UTC day (default today): limits, per-feature totals, top patients."""
+    return token_budget.usage_report(db, day=day, top=top)
+
+
+@router.get("/token-budget/{patient_id}")
+def patient_token_budget(
+    patient_id: str,
+    days: int = Query(7, ge=1, le=90),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_roles([UserRole.ADMIN]))
+):
+    """A patient's daily consumption per feature over the last N days, plus today's budget state."""
+    since = token_budget.today_utc() - timedelta(days=days - 1)
+    rows = db.query(LLMTokenLedger).filter(
+        LLMTokenLedger.patient_id == patient_id,
+        LLMTokenLedger.day >= since,
+    ).order_by(LLMTokenLedger.day.desc()).all()
+
+    history: Dict[str, Dict[str, int]] = {}
+    for row in rows:
+        history.setdefault(row.day.isoformat(), {})[row.feature] = row.total_tokens
+
+    return {
+        "patient_id": patient_id,
+        "limits": token_budget.limits(),
+        "today": token_budget.check_budget(db, patient_id).to_dict(),
+        "history": history,
+    }
+
+
+@router.get("/admission")
+def admission_status(
+    current_user: User = Depends(require_roles([UserRole.ADMIN]))
+):
+    """Live admission-control state per LLM feature: slots, queue, EWMA duration, rate-limit window."""
+    return {feature: controller.snapshot() for feature, controller in admission.CONTROLLERS.items()}
+
+
+@router.get("/parse-stats")
+def agent_parse_stats(
+    current_user: User = Depends(require_roles([UserRole.ADMIN]))
+):
+    """Per-agent output parsing outcomes since process start (strict / extracted / repaired / failed / invalid)."""
+    return parse_stats()
+
+
+@router.get("/scheduler/status")
+def scheduler_leader_status(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_roles([UserRole.ADMIN]))
+):
+    """Which instance leads the periodic jobs (lease holder and expiry), each job's last run and last success."""
+    return scheduler_leader.scheduler_status(db)
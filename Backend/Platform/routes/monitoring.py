@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional
@@ -9,10 +10,17 @@ from database.session import get_db
 from database.models import User, Patient, UserRole, MonitoringCheckIn, MonitoringQuestion, MonitoringResponse, TelemetryLog
 from auth.dependencies import get_current_active_user, require_roles
 from medical_agents.monitoring_agent import MonitoringAgent
-from severity_engine import evaluate_check_in, handle_severity_escalation, evaluate_vitals_severity, check_telemetry_anomalies, handle_telemetry_escalation
+from token_budget import enforce_budget, metered, TokenBudgetExceeded, FEATURE_MONITORING
+from admission import monitoring_admission, admitted, AdmissionRejected, patient_is_critical
+from severity_engine import evaluate_check_in, handle_severity_escalation, handle_telemetry_escalation
+from telemetry_stream import telemetry_stream, ingest_readings, publish_reading
+from telemetry_rollups import RESOLUTIONS, update_rollups, query_series, naive_utc
 
 router = APIRouter(prefix="/api/v1/monitoring", tags=["Monitoring"])
 
+# Largest batch accepted by /telemetry/batch (readings across all patients)
+TELEMETRY_BATCH_MAX_READINGS = int(os.getenv("TELEMETRY_BATCH_MAX_READINGS", "5000"))
+
 # --- Schemas ---
 class TelemetryPayload(BaseModel):
     patient_id: UUID
@@ -22,6 +30,17 @@ class TelemetryPayload(BaseModel):
     # Add an optional secret token field if you want to auth n8n webhooks
     webhook_token: Optional[str] = None
 
+class TelemetryReading(BaseModel):
+    patient_id: UUID
+    heart_rate: Optional[int] = None
+    blood_pressure: Optional[str] = None
+    spo2: Optional[int] = None
+    timestamp: Optional[datetime] = None  # when the device took it (default: received time)
+
+class TelemetryBatchPayload(BaseModel):
+    readings: List[TelemetryReading]
+    webhook_token: Optional[str] = None
+
 class SubmitResponseItem(BaseModel):
     question_id: UUID
     answer_value: str
@@ -75,16 +94,19 @@ def build_recent_history(patient_id: UUID, db: Session, days: int = 3) -> str:
 def generate_check_in_for_patient(patient: Patient, db: Session) -> dict:
     """
     Core generation logic — used by both the API endpoint and the scheduler.
-    Returns {"check_in_id": UUID, "question_count": int} or raises.
+    Returns {"check_in_id": UUID, "question_count": int} or raises
+    (TokenBudgetExceeded when the patient's daily token budget is exhausted).
     """
+    budget = enforce_budget(db, patient.id, FEATURE_MONITORING)
     recent_history = build_recent_history(patient.id, db)
 
-    agent = MonitoringAgent()
-    plan = agent.generate_check_in_questions(
-        patient_name=patient.name,
-        condition_tags=patient.condition_tags or [],
-        recent_history=recent_history,
-    )
+    agent = MonitoringAgent(degraded=budget.degraded)
+    with metered(patient.id, FEATURE_MONITORING):
+        plan = agent.generate_check_in_questions(
+            patient_name=patient.name,
+            condition_tags=patient.condition_tags or [],
+            recent_history=recent_history,
+        )
 
     # Create Check-in Record
     check_in = MonitoringCheckIn(
@@ -125,11 +147,16 @@ def generate_check_in(
         raise HTTPException(status_code=404, detail="Patient not found")
 
     try:
-        result = generate_check_in_for_patient(patient, db)
+        with admitted(monitoring_admission, critical=patient_is_critical(db, patient.id)):
+            result = generate_check_in_for_patient(patient, db)
         return {
             "message": f"Generated {result['question_count']} questions successfully.",
             "check_in_id": result["check_in_id"],
         }
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except TokenBudgetExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
@@ -260,26 +287,69 @@ def ingest_telemetry_webhook(
         patient_id=payload.patient_id,
         heart_rate=payload.heart_rate,
         blood_pressure=payload.blood_pressure,
-        spo2=payload.spo2
+        spo2=payload.spo2,
+        timestamp=datetime.utcnow(),
     )
     db.add(log)
+    update_rollups(db, [{
+        "patient_id": log.patient_id,
+        "heart_rate": log.heart_rate,
+        "blood_pressure": log.blood_pressure,
+        "spo2": log.spo2,
+        "timestamp": log.timestamp,
+    }])
     db.commit()
 
-    # 2. Check for sustained anomalies (last 6 readings = 3 minutes if at 30s interval)
-    is_sustained_anomaly = check_telemetry_anomalies(payload.patient_id, db)
+    # 2. Check for sustained anomalies (last 6 readings = 3 minutes if at 30s interval),
+    # from the patient's in-memory window rather than re-reading telemetry_logs
+    verdict = telemetry_stream.observe(
+        db, payload.patient_id, payload.heart_rate, payload.blood_pressure, payload.spo2, log.timestamp,
+    )
 
-    if is_sustained_anomaly:
-        highest_severity = "ORANGE"
-        # We can evaluate the single current reading to see if it's RED
-        current_sev = evaluate_vitals_severity(payload.heart_rate, payload.blood_pressure, payload.spo2)
-        if current_sev == "RED":
-            highest_severity = "RED"
-            
+    highest_severity = None
+    if verdict.sustained_anomaly:
+        # ORANGE unless the current reading itself is RED
+        highest_severity = "RED" if verdict.severity == "RED" else "ORANGE"
         handle_telemetry_escalation(payload.patient_id, highest_severity, db)
+
+    # 3. Live update for dashboards watching this patient
+    publish_reading(
+        payload.patient_id, payload.heart_rate, payload.blood_pressure, payload.spo2, log.timestamp,
+        verdict.severity, highest_severity,
+    )
+
+    if highest_severity:
         return {"status": "success", "alert_triggered": True, "severity": highest_severity}
-    
     return {"status": "success", "alert_triggered": False}
 
+@router.post("/telemetry/batch")
+def ingest_telemetry_batch(
+    payload: TelemetryBatchPayload,
+    db: Session = Depends(get_db)
+):
+    """
+    Bulk variant of /telemetry for n8n flows and device gateways that buffer
+    readings: any number of patients per request, one INSERT for the batch,
+    and the same 3-minute sliding-window alerting, evaluated per patient.
+    Returns per-patient outcomes; unknown patients are reported, not fatal.
+    """
+    if len(payload.readings) > TELEMETRY_BATCH_MAX_READINGS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(payload.readings)} readings (max {TELEMETRY_BATCH_MAX_READINGS})",
+        )
+
+    readings = [
+        r.model_dump() if hasattr(r, "model_dump") else r.dict()
+        for r in payload.readings
+    ]
+    outcomes = ingest_readings(db, readings)
+    return {
+        "status": "success",
+        "accepted": sum(o.get("accepted", 0) for o in outcomes.values()),
+        "patients": outcomes,
+    }
+
 @router.get("/telemetry/latest/{patient_id}")
 def get_latest_telemetry(
     patient_id: UUID,
@@ -289,6 +359,7 @@ def get_latest_telemetry(
     """
     Fetch the latest anomalous reading to pre-fill the frontend Assessment Check-up page.
     """
+    # Read from the DB, not the stream buffers: those are per worker process
     log = db.query(TelemetryLog).filter(TelemetryLog.patient_id == patient_id).order_by(TelemetryLog.timestamp.desc()).first()
     if not log:
         return {"heart_rate": "", "blood_pressure": "", "spo2": ""}
@@ -300,3 +371,30 @@ def get_latest_telemetry(
         "spo2": str(log.spo2) if log.spo2 else "",
         "timestamp": log.timestamp.isoformat()
     }
+
+@router.get("/telemetry/{patient_id}")
+def get_telemetry_history(
+    patient_id: UUID,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    resolution: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Vitals history for charts: min / max / mean / count per vital per bucket,
+    served from the telemetry rollups. `resolution` (1m, 1h, 1d) defaults to
+    the finest tier that keeps the series short; the range defaults to the
+    last 24 hours.
+    """
+    if resolution is not None and resolution not in RESOLUTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown resolution '{resolution}' (expected one of {', '.join(RESOLUTIONS)})",
+        )
+    end = naive_utc(end) if end else datetime.utcnow()
+    start = naive_utc(start) if start else end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+
+    return query_series(db, patient_id, start, end, resolution)
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List, Optional
@@ -9,8 +10,12 @@ import uuid
 from database.session import get_db
 from database.models import DailyTask, Patient, User, UserRole
 from auth.dependencies import get_current_user
-from medical_agents.crew import MedicalCrew
-import json
+from token_budget import enforce_budget, TokenBudgetExceeded, FEATURE_PLANNING
+from database.models import PlanGenerationJob
+from admission import planning_admission, AdmissionRejected, patient_is_critical
+from task_planner import ai_tasks_for_day, build_planning_input, save_plan, reuse_plan, plan_without_llm
+from plan_fingerprint import context_hash
+from plan_jobs import active_job, claim_job, submit_job, job_to_dict, KIND_GENERATE, KIND_REGENERATE
 
 router = APIRouter(
     prefix="/api/v1/tasks",
@@ -43,6 +48,44 @@ class TaskResponse(BaseModel):
     class Config:
         orm_mode = True
 
+# --- Helpers ---
+
+def _enforce_planning_budget(db: Session, patient_id: uuid.UUID):
+    """Token budget gate for the planning crew: 429 on hard limit, degraded planner on soft limit."""
+    try:
+        return enforce_budget(db, patient_id, FEATURE_PLANNING)
+    except TokenBudgetExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def _admit_planning(db: Session, patient_id: uuid.UUID):
+    """Admission control for the planning crew: ticket for the plan job to hold, or 429."""
+    try:
+        return planning_admission.try_admit(critical=patient_is_critical(db, patient_id))
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def _job_accepted(job: PlanGenerationJob) -> JSONResponse:
+    return JSONResponse(status_code=202, content=job_to_dict(job))
+
+
+def _enqueue_plan_job(db: Session, patient_id: uuid.UUID, kind: str, current_user: User) -> JSONResponse:
+    """Budget + admission gate, then queue the crew run as a plan job (202). Idempotent per patient per day."""
+    budget = _enforce_planning_budget(db, patient_id)
+    ticket = _admit_planning(db, patient_id)
+    try:
+        job, created = claim_job(db, patient_id, kind, requested_by=current_user.id)
+    except Exception:
+        ticket.release()
+        raise
+    if created:
+        submit_job(job, degraded=budget.degraded, ticket=ticket)
+    else:
+        ticket.release()  # lost the race to a concurrent request; its job does the work
+    return _job_accepted(job)
+
+
 # --- Routes ---
 
 @router.get("/{patient_id}", response_model=List[TaskResponse])
@@ -126,7 +169,11 @@ def update_task_status(
     db.refresh(task)
     return task
 
-@router.post("/generate/{patient_id}", response_model=List[TaskResponse])
+@router.post(
+    "/generate/{patient_id}",
+    response_model=List[TaskResponse],
+    responses={202: {"description": "Plan generation queued; body is the plan job"}},
+)
 def generate_daily_tasks(
     patient_id: uuid.UUID,
     db: Session = Depends(get_db),
@@ -135,6 +182,11 @@ def generate_daily_tasks(
     """
     Generate adaptive daily tasks using the AI planner.
 
+    Returns today's plan (200) when it needs no crew run: precomputed by the
+    nightly batch, reused from a recent identical context, or built from the
+    task KB alone. Otherwise queues a plan job and returns 202 with the job
+    (poll GET /jobs/{job_id}, or wait for the PLAN_JOB WebSocket message).
+
     Passes the full patient context (compliance history, vitals trends,
     medication adherence, risk assessment, active alerts) so the AI can
     produce personalized, difficulty-adjusted, and priority-tagged tasks.
@@ -144,87 +196,40 @@ def generate_daily_tasks(
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
 
-    # Check if tasks already generated today (prevent duplicates)
-    today_start = datetime.combine(date.today(), datetime.min.time())
-    today_end = datetime.combine(date.today(), datetime.max.time())
-    existing_ai_tasks = db.query(DailyTask).filter(
-        DailyTask.patient_id == patient_id,
-        DailyTask.scheduled_date >= today_start,
-        DailyTask.scheduled_date <= today_end,
-        DailyTask.source.in_(["AI_GENERATED", "KB_BASELINE", "SMART_REMEDIATION"]),
-    ).count()
+    # A job for today is already queued/running — hand back the same one
+    job = active_job(db, patient_id)
+    if job:
+        return _job_accepted(job)
 
-    if existing_ai_tasks > 0:
-        raise HTTPException(
-            status_code=409,
-            detail="Tasks already generated for today. Use the regenerate endpoint to replace them."
-        )
+    # Usually precomputed by the nightly batch (task_planner) — return it without an LLM call
+    existing_ai_tasks = ai_tasks_for_day(db, patient_id).all()
+    if existing_ai_tasks:
+        return existing_ai_tasks
 
     # Build rich patient context (the core improvement)
-    from routes.patient_context import build_patient_context
-    context = build_patient_context(patient_id, db)
+    context = build_planning_input(db, patient_id)
 
     if "error" in context:
         raise HTTPException(status_code=404, detail=context["error"])
 
-    patient_data_str = json.dumps(context, default=str)
+    # Context unchanged since a recent plan the patient kept up with — clone it
+    reused_tasks = reuse_plan(db, patient_id, context)
+    if reused_tasks is not None:
+        return reused_tasks
 
-    # Run AI Crew
-    try:
-        crew = MedicalCrew(patient_id=str(patient_id))
-        result = crew.run_planning_crew(patient_data_str)
-        
-        # Parse Result (Expect JSON List)
-        output_str = str(result)
-        try:
-             start = output_str.find('[')
-             end = output_str.rfind(']') + 1
-             if start != -1 and end != -1:
-                 json_content = json.loads(output_str[start:end])
-             else:
-                 json_content = json.loads(output_str)
-        except Exception as e:
-            print(f"JSON Parse Error: {e} - Content: {output_str}")
-            raise HTTPException(status_code=500, detail=f"AI Output Parse Error: {str(e)}. Raw Output: {output_str[:200]}...")
-
-        generated_tasks = []
-        today = date.today()
-        
-        for item in json_content:
-            # Validate and normalize source/priority from AI output
-            raw_source = item.get("source", "AI_GENERATED")
-            valid_sources = {"AI_GENERATED", "KB_BASELINE", "SMART_REMEDIATION"}
-            source = raw_source if raw_source in valid_sources else "AI_GENERATED"
-
-            raw_priority = item.get("priority", "NORMAL")
-            valid_priorities = {"LOW", "NORMAL", "HIGH", "CRITICAL"}
-            priority = raw_priority if raw_priority in valid_priorities else "NORMAL"
-
-            new_task = DailyTask(
-                id=uuid.uuid4(),
-                patient_id=patient_id,
-                task_description=item.get("task_description", "Unnamed Task"),
-                category=item.get("category", "General"),
-                scheduled_date=datetime.combine(today, datetime.min.time()),
-                status_patient="PENDING",
-                status_caretaker="PENDING",
-                source=source,
-                priority=priority,
-            )
-            db.add(new_task)
-            generated_tasks.append(new_task)
-        
-        db.commit()
-        return generated_tasks
-
-    except HTTPException:
-        raise
-    except Exception as e:
-         print(f"Error generating tasks: {e}")
-         raise HTTPException(status_code=500, detail=str(e))
+    # Every condition covered by the task KB and nothing to remediate — no LLM needed
+    kb_tasks = plan_without_llm(context)
+    if kb_tasks is not None:
+        return save_plan(db, patient_id, kb_tasks, plan_hash=context_hash(context))
 
+    return _enqueue_plan_job(db, patient_id, KIND_GENERATE, current_user)
 
-@router.post("/regenerate/{patient_id}", response_model=List[TaskResponse])
+
+@router.post(
+    "/regenerate/{patient_id}",
+    status_code=202,
+    responses={202: {"description": "Plan regeneration queued; body is the plan job"}},
+)
 def regenerate_daily_tasks(
     patient_id: uuid.UUID,
     db: Session = Depends(get_db),
@@ -232,7 +237,8 @@ def regenerate_daily_tasks(
 ):
     """
     Clear today's AI-generated tasks and regenerate with fresh context.
-    Manual tasks are preserved.
+    Manual tasks are preserved. Runs as a plan job (202); the tasks are only
+    deleted once the job holds a planning slot.
     """
     # Only staff can regenerate
     if current_user.role == UserRole.PATIENT:
@@ -242,72 +248,25 @@ def regenerate_daily_tasks(
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
 
-    # Delete today's AI-generated tasks (keep MANUAL ones)
-    today_start = datetime.combine(date.today(), datetime.min.time())
-    today_end = datetime.combine(date.today(), datetime.max.time())
+    job = active_job(db, patient_id)
+    if job:
+        return _job_accepted(job)
 
-    db.query(DailyTask).filter(
-        DailyTask.patient_id == patient_id,
-        DailyTask.scheduled_date >= today_start,
-        DailyTask.scheduled_date <= today_end,
-        DailyTask.source.in_(["AI_GENERATED", "KB_BASELINE", "SMART_REMEDIATION"]),
-    ).delete(synchronize_session="fetch")
-    db.commit()
+    # Rejected (429) before anything is deleted if the budget is exhausted or we are shedding load
+    return _enqueue_plan_job(db, patient_id, KIND_REGENERATE, current_user)
 
-    # Build context and regenerate
-    from routes.patient_context import build_patient_context
-    context = build_patient_context(patient_id, db)
-    patient_data_str = json.dumps(context, default=str)
 
-    try:
-        crew = MedicalCrew(patient_id=str(patient_id))
-        result = crew.run_planning_crew(patient_data_str)
-        
-        output_str = str(result)
-        try:
-            start = output_str.find('[')
-            end = output_str.rfind(']') + 1
-            if start != -1 and end != -1:
-                json_content = json.loads(output_str[start:end])
-            else:
-                json_content = json.loads(output_str)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"AI Output Parse Error: {str(e)}")
-
-        generated_tasks = []
-        today = date.today()
-        
-        for item in json_content:
-            raw_source = item.get("source", "AI_GENERATED")
-            valid_sources = {"AI_GENERATED", "KB_BASELINE", "SMART_REMEDIATION"}
-            source = raw_source if raw_source in valid_sources else "AI_GENERATED"
-
-            raw_priority = item.get("priority", "NORMAL")
-            valid_priorities = {"LOW", "NORMAL", "HIGH", "CRITICAL"}
-            priority = raw_priority if raw_priority in valid_priorities else "NORMAL"
-
-            new_task = DailyTask(
-                id=uuid.uuid4(),
-                patient_id=patient_id,
-                task_description=item.get("task_description", "Unnamed Task"),
-                category=item.get("category", "General"),
-                scheduled_date=datetime.combine(today, datetime.min.time()),
-                status_patient="PENDING",
-                status_caretaker="PENDING",
-                source=source,
-                priority=priority,
-            )
-            db.add(new_task)
-            generated_tasks.append(new_task)
-        
-        db.commit()
-        return generated_tasks
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Error regenerating tasks: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+@router.get("/jobs/{job_id}")
+def get_plan_job(
+    job_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Status of a plan job; once COMPLETED, fetch the tasks with GET /{patient_id}."""
+    job = db.query(PlanGenerationJob).filter(PlanGenerationJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Plan job not found")
+    return job_to_dict(job)
 
 
 @router.get("/summary/{patient_id}")
@@ -1,24 +1,43 @@
 """
 Scheduler module — uses APScheduler to run periodic monitoring jobs.
 
+Only the elected leader process starts it (see scheduler_leader). Jobs live
+in a persistent SQLAlchemy job store (`apscheduler_jobs`) and every execution
+is recorded in `scheduler_job_runs`. On start, each job's first run is derived
+from its last COMPLETED run instead of always firing shortly after boot: a
+run that is due (or was missed while no leader was up) is caught up once,
+otherwise the job waits for its next regular slot.
+
 Jobs:
   1. generate_all_check_ins: Every N hours, generate check-in questions for
-     all patients who have condition_tags and no PENDING check-in.
+     all patients who have condition_tags and no PENDING check-in. Patients
+     are streamed in batches and each gets a deterministic slot spread over
+     CHECKIN_SPREAD_MINUTES, so Gemini/RAG load is smoothed over the interval
+     and at most CHECKIN_SWEEP_CONCURRENCY generations run at once.
   2. evaluate_unevaluated_responses: Safety net — evaluate any responses that
      were submitted but somehow missed severity evaluation.
+  3. generate_nightly_daily_plans: Once a night (off-peak), precompute today's
+     AI daily plan for every active patient (see task_planner).
+  4. maintain_telemetry_partitions: Once a day, create upcoming telemetry_logs
+     partitions and archive the expired ones (see telemetry_partitions).
 """
 
 import os
+import time
+import hashlib
 import logging
-from datetime import datetime, timedelta
-from typing import Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.util import undefined
 
-from sqlalchemy import func
-from database.session import SessionLocal
-from database.models import (
-    Patient, MonitoringCheckIn, MonitoringQuestion, MonitoringResponse
-)
+from sqlalchemy import func, exists
+from database.session import SessionLocal, engine
+from database.models import Patient, MonitoringCheckIn, SchedulerJobRun
 
 logger = logging.getLogger("scheduler")
 
@@ -27,74 +46,256 @@ logger = logging.getLogger("scheduler")
 # ---------------------------------------------------------------------------
 CHECKIN_INTERVAL_HOURS = int(os.getenv("CHECKIN_INTERVAL_HOURS", "8"))
 CHECKIN_EVALUATION_HOURS = int(os.getenv("CHECKIN_EVALUATION_HOURS", "2"))
+# Check-in sweep: patients fetched per round trip, generations at once, and the
+# window (default: half the interval) the per-patient slots are spread over
+CHECKIN_SWEEP_BATCH_SIZE = int(os.getenv("CHECKIN_SWEEP_BATCH_SIZE", "500"))
+CHECKIN_SWEEP_CONCURRENCY = int(os.getenv("CHECKIN_SWEEP_CONCURRENCY", "4"))
+CHECKIN_SPREAD_MINUTES = int(os.getenv("CHECKIN_SPREAD_MINUTES", str(CHECKIN_INTERVAL_HOURS * 30)))
+# Delay before a catch-up run fires after the scheduler starts
+SCHEDULER_CATCHUP_DELAY_SECONDS = int(os.getenv("SCHEDULER_CATCHUP_DELAY_SECONDS", "60"))
+
+JOB_CHECK_INS = "generate_check_ins"
+JOB_EVALUATE = "evaluate_responses"
+JOB_NIGHTLY_PLANS = "nightly_daily_plans"
+JOB_TELEMETRY_PARTITIONS = "telemetry_partitions"
+# Every job the scheduler registers (admin status lists these)
+JOB_IDS = [JOB_CHECK_INS, JOB_EVALUATE, JOB_NIGHTLY_PLANS, JOB_TELEMETRY_PARTITIONS]
+
+RUN_RUNNING = "RUNNING"
+RUN_COMPLETED = "COMPLETED"
+RUN_FAILED = "FAILED"
 
 _scheduler: Optional[BackgroundScheduler] = None
+# Set on shutdown so a sweep waiting for its next slot stops dispatching
+_stop_event = threading.Event()
 
 
 # ---------------------------------------------------------------------------
-# Job 1 — Generate check-ins for all eligible patients
+# Run history
 # ---------------------------------------------------------------------------
 
-def generate_all_check_ins():
-    """
-    Periodic job: for every patient with condition_tags, generate a new
-    monitoring check-in unless they already have a PENDING one.
-    """
-    logger.info("⏰ [Scheduler] Running generate_all_check_ins ...")
-    db = SessionLocal()
+class JobRun:
+    """What a job reports about one execution (see job_run)."""
 
-    try:
-        # Patients who have at least one condition tag
-        patients = db.query(Patient).filter(
-            Patient.condition_tags.isnot(None),
-            func.array_length(Patient.condition_tags, 1) > 0,
-        ).all()
+    def __init__(self):
+        self.items_processed = 0
+        self.error_count = 0
+        self.error: Optional[str] = None
+
+    def fail(self, error: Exception):
+        self.error = str(error)[:500]
 
-        generated = 0
-        skipped = 0
 
-        for patient in patients:
-            # Skip if any PENDING check-in exists (patient or caretaker side)
-            pending = db.query(MonitoringCheckIn).filter(
-                MonitoringCheckIn.patient_id == patient.id,
-                (
-                    (MonitoringCheckIn.status_patient == "PENDING")
-                    | (MonitoringCheckIn.status_caretaker == "PENDING")
-                ),
-            ).first()
+def _instance_id() -> str:
+    from scheduler_leader import INSTANCE_ID
+    return INSTANCE_ID
 
-            if pending:
-                skipped += 1
-                continue
 
+@contextmanager
+def job_run(job_id: str):
+    """Record one execution of `job_id` in scheduler_job_runs (history must never break the job)."""
+    run = JobRun()
+    row_id = None
+    db = SessionLocal()
+    try:
+        row = SchedulerJobRun(job_id=job_id, instance=_instance_id(), status=RUN_RUNNING, started_at=datetime.utcnow())
+        db.add(row)
+        db.commit()
+        row_id = row.id
+    except Exception as e:
+        logger.warning(f"Could not record start of job {job_id}: {e}")
+        db.rollback()
+    try:
+        yield run
+    except Exception as e:
+        run.fail(e)
+        raise
+    finally:
+        if row_id is not None:
             try:
-                from routes.monitoring import generate_check_in_for_patient
+                db.query(SchedulerJobRun).filter(SchedulerJobRun.id == row_id).update({
+                    "status": RUN_FAILED if run.error else RUN_COMPLETED,
+                    "finished_at": datetime.utcnow(),
+                    "items_processed": run.items_processed,
+                    "error_count": run.error_count,
+                    "error": run.error,
+                }, synchronize_session=False)
+                db.commit()
+            except Exception as e:
+                logger.warning(f"Could not record end of job {job_id}: {e}")
+                db.rollback()
+        db.close()
 
-                result = generate_check_in_for_patient(patient, db)
-                generated += 1
-                logger.info(
-                    f"  ✔ Generated {result['question_count']} questions for "
-                    f"{patient.name} (id={patient.id})"
-                )
 
-                # Send push notification to patient and caretakers
-                _notify_patient_new_checkin(patient, db)
-                _notify_caretakers_new_checkin(patient, db)
+def _run_to_dict(row: Optional[SchedulerJobRun]) -> Optional[Dict[str, Any]]:
+    if row is None:
+        return None
+    return {
+        "status": row.status,
+        "instance": row.instance,
+        "started_at": row.started_at.isoformat() if row.started_at else None,
+        "finished_at": row.finished_at.isoformat() if row.finished_at else None,
+        "items_processed": row.items_processed,
+        "error_count": row.error_count,
+        "error": row.error,
+    }
+
+
+def last_runs(db, job_ids: List[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Latest run and latest COMPLETED run per job."""
+    job_ids = job_ids or JOB_IDS
+    latest = (
+        db.query(SchedulerJobRun)
+        .filter(SchedulerJobRun.job_id.in_(job_ids))
+        .distinct(SchedulerJobRun.job_id)
+        .order_by(SchedulerJobRun.job_id, SchedulerJobRun.started_at.desc())
+        .all()
+    )
+    completed = (
+        db.query(SchedulerJobRun)
+        .filter(SchedulerJobRun.job_id.in_(job_ids), SchedulerJobRun.status == RUN_COMPLETED)
+        .distinct(SchedulerJobRun.job_id)
+        .order_by(SchedulerJobRun.job_id, SchedulerJobRun.started_at.desc())
+        .all()
+    )
+    latest_by_job = {row.job_id: row for row in latest}
+    completed_by_job = {row.job_id: row for row in completed}
+    return {
+        job_id: {
+            "last_run": _run_to_dict(latest_by_job.get(job_id)),
+            "last_success": _run_to_dict(completed_by_job.get(job_id)),
+        }
+        for job_id in job_ids
+    }
+
+
+# ---------------------------------------------------------------------------
+# Job 1 — Generate check-ins for all eligible patients
+# ---------------------------------------------------------------------------
+
+def _pending_check_in_exists():
+    """Correlated EXISTS: the patient has a PENDING check-in (patient or caretaker side)."""
+    return exists().where(
+        MonitoringCheckIn.patient_id == Patient.id,
+        (MonitoringCheckIn.status_patient == "PENDING")
+        | (MonitoringCheckIn.status_caretaker == "PENDING"),
+    )
 
-            except Exception as e:
-                logger.error(f"  ✘ Failed for {patient.name}: {e}")
-                db.rollback()
 
+def check_in_slot_seconds(patient_id, spread_seconds: int) -> int:
+    """Deterministic offset of the patient's check-in within the sweep window."""
+    if spread_seconds <= 0:
+        return 0
+    digest = hashlib.sha256(str(patient_id).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % spread_seconds
+
+
+def _patients_due_for_check_in(db) -> List[Tuple[int, object]]:
+    """
+    (slot, patient_id) for every tagged patient without a PENDING check-in,
+    in slot order. One anti-join, streamed CHECKIN_SWEEP_BATCH_SIZE rows at a time.
+    """
+    spread_seconds = CHECKIN_SPREAD_MINUTES * 60
+    rows = db.query(Patient.id).filter(
+        Patient.condition_tags.isnot(None),
+        func.array_length(Patient.condition_tags, 1) > 0,
+        ~_pending_check_in_exists(),
+    ).yield_per(CHECKIN_SWEEP_BATCH_SIZE)
+    return sorted((check_in_slot_seconds(row.id, spread_seconds), row.id) for row in rows)
+
+
+def _generate_check_in(patient_id) -> str:
+    """Generate one patient's check-in in its own session. Returns the outcome for the sweep summary."""
+    db = SessionLocal()
+    try:
+        patient = db.query(Patient).filter(
+            Patient.id == patient_id,
+            ~_pending_check_in_exists(),
+        ).first()
+        if not patient:
+            return "skipped"  # answered/created elsewhere since the sweep started
+
+        from routes.monitoring import generate_check_in_for_patient
+
+        result = generate_check_in_for_patient(patient, db)
         logger.info(
-            f"⏰ [Scheduler] generate_all_check_ins done: "
-            f"generated={generated}, skipped={skipped}"
+            f"  ✔ Generated {result['question_count']} questions for "
+            f"{patient.name} (id={patient.id})"
         )
 
+        # Send push notification to patient and caretakers
+        _notify_patient_new_checkin(patient, db)
+        _notify_caretakers_new_checkin(patient, db)
+        return "generated"
+    except Exception as e:
+        logger.error(f"  ✘ Failed for patient {patient_id}: {e}")
+        db.rollback()
+        return "failed"
+    finally:
+        db.close()
+
+
+def generate_all_check_ins():
+    """
+    Periodic job: for every patient with condition_tags, generate a new
+    monitoring check-in unless they already have a PENDING one.
+
+    Each patient is dispatched at its slot (check_in_slot_seconds) after the
+    sweep starts; the pool bounds how many generations run concurrently.
+    """
+    logger.info("⏰ [Scheduler] Running generate_all_check_ins ...")
+    with job_run(JOB_CHECK_INS) as run:
+        _sweep_check_ins(run)
+
+
+def _sweep_check_ins(run: JobRun):
+    db = SessionLocal()
+    try:
+        due = _patients_due_for_check_in(db)
     except Exception as e:
         logger.error(f"⏰ [Scheduler] generate_all_check_ins error: {e}")
+        run.fail(e)
+        return
     finally:
         db.close()
 
+    summary: Dict[str, int] = {"generated": 0, "skipped": 0, "failed": 0}
+    summary_lock = threading.Lock()
+    workers = max(CHECKIN_SWEEP_CONCURRENCY, 1)
+    # Dispatch no further ahead than the workers can take, so slots are honoured
+    capacity = threading.BoundedSemaphore(workers)
+
+    def _run(patient_id):
+        try:
+            outcome = _generate_check_in(patient_id)
+            with summary_lock:
+                summary[outcome] += 1
+        finally:
+            capacity.release()
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="checkin-sweep") as pool:
+        for slot, patient_id in due:
+            delay = started + slot - time.monotonic()
+            if delay > 0 and _stop_event.wait(delay):
+                break
+            capacity.acquire()
+            if _stop_event.is_set():
+                capacity.release()
+                break
+            pool.submit(_run, patient_id)
+
+    logger.info(
+        f"⏰ [Scheduler] generate_all_check_ins done: "
+        f"due={len(due)}, generated={summary['generated']}, "
+        f"skipped={summary['skipped']}, failed={summary['failed']}"
+        + (" (stopped early)" if _stop_event.is_set() else "")
+    )
+    run.items_processed = summary["generated"]
+    run.error_count = summary["failed"]
+    if _stop_event.is_set():
+        run.error = "Stopped before all patients were dispatched"
+
 
 def _notify_patient_new_checkin(patient: Patient, db):
     """Send a push notification that a new check-in is ready."""
@@ -151,107 +352,242 @@ def evaluate_unevaluated_responses():
     """
     Periodic safety net: find MonitoringResponses where evaluated_severity is
     NULL and run severity evaluation on their parent check-in.
+
+    Set-based: one joined query, one bulk UPDATE, one escalation pass
+    (see severity_engine.evaluate_unevaluated_check_ins).
     """
     logger.info("⏰ [Scheduler] Running evaluate_unevaluated_responses ...")
+    with job_run(JOB_EVALUATE) as run:
+        _evaluate_responses(run)
+
+
+def _evaluate_responses(run: JobRun):
     db = SessionLocal()
 
     try:
-        from severity_engine import evaluate_check_in, handle_severity_escalation
+        from severity_engine import evaluate_unevaluated_check_ins, handle_severity_escalations
 
         # Responses missing severity that are older than 5 minutes
         # (give the normal submit flow time to evaluate first)
         cutoff = datetime.utcnow() - timedelta(minutes=5)
 
-        unevaluated = (
-            db.query(MonitoringResponse)
-            .filter(
-                MonitoringResponse.evaluated_severity.is_(None),
-                MonitoringResponse.created_at <= cutoff,
-            )
-            .all()
-        )
-
-        if not unevaluated:
+        results = evaluate_unevaluated_check_ins(db, cutoff)
+        if not results:
             logger.info("⏰ [Scheduler] No unevaluated responses found.")
             return
 
-        # Collect unique check-in IDs
-        check_in_ids = set()
-        for resp in unevaluated:
-            question = db.query(MonitoringQuestion).filter(
-                MonitoringQuestion.id == resp.question_id
-            ).first()
-            if question:
-                check_in_ids.add(question.check_in_id)
+        escalations = [
+            (r["check_in_id"], r["patient_id"], r["overall_severity"])
+            for r in results
+            if r["overall_severity"] in ("ORANGE", "RED")
+        ]
+        handle_severity_escalations(escalations, db)
+        run.items_processed = sum(r["evaluated"] for r in results)
 
-        logger.info(f"  Found {len(unevaluated)} unevaluated responses "
-                     f"across {len(check_in_ids)} check-ins.")
-
-        for ci_id in check_in_ids:
-            try:
-                eval_result = evaluate_check_in(ci_id, db)
-
-                # Get patient_id for escalation
-                ci = db.query(MonitoringCheckIn).filter(
-                    MonitoringCheckIn.id == ci_id
-                ).first()
-
-                if ci and eval_result["overall_severity"] in ("ORANGE", "RED"):
-                    handle_severity_escalation(
-                        check_in_id=ci_id,
-                        patient_id=ci.patient_id,
-                        overall_severity=eval_result["overall_severity"],
-                        db=db,
-                    )
-
-                logger.info(f"  ✔ Evaluated check-in {ci_id}: {eval_result['overall_severity']}")
-            except Exception as e:
-                logger.error(f"  ✘ Failed to evaluate check-in {ci_id}: {e}")
-                db.rollback()
+        logger.info(
+            f"⏰ [Scheduler] evaluate_unevaluated_responses done: "
+            f"responses={sum(r['evaluated'] for r in results)}, "
+            f"check_ins={len(results)}, escalated={len(escalations)}"
+        )
 
     except Exception as e:
         logger.error(f"⏰ [Scheduler] evaluate_unevaluated_responses error: {e}")
+        run.fail(e)
+        db.rollback()
     finally:
         db.close()
 
 
+# ---------------------------------------------------------------------------
+# Job 3 — Nightly daily-plan generation
+# ---------------------------------------------------------------------------
+
+def generate_nightly_daily_plans():
+    """
+    Nightly job: run the planning crew for every active patient without a plan
+    for today, with bounded concurrency under the planning admission limits.
+    """
+    logger.info("⏰ [Scheduler] Running generate_nightly_daily_plans ...")
+    with job_run(JOB_NIGHTLY_PLANS) as run:
+        _generate_daily_plans(run)
+
+
+def _generate_daily_plans(run: JobRun):
+    try:
+        from task_planner import generate_all_daily_plans
+
+        summary = generate_all_daily_plans()
+        run.items_processed = summary["generated"] + summary["kb_only"] + summary["reused"]
+        run.error_count = summary["failed"]
+        logger.info(
+            f"⏰ [Scheduler] generate_nightly_daily_plans done: "
+            f"patients={summary['patients']}, generated={summary['generated']}, "
+            f"kb_only={summary['kb_only']}, reused={summary['reused']}, "
+            f"existing={summary['existing']}, over_budget={summary['over_budget']}, "
+            f"failed={summary['failed']}"
+        )
+    except Exception as e:
+        logger.error(f"⏰ [Scheduler] generate_nightly_daily_plans error: {e}")
+        run.fail(e)
+
+
+# ---------------------------------------------------------------------------
+# Job 4 — Telemetry partition maintenance
+# ---------------------------------------------------------------------------
+
+def maintain_telemetry_partitions():
+    """
+    Daily job: create telemetry_logs partitions for the coming days, then
+    detach, archive and drop the ones past the retention window.
+    """
+    logger.info("⏰ [Scheduler] Running maintain_telemetry_partitions ...")
+    with job_run(JOB_TELEMETRY_PARTITIONS) as run:
+        _maintain_telemetry_partitions(run)
+
+
+def _maintain_telemetry_partitions(run: JobRun):
+    try:
+        from telemetry_partitions import run_partition_maintenance
+
+        summary = run_partition_maintenance()
+        run.items_processed = len(summary["created"]) + len(summary["archived"])
+        logger.info(
+            f"⏰ [Scheduler] maintain_telemetry_partitions done: "
+            f"created={len(summary['created'])}, archived={len(summary['archived'])}"
+        )
+    except Exception as e:
+        logger.error(f"⏰ [Scheduler] maintain_telemetry_partitions error: {e}")
+        run.fail(e)
+
+
 # ---------------------------------------------------------------------------
 # Lifecycle
 # ---------------------------------------------------------------------------
 
+def _last_success_started(job_id: str) -> Optional[datetime]:
+    db = SessionLocal()
+    try:
+        row = (
+            db.query(SchedulerJobRun.started_at)
+            .filter(SchedulerJobRun.job_id == job_id, SchedulerJobRun.status == RUN_COMPLETED)
+            .order_by(SchedulerJobRun.started_at.desc())
+            .first()
+        )
+        return row.started_at if row else None
+    finally:
+        db.close()
+
+
+def _as_utc(naive: datetime) -> datetime:
+    return naive.replace(tzinfo=timezone.utc)
+
+
+def _interval_first_run(job_id: str, interval: timedelta):
+    """Catch up now if the last successful run is older than one interval, else resume its cadence."""
+    now = datetime.utcnow()
+    last = _last_success_started(job_id)
+    if last is None or last + interval <= now:
+        return _as_utc(now + timedelta(seconds=SCHEDULER_CATCHUP_DELAY_SECONDS))
+    return _as_utc(last + interval)
+
+
+def _daily_first_run(job_id: str, hour: int, minute: int, grace: timedelta):
+    """Catch up the latest daily slot if it was missed less than `grace` ago, else wait for the next one."""
+    now = datetime.utcnow()
+    slot = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if slot > now:
+        slot -= timedelta(days=1)
+    last = _last_success_started(job_id)
+    if (last is None or last < slot) and now - slot <= grace:
+        return _as_utc(now + timedelta(seconds=SCHEDULER_CATCHUP_DELAY_SECONDS))
+    return undefined  # next slot per the cron trigger
+
+
 def start_scheduler():
-    """Start the APScheduler with both periodic jobs."""
+    """Start the APScheduler with the periodic jobs."""
     global _scheduler
 
     if _scheduler is not None:
         logger.warning("Scheduler already running — skipping start.")
         return
 
-    _scheduler = BackgroundScheduler()
+    _stop_event.clear()
+    # UTC so the naive utcnow() timestamps in run history and the cron hour agree
+    _scheduler = BackgroundScheduler(
+        jobstores={"default": SQLAlchemyJobStore(engine=engine, tablename="apscheduler_jobs")},
+        job_defaults={"coalesce": True, "max_instances": 1},
+        timezone=timezone.utc,
+    )
 
-    # Job 1: Generate check-ins every N hours (runs 60s after startup, then every N hours)
+    # Job 1: Generate check-ins every N hours (a sweep still spreading its
+    # slots makes the next run wait rather than overlap)
+    check_in_interval = timedelta(hours=CHECKIN_INTERVAL_HOURS)
     _scheduler.add_job(
         generate_all_check_ins,
         "interval",
         hours=CHECKIN_INTERVAL_HOURS,
-        id="generate_check_ins",
-        next_run_time=datetime.utcnow() + timedelta(seconds=60),
+        id=JOB_CHECK_INS,
+        replace_existing=True,
+        next_run_time=_interval_first_run(JOB_CHECK_INS, check_in_interval),
+        misfire_grace_time=int(check_in_interval.total_seconds()),
     )
 
-    # Job 2: Evaluate unevaluated responses every N hours (runs 2min after startup)
+    # Job 2: Evaluate unevaluated responses every N hours
+    evaluation_interval = timedelta(hours=CHECKIN_EVALUATION_HOURS)
     _scheduler.add_job(
         evaluate_unevaluated_responses,
         "interval",
         hours=CHECKIN_EVALUATION_HOURS,
-        id="evaluate_responses",
-        next_run_time=datetime.utcnow() + timedelta(minutes=2),
+        id=JOB_EVALUATE,
+        replace_existing=True,
+        next_run_time=_interval_first_run(JOB_EVALUATE, evaluation_interval),
+        misfire_grace_time=int(evaluation_interval.total_seconds()),
+    )
+
+    # Job 3: Nightly daily plans (off-peak, once a day; a late start within 2h still runs)
+    from task_planner import NIGHTLY_PLAN_HOUR, NIGHTLY_PLAN_MINUTE
+    nightly_grace = timedelta(hours=2)
+    _scheduler.add_job(
+        generate_nightly_daily_plans,
+        "cron",
+        hour=NIGHTLY_PLAN_HOUR,
+        minute=NIGHTLY_PLAN_MINUTE,
+        id=JOB_NIGHTLY_PLANS,
+        replace_existing=True,
+        next_run_time=_daily_first_run(JOB_NIGHTLY_PLANS, NIGHTLY_PLAN_HOUR, NIGHTLY_PLAN_MINUTE, nightly_grace),
+        misfire_grace_time=int(nightly_grace.total_seconds()),
+    )
+
+    # Job 4: Telemetry partitions (daily; partitions exist days ahead, so a
+    # late run only delays archival)
+    from telemetry_partitions import TELEMETRY_MAINTENANCE_HOUR
+    partitions_grace = timedelta(hours=12)
+    _scheduler.add_job(
+        maintain_telemetry_partitions,
+        "cron",
+        hour=TELEMETRY_MAINTENANCE_HOUR,
+        minute=0,
+        id=JOB_TELEMETRY_PARTITIONS,
+        replace_existing=True,
+        next_run_time=_daily_first_run(JOB_TELEMETRY_PARTITIONS, TELEMETRY_MAINTENANCE_HOUR, 0, partitions_grace),
+        misfire_grace_time=int(partitions_grace.total_seconds()),
     )
 
     _scheduler.start()
     logger.info(
-        f"✅ Scheduler started — check-ins every {CHECKIN_INTERVAL_HOURS}h, "
-        f"evaluation safety-net every {CHECKIN_EVALUATION_HOURS}h"
+        f"✅ Scheduler started — check-ins every {CHECKIN_INTERVAL_HOURS}h "
+        f"(spread over {CHECKIN_SPREAD_MINUTES}min, {CHECKIN_SWEEP_CONCURRENCY} at once), "
+        f"evaluation safety-net every {CHECKIN_EVALUATION_HOURS}h, "
+        f"daily plans at {NIGHTLY_PLAN_HOUR:02d}:{NIGHTLY_PLAN_MINUTE:02d} UTC, "
+        f"telemetry partitions at {TELEMETRY_MAINTENANCE_HOUR:02d}:00 UTC"
     )
+    for job in _scheduler.get_jobs():
+        logger.info(f"  ⏭ {job.id} first run at {job.next_run_time}")
+
+
+def get_scheduler() -> Optional[BackgroundScheduler]:
+    """The running scheduler in this process (None unless it is the leader)."""
+    return _scheduler
 
 
 def stop_scheduler():
@@ -259,6 +595,7 @@ def stop_scheduler():
     global _scheduler
 
     if _scheduler is not None:
+        _stop_event.set()
         _scheduler.shutdown(wait=False)
         _scheduler = None
         logger.info("🛑 Scheduler stopped.")
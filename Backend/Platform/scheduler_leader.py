@@ -0,0 +1,226 @@
+"""
+Scheduler Leader Election — only one process runs the APScheduler jobs.
+
+Every uvicorn worker calls start_scheduler_election() on startup, but only the
+process holding the Postgres advisory lock SCHEDULER_LOCK_KEY starts the
+scheduler. The lock lives on a dedicated connection, so it is released by
+Postgres itself as soon as the leader's process (or connection) dies; the
+followers retry every SCHEDULER_RENEW_SECONDS and one of them takes over.
+
+The leader also renews a lease row in `scheduler_leases` (holder and expiry)
+which the status endpoint reads alongside each job's run history. If the leader cannot
+renew before its lease expires (DB unreachable) it stops its scheduler and
+releases the lock; if the lock's own connection is lost it stops at once,
+since another process may already hold the lock.
+
+Advisory locks are session-scoped: DATABASE_URL must not point at a
+transaction-pooling proxy (e.g. PgBouncer in transaction mode).
+
+Settings (env vars):
+  SCHEDULER_LEASE_SECONDS   lease lifetime (default 30)
+  SCHEDULER_RENEW_SECONDS   renew / retry period (default 10)
+"""
+
+import os
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from database.session import engine, SessionLocal
+from database.models import SchedulerLease
+import scheduler
+
+logger = logging.getLogger("scheduler_leader")
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+SCHEDULER_LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", "30"))
+SCHEDULER_RENEW_SECONDS = int(os.getenv("SCHEDULER_RENEW_SECONDS", "10"))
+
+LEASE_NAME = "apscheduler"
+# Arbitrary application-wide key for pg_try_advisory_lock ("nurse-scheduler")
+SCHEDULER_LOCK_KEY = 0x6E757273655F7363
+
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_lock_conn = None  # connection holding the advisory lock while we lead
+_lease_expires: Optional[datetime] = None
+_state_lock = threading.Lock()
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def is_leader() -> bool:
+    return _lock_conn is not None
+
+
+# ---------------------------------------------------------------------------
+# Lease row
+# ---------------------------------------------------------------------------
+
+def _write_lease(acquired: bool = False, release: bool = False):
+    now = datetime.utcnow()
+    values: Dict[str, Any] = {
+        "holder": None if release else INSTANCE_ID,
+        "renewed_at": now,
+        "expires_at": now if release else now + timedelta(seconds=SCHEDULER_LEASE_SECONDS),
+    }
+    if acquired:
+        values["acquired_at"] = now
+    db = SessionLocal()
+    try:
+        db.execute(
+            pg_insert(SchedulerLease.__table__)
+            .values(name=LEASE_NAME, **values)
+            .on_conflict_do_update(index_elements=["name"], set_=values)
+        )
+        db.commit()
+    finally:
+        db.close()
+    return values["expires_at"]
+
+
+# ---------------------------------------------------------------------------
+# Election
+# ---------------------------------------------------------------------------
+
+def _try_acquire() -> bool:
+    global _lock_conn, _lease_expires
+    conn = engine.connect()
+    try:
+        got = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": SCHEDULER_LOCK_KEY}).scalar()
+        conn.commit()
+    except Exception:
+        conn.close()
+        raise
+    if not got:
+        conn.close()
+        return False
+
+    _lock_conn = conn
+    try:
+        _lease_expires = _write_lease(acquired=True)
+        scheduler.start_scheduler()
+    except Exception:
+        _step_down()
+        raise
+    logger.info(f"👑 {INSTANCE_ID} is now the scheduler leader.")
+    return True
+
+
+def _renew():
+    """Prove the lock connection is alive and push the lease expiry forward."""
+    global _lease_expires
+    try:
+        _lock_conn.execute(text("SELECT 1"))
+        _lock_conn.commit()
+    except Exception as e:
+        # The session holding the lock is gone, so the lock is too — another process may lead already
+        logger.error(f"👑 Scheduler lock connection lost ({e}); stepping down.")
+        _step_down()
+        return
+    _lease_expires = _write_lease()
+
+
+def _step_down(release_lease: bool = False):
+    global _lock_conn, _lease_expires
+    scheduler.stop_scheduler()
+    conn, _lock_conn, _lease_expires = _lock_conn, None, None
+    if conn is not None:
+        try:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SCHEDULER_LOCK_KEY})
+            conn.commit()
+        except Exception:
+            pass  # closing the connection releases the lock anyway
+        finally:
+            conn.invalidate()  # never hand a lock-holding session back to the pool
+            conn.close()
+    if release_lease:
+        try:
+            _write_lease(release=True)
+        except Exception as e:
+            logger.warning(f"Could not release scheduler lease: {e}")
+
+
+def _election_loop():
+    while not _stop.is_set():
+        with _state_lock:
+            try:
+                if is_leader():
+                    _renew()
+                else:
+                    _try_acquire()
+            except Exception as e:
+                if is_leader() and _lease_expires and datetime.utcnow() >= _lease_expires:
+                    logger.error(f"👑 Lost scheduler lease ({e}); stepping down.")
+                    _step_down()
+                elif not is_leader():
+                    logger.warning(f"Scheduler election attempt failed: {e}")
+        _stop.wait(SCHEDULER_RENEW_SECONDS)
+
+
+# ---------------------------------------------------------------------------
+# Lifecycle / status
+# ---------------------------------------------------------------------------
+
+def start_scheduler_election():
+    """Join the election; the scheduler starts here only while this process leads."""
+    global _thread
+    if _thread is not None:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_election_loop, name="scheduler-election", daemon=True)
+    _thread.start()
+    logger.info(f"✅ Scheduler election started for {INSTANCE_ID}")
+
+
+def stop_scheduler_election():
+    """Leave the election, stopping the scheduler and releasing leadership if held."""
+    global _thread
+    _stop.set()
+    with _state_lock:
+        if is_leader():
+            _step_down(release_lease=True)
+            logger.info(f"🛑 {INSTANCE_ID} released scheduler leadership.")
+    _thread = None
+
+
+def scheduler_status(db) -> Dict[str, Any]:
+    lease = db.query(SchedulerLease).filter(SchedulerLease.name == LEASE_NAME).first()
+    now = datetime.utcnow()
+    # Read straight from the persistent job store so any worker can answer
+    next_runs = {}
+    try:
+        for job_id, next_run in db.execute(text("SELECT id, next_run_time FROM apscheduler_jobs")):
+            next_runs[job_id] = (
+                datetime.fromtimestamp(next_run, tz=timezone.utc).isoformat() if next_run is not None else None
+            )
+    except Exception:
+        db.rollback()  # job store not created yet (no leader has started)
+
+    leader = None
+    if lease is not None and lease.holder:
+        leader = {
+            "instance": lease.holder,
+            "acquired_at": lease.acquired_at.isoformat() if lease.acquired_at else None,
+            "renewed_at": lease.renewed_at.isoformat() if lease.renewed_at else None,
+            "expires_at": lease.expires_at.isoformat() if lease.expires_at else None,
+            "expired": lease.expires_at is not None and lease.expires_at < now,
+        }
+
+    jobs = scheduler.last_runs(db)
+    for job_id, next_run in next_runs.items():
+        jobs.setdefault(job_id, {})["next_run_time"] = next_run
+
+    return {
+        "instance": INSTANCE_ID,
+        "is_leader": is_leader(),
+        "leader": leader,
+        "jobs": jobs,
+    }
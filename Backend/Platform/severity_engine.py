@@ -6,97 +6,81 @@ Hybrid approach:
   2. AI fallback (Gemini) for FREE_TEXT responses
 
 Severity levels: GREEN, YELLOW, ORANGE, RED
+
+Thresholds, answer mappings and keyword lists come from severity_rules.json
+(see severity_rules); evaluated responses are stamped with the rule version.
 """
 
 import logging
-from typing import Optional, List
+from datetime import datetime
+from typing import Dict, Optional, List, Tuple
+from sqlalchemy import case, exists, update
 from sqlalchemy.orm import Session
 from uuid import UUID
 
+from severity_rules import (
+    CompiledRules, current_rules, SEVERITY_ORDER,
+    RULE_RED_YES, RULE_ORANGE_YES, RULE_YELLOW_NO, RULE_FREE_TEXT_RED, RULE_FREE_TEXT_ORANGE,
+)
 from database.models import (
     MonitoringCheckIn, MonitoringQuestion, MonitoringResponse,
     Patient, alerts, CaretakerPatientLink
 )
+from alert_dedup import alert_deduplicator, ALERT_CLASS_MONITORING, ALERT_CLASS_TELEMETRY
 
 logger = logging.getLogger("severity_engine")
 
 # ---------------------------------------------------------------------------
-# Keyword-based severity rules for YES_NO questions
-# When patient answers YES to these keywords in the question → escalate
+# Rules: keyword lists, answer mappings and vitals thresholds are data in
+# severity_rules.json, compiled (and hot-reloaded) by severity_rules.
 # ---------------------------------------------------------------------------
 
-# YES → RED (immediate concern)
-RED_YES_KEYWORDS = [
-    "wound red", "oozing", "bleeding", "breathing worse",
-    "chest pain", "sudden increase", "fever",
-]
-
-# YES → ORANGE (needs attention)
-ORANGE_YES_KEYWORDS = [
-    "swelling", "dizzy", "lightheaded", "palpitation",
-    "vision changes", "phlegm color", "yellow or green",
-    "thirst", "dry mouth", "cuts", "sores",
-]
 
-# NO answer to these positive-action keywords → YELLOW (non-adherence)
-YELLOW_NO_KEYWORDS = [
-    "medication", "prescribed", "meals on schedule",
-    "fluid limits", "inhaler", "blood sugar", "weigh yourself",
-    "walk", "move around",
-]
+def keyword_hits(text: str) -> Dict[str, List[str]]:
+    """Every rule / condition-tag category the text hits, with the keywords that hit (for explaining a severity)."""
+    return current_rules().matcher.scan(text)
 
 
-def _keyword_match(text: str, keywords: List[str]) -> bool:
-    """Check if any keyword appears in the text (case-insensitive)."""
-    text_lower = text.lower()
-    return any(kw in text_lower for kw in keywords)
+def detect_condition_tags(text: str) -> List[str]:
+    """Standardized condition tags whose keywords appear in the text, in rules-file order."""
+    rules = current_rules()
+    hits = rules.matcher.hit_categories(text)
+    return [tag for tag in rules.condition_keywords if tag in hits]
 
 
-def evaluate_yes_no(question_text: str, answer: str) -> str:
+def evaluate_yes_no(question_text: str, answer: str, rules: CompiledRules = None) -> str:
     """Evaluate a YES_NO response based on question keywords."""
+    rules = rules or current_rules()
     answer_upper = answer.strip().upper()
 
     if answer_upper == "YES":
-        if _keyword_match(question_text, RED_YES_KEYWORDS):
+        hits = rules.matcher.hit_categories(question_text)
+        if RULE_RED_YES in hits:
             return "RED"
-        if _keyword_match(question_text, ORANGE_YES_KEYWORDS):
+        if RULE_ORANGE_YES in hits:
             return "ORANGE"
         # Generic YES to unknown question — neutral
-        return "YELLOW"
+        return rules.yes_otherwise
 
     if answer_upper == "NO":
-        if _keyword_match(question_text, YELLOW_NO_KEYWORDS):
+        if RULE_YELLOW_NO in rules.matcher.hit_categories(question_text):
             return "YELLOW"
         # NO to a symptom question is good
-        return "GREEN"
+        return rules.no_otherwise
 
-    return "YELLOW"  # Ambiguous
+    return rules.yes_no_ambiguous  # Ambiguous
 
 
-def evaluate_emoji_scale(answer: str) -> str:
+def evaluate_emoji_scale(answer: str, rules: CompiledRules = None) -> str:
     """Evaluate EMOJI_SCALE: GOOD / OKAY / NOT_GREAT / BAD."""
-    mapping = {
-        "GOOD": "GREEN",
-        "OKAY": "YELLOW",
-        "NOT_GREAT": "ORANGE",
-        "NOT GREAT": "ORANGE",
-        "BAD": "RED",
-    }
-    return mapping.get(answer.strip().upper(), "YELLOW")
+    rules = rules or current_rules()
+    return rules.emoji_table.get(answer.strip().upper(), rules.default_severity)
 
 
-def evaluate_comparison(answer: str) -> str:
+def evaluate_comparison(answer: str, rules: CompiledRules = None) -> str:
     """Evaluate COMPARISON: BETTER / SAME / WORSE."""
-    mapping = {
-        "BETTER": "GREEN",
-        "SAME": "YELLOW",
-        "WORSE": "ORANGE",
-    }
-    return mapping.get(answer.strip().upper(), "YELLOW")
-
-
-# Severity ordering for computing max
-SEVERITY_ORDER = {"GREEN": 0, "YELLOW": 1, "ORANGE": 2, "RED": 3}
+    rules = rules or current_rules()
+    return rules.comparison_table.get(answer.strip().upper(), rules.default_severity)
 
 
 def max_severity(severities: List[str]) -> str:
@@ -110,31 +94,34 @@ def evaluate_single_response(
     question_text: str,
     response_type: str,
     answer_value: str,
+    rules: CompiledRules = None,
 ) -> str:
     """
     Evaluate severity for a single response.
     Returns GREEN / YELLOW / ORANGE / RED.
+
+    Pass `rules` (a current_rules() snapshot) when evaluating many responses
+    so they are all judged, and stamped, with the same rule version.
     """
+    rules = rules or current_rules()
     if response_type == "YES_NO":
-        return evaluate_yes_no(question_text, answer_value)
+        return evaluate_yes_no(question_text, answer_value, rules)
     elif response_type == "EMOJI_SCALE":
-        return evaluate_emoji_scale(answer_value)
+        return evaluate_emoji_scale(answer_value, rules)
     elif response_type == "COMPARISON":
-        return evaluate_comparison(answer_value)
+        return evaluate_comparison(answer_value, rules)
     elif response_type == "FREE_TEXT":
         # For free text, do a simple keyword scan
-        text_lower = answer_value.lower()
-        red_words = ["emergency", "severe", "unbearable", "can't breathe", "bleeding", "fainted"]
-        orange_words = ["worse", "painful", "swollen", "dizzy", "nauseous", "weak"]
-        if any(w in text_lower for w in red_words):
+        hits = rules.matcher.hit_categories(answer_value)
+        if RULE_FREE_TEXT_RED in hits:
             return "RED"
-        if any(w in text_lower for w in orange_words):
+        if RULE_FREE_TEXT_ORANGE in hits:
             return "ORANGE"
         if len(answer_value.strip()) > 0:
-            return "YELLOW"  # Free text provided = worth noting
-        return "GREEN"
+            return rules.free_text_non_empty  # Free text provided = worth noting
+        return rules.free_text_empty
 
-    return "YELLOW"
+    return rules.default_severity
 
 
 def evaluate_check_in(check_in_id: UUID, db: Session) -> dict:
@@ -169,16 +156,19 @@ def evaluate_check_in(check_in_id: UUID, db: Session) -> dict:
 
     per_response = []
     severities = []
+    rules = current_rules()
 
     for resp, question in responses:
         severity = evaluate_single_response(
             question_text=question.question_text,
             response_type=question.response_type,
             answer_value=resp.answer_value,
+            rules=rules,
         )
 
         # Write severity to DB
         resp.evaluated_severity = severity
+        resp.severity_rule_version = rules.version
         severities.append(severity)
 
         per_response.append({
@@ -207,6 +197,91 @@ def evaluate_check_in(check_in_id: UUID, db: Session) -> dict:
     }
 
 
+def evaluate_unevaluated_check_ins(db: Session, created_before: datetime) -> List[dict]:
+    """
+    Set-based evaluation of every check-in that has a response with no
+    evaluated_severity created before `created_before`.
+
+    One joined query loads the responses (with question and check-in) of
+    those check-ins, severities are computed in memory and the missing ones
+    are written back (with the rule version) in a single UPDATE. Responses already evaluated are
+    not rewritten but still count towards the overall severity.
+
+    Returns one {"check_in_id", "patient_id", "overall_severity", "red_count",
+    "orange_count", "evaluated"} per check-in. Caller escalates.
+    """
+    needs_evaluation = exists().where(
+        MonitoringResponse.question_id == MonitoringQuestion.id,
+        MonitoringQuestion.check_in_id == MonitoringCheckIn.id,
+        MonitoringResponse.evaluated_severity.is_(None),
+        MonitoringResponse.created_at <= created_before,
+    )
+    rows = (
+        db.query(
+            MonitoringResponse.id,
+            MonitoringResponse.answer_value,
+            MonitoringResponse.evaluated_severity,
+            MonitoringQuestion.question_text,
+            MonitoringQuestion.response_type,
+            MonitoringCheckIn.id.label("check_in_id"),
+            MonitoringCheckIn.patient_id,
+        )
+        .join(MonitoringQuestion, MonitoringResponse.question_id == MonitoringQuestion.id)
+        .join(MonitoringCheckIn, MonitoringQuestion.check_in_id == MonitoringCheckIn.id)
+        .filter(MonitoringCheckIn.id.in_(db.query(MonitoringCheckIn.id).filter(needs_evaluation)))
+        .all()
+    )
+    if not rows:
+        return []
+
+    rules = current_rules()
+    by_check_in: Dict[UUID, dict] = {}
+    new_severities: Dict[UUID, str] = {}
+    for row in rows:
+        severity = evaluate_single_response(
+            question_text=row.question_text,
+            response_type=row.response_type,
+            answer_value=row.answer_value,
+            rules=rules,
+        )
+        if row.evaluated_severity is None:
+            new_severities[row.id] = severity
+        entry = by_check_in.setdefault(row.check_in_id, {
+            "check_in_id": row.check_in_id,
+            "patient_id": row.patient_id,
+            "severities": [],
+            "evaluated": 0,
+        })
+        entry["severities"].append(row.evaluated_severity or severity)
+        entry["evaluated"] += row.evaluated_severity is None
+
+    if new_severities:
+        db.execute(
+            update(MonitoringResponse)
+            .where(MonitoringResponse.id.in_(list(new_severities)))
+            .where(MonitoringResponse.evaluated_severity.is_(None))
+            .values(
+                evaluated_severity=case(new_severities, value=MonitoringResponse.id),
+                severity_rule_version=rules.version,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+    results = []
+    for entry in by_check_in.values():
+        severities = entry.pop("severities")
+        entry["overall_severity"] = max_severity(severities)
+        entry["red_count"] = severities.count("RED")
+        entry["orange_count"] = severities.count("ORANGE")
+        results.append(entry)
+
+    logger.info(
+        f"Bulk-evaluated {len(new_severities)} responses across {len(results)} check-ins"
+    )
+    return results
+
+
 def handle_severity_escalation(
     check_in_id: UUID,
     patient_id: UUID,
@@ -214,101 +289,106 @@ def handle_severity_escalation(
     db: Session,
 ):
     """
-    If severity is ORANGE or RED, create an alert and notify caretakers.
+    If severity is ORANGE or RED, create an alert and notify caretakers
+    (unless the patient is in cooldown for that severity, see alert_dedup).
     """
-    if overall_severity not in ("ORANGE", "RED"):
+    handle_severity_escalations([(check_in_id, patient_id, overall_severity)], db)
+
+
+def handle_severity_escalations(
+    escalations: List[Tuple[UUID, UUID, str]],
+    db: Session,
+):
+    """
+    Batched handle_severity_escalation for (check_in_id, patient_id,
+    overall_severity) tuples: patients and caretaker links are loaded with one
+    query each and all alerts are committed together before notifying.
+    Repeats within the patient's cooldown are dropped (see alert_dedup).
+    """
+    escalations = [
+        e for e in escalations
+        if e[2] in ("ORANGE", "RED")
+        and alert_deduplicator.should_fire(db, e[1], ALERT_CLASS_MONITORING, e[2])
+    ]
+    if not escalations:
         return
 
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
-    patient_name = patient.name if patient else "Unknown"
+    try:
+        patient_ids = {patient_id for _, patient_id, _ in escalations}
+        patient_names = {
+            p.id: p.name
+            for p in db.query(Patient.id, Patient.name).filter(Patient.id.in_(patient_ids)).all()
+        }
 
-    severity_label = "CRITICAL" if overall_severity == "RED" else "WARNING"
-    alert_msg = (
-        f"Monitoring check-in flagged {overall_severity} severity for {patient_name}. "
-        f"Review patient responses immediately."
-    )
+        notifications = []
+        for _, patient_id, overall_severity in escalations:
+            patient_name = patient_names.get(patient_id, "Unknown")
+            severity_label = "CRITICAL" if overall_severity == "RED" else "WARNING"
+            alert_msg = (
+                f"Monitoring check-in flagged {overall_severity} severity for {patient_name}. "
+                f"Review patient responses immediately."
+            )
 
-    # Create alert record
-    new_alert = alerts(
-        patient_id=patient_id,
-        alert_type=f"MONITORING_{severity_label}",
-        alert_message=alert_msg,
-        call_received=False,
-    )
-    db.add(new_alert)
-    db.commit()
+            # Create alert record
+            db.add(alerts(
+                patient_id=patient_id,
+                alert_type=f"MONITORING_{severity_label}",
+                alert_message=alert_msg,
+                call_received=False,
+            ))
+            title = (
+                f"🚨 URGENT: {patient_name} check-in flagged {overall_severity}"
+                if overall_severity == "RED"
+                else f"⚠️ {patient_name} check-in needs attention"
+            )
+            notifications.append((patient_id, severity_label, title, alert_msg))
+        db.commit()  # alerts and their dedup claims together
+    except Exception:
+        db.rollback()
+        for _, patient_id, overall_severity in escalations:
+            alert_deduplicator.release(patient_id, ALERT_CLASS_MONITORING, overall_severity)
+        raise
 
     # Send push notification to linked caretakers
     try:
         from notifications.service import NotificationService
 
-        caretakers = db.query(CaretakerPatientLink).filter(
-            CaretakerPatientLink.patient_id == patient_id
-        ).all()
-
-        title = (
-            f"🚨 URGENT: {patient_name} check-in flagged {overall_severity}"
-            if overall_severity == "RED"
-            else f"⚠️ {patient_name} check-in needs attention"
-        )
-
-        for ct in caretakers:
-            NotificationService.send_push_notification(
-                db=db,
-                user_id=ct.caretaker_id,
-                title=title,
-                body=alert_msg,
-                event_type=f"MONITORING_{severity_label}",
-                data={"click_action": f"/dashboard/patient/{patient_id}"},
-            )
+        caretakers_by_patient: Dict[UUID, list] = {}
+        for link in db.query(CaretakerPatientLink).filter(
+            CaretakerPatientLink.patient_id.in_(patient_ids)
+        ).all():
+            caretakers_by_patient.setdefault(link.patient_id, []).append(link.caretaker_id)
+
+        for patient_id, severity_label, title, alert_msg in notifications:
+            for caretaker_id in caretakers_by_patient.get(patient_id, []):
+                NotificationService.send_push_notification(
+                    db=db,
+                    user_id=caretaker_id,
+                    title=title,
+                    body=alert_msg,
+                    event_type=f"MONITORING_{severity_label}",
+                    data={"click_action": f"/dashboard/patient/{patient_id}"},
+                )
     except Exception as e:
         logger.error(f"Failed to send monitoring escalation notification: {e}")
 
 def evaluate_vitals_severity(hr: int | None = None, bp: str | None = None, spo2: int | None = None) -> str:
-    """Evaluate raw vitals data against critical thresholds."""
-    if spo2 is not None and spo2 < 90:
-        return "RED"
-    if hr is not None and (hr > 130 or hr < 40):
-        return "RED"
-    if hr is not None and (hr > 110 or hr < 50):
-        return "ORANGE"
-    
+    """Evaluate raw vitals data against the critical thresholds in the severity rules (worst vital wins)."""
+    rules = current_rules()
+    severities = [
+        rules.vital_severity("spo2", spo2),
+        rules.vital_severity("heart_rate", hr),
+    ]
+
     if bp:
         try:
             sys, dia = map(int, bp.split('/'))
-            if sys > 180 or sys < 90 or dia > 120 or dia < 60:
-                return "RED"
-            if sys > 140 or dia > 90:
-                return "ORANGE"
+            severities.append(rules.vital_severity("systolic", sys))
+            severities.append(rules.vital_severity("diastolic", dia))
         except Exception:
             pass
 
-    return "GREEN"
-
-
-def check_telemetry_anomalies(patient_id: UUID, db: Session) -> bool:
-    """
-    Check if the last 6 telemetry readings (for the past 3 minutes) all exceed
-    normal thresholds (i.e., evaluate_vitals_severity != GREEN).
-    """
-    from database.models import TelemetryLog
-    logs = (
-        db.query(TelemetryLog)
-        .filter(TelemetryLog.patient_id == patient_id)
-        .order_by(TelemetryLog.timestamp.desc())
-        .limit(6)
-        .all()
-    )
-
-    if len(logs) < 6:
-        return False
-
-    for log in logs:
-        sev = evaluate_vitals_severity(log.heart_rate, log.blood_pressure, log.spo2)
-        if sev == "GREEN":
-            return False
-
-    return True
+    return max_severity(severities)
 
 
 def handle_telemetry_escalation(
@@ -318,28 +398,36 @@ def handle_telemetry_escalation(
 ):
     """
     Called when a sustained anomaly is detected.
-    Creates an alert and sends a push notification to both Caretaker and Patient.
+    Creates an alert and sends a push notification to both Caretaker and Patient,
+    at most once per cooldown for the same severity (see alert_dedup).
     """
     if overall_severity not in ("ORANGE", "RED"):
         return
+    if not alert_deduplicator.should_fire(db, patient_id, ALERT_CLASS_TELEMETRY, overall_severity):
+        return
 
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
-    patient_name = patient.name if patient else "Unknown"
+    try:
+        patient = db.query(Patient).filter(Patient.id == patient_id).first()
+        patient_name = patient.name if patient else "Unknown"
 
-    severity_label = "CRITICAL" if overall_severity == "RED" else "WARNING"
-    alert_msg = (
-        f"Continuous monitoring detected sustained abnormal vitals for {patient_name}."
-    )
+        severity_label = "CRITICAL" if overall_severity == "RED" else "WARNING"
+        alert_msg = (
+            f"Continuous monitoring detected sustained abnormal vitals for {patient_name}."
+        )
 
-    # Create alert record
-    new_alert = alerts(
-        patient_id=patient_id,
-        alert_type=f"TELEMETRY_{severity_label}",
-        alert_message=alert_msg,
-        call_received=False,
-    )
-    db.add(new_alert)
-    db.commit()
+        # Create alert record
+        new_alert = alerts(
+            patient_id=patient_id,
+            alert_type=f"TELEMETRY_{severity_label}",
+            alert_message=alert_msg,
+            call_received=False,
+        )
+        db.add(new_alert)
+        db.commit()  # the alert and its dedup claim together
+    except Exception:
+        db.rollback()
+        alert_deduplicator.release(patient_id, ALERT_CLASS_TELEMETRY, overall_severity)
+        raise
 
     # Send push notification
     try:
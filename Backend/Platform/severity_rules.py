@@ -0,0 +1,184 @@
+"""
+Severity Rules — clinical thresholds and keyword lists as versioned data.
+
+The rules live in severity_rules.json (or SEVERITY_RULES_PATH) instead of
+code, so a clinical tweak is a file change rather than a redeploy. At load
+time they are compiled into:
+  - one KeywordMatcher over every keyword list (YES/NO question rules,
+    free-text rules, condition-tag keywords),
+  - dict lookup tables for EMOJI_SCALE / COMPARISON answers,
+  - per-vital bound tables, checked most severe first.
+
+current_rules() re-checks the file's mtime at most every
+SEVERITY_RULES_CHECK_SECONDS and swaps in a freshly compiled rule set when it
+changed. A file that fails to parse or validate is logged and ignored; the
+previous rules stay active. Every evaluated_severity is stored with the
+`version` of the rules that produced it.
+
+Settings (env vars):
+  SEVERITY_RULES_PATH            (default: severity_rules.json next to this module)
+  SEVERITY_RULES_CHECK_SECONDS   (default 5)
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from keyword_matcher import KeywordMatcher
+
+logger = logging.getLogger("severity_rules")
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+SEVERITY_RULES_PATH = os.getenv(
+    "SEVERITY_RULES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "severity_rules.json"),
+)
+SEVERITY_RULES_CHECK_SECONDS = int(os.getenv("SEVERITY_RULES_CHECK_SECONDS", "5"))
+
+SEVERITIES = ("GREEN", "YELLOW", "ORANGE", "RED")
+# Severity ordering for computing max
+SEVERITY_ORDER = {"GREEN": 0, "YELLOW": 1, "ORANGE": 2, "RED": 3}
+
+# Matcher categories for the answer rules (condition tags use their own names)
+RULE_RED_YES = "YES:RED"
+RULE_ORANGE_YES = "YES:ORANGE"
+RULE_YELLOW_NO = "NO:YELLOW"
+RULE_FREE_TEXT_RED = "FREE_TEXT:RED"
+RULE_FREE_TEXT_ORANGE = "FREE_TEXT:ORANGE"
+
+VITAL_FIELDS = ("spo2", "heart_rate", "systolic", "diastolic")
+
+
+class SeverityRulesError(ValueError):
+    """The rules file is malformed; the previous rules stay in force."""
+
+
+def _severity(value: Any, where: str) -> str:
+    if value not in SEVERITIES:
+        raise SeverityRulesError(f"{where}: unknown severity {value!r}")
+    return value
+
+
+def _keywords(value: Any, where: str) -> List[str]:
+    if not isinstance(value, list) or not all(isinstance(kw, str) for kw in value):
+        raise SeverityRulesError(f"{where}: expected a list of strings")
+    return value
+
+
+class CompiledRules:
+    """An immutable, compiled rule set. Build with CompiledRules(raw_json_dict)."""
+
+    def __init__(self, raw: Dict[str, Any]):
+        try:
+            self.version = str(raw["version"])
+            self.default_severity = _severity(raw.get("default_severity", "YELLOW"), "default_severity")
+
+            yes = raw["yes_no"]["yes"]
+            no = raw["yes_no"]["no"]
+            self.yes_otherwise = _severity(yes["otherwise"], "yes_no.yes.otherwise")
+            self.no_otherwise = _severity(no["otherwise"], "yes_no.no.otherwise")
+            self.yes_no_ambiguous = _severity(raw["yes_no"]["ambiguous"], "yes_no.ambiguous")
+
+            self.emoji_table = {k.upper(): _severity(v, f"emoji_scale.{k}") for k, v in raw["emoji_scale"].items()}
+            self.comparison_table = {k.upper(): _severity(v, f"comparison.{k}") for k, v in raw["comparison"].items()}
+
+            free_text = raw["free_text"]
+            self.free_text_non_empty = _severity(free_text["non_empty"], "free_text.non_empty")
+            self.free_text_empty = _severity(free_text["empty"], "free_text.empty")
+
+            self.condition_keywords = {
+                tag: _keywords(kws, f"condition_keywords.{tag}")
+                for tag, kws in raw.get("condition_keywords", {}).items()
+            }
+
+            self.matcher = KeywordMatcher({
+                RULE_RED_YES: _keywords(yes.get("RED", []), "yes_no.yes.RED"),
+                RULE_ORANGE_YES: _keywords(yes.get("ORANGE", []), "yes_no.yes.ORANGE"),
+                RULE_YELLOW_NO: _keywords(no.get("YELLOW", []), "yes_no.no.YELLOW"),
+                RULE_FREE_TEXT_RED: _keywords(free_text.get("RED", []), "free_text.RED"),
+                RULE_FREE_TEXT_ORANGE: _keywords(free_text.get("ORANGE", []), "free_text.ORANGE"),
+                **self.condition_keywords,
+            })
+
+            # vital -> [(severity, above, below)], most severe first
+            self.vital_bounds: Dict[str, List[Tuple[str, Optional[float], Optional[float]]]] = {}
+            for field, levels in raw.get("vitals", {}).items():
+                if field not in VITAL_FIELDS:
+                    raise SeverityRulesError(f"vitals.{field}: unknown vital")
+                bounds = [
+                    (_severity(level, f"vitals.{field}"), limits.get("above"), limits.get("below"))
+                    for level, limits in levels.items()
+                ]
+                bounds.sort(key=lambda b: SEVERITY_ORDER[b[0]], reverse=True)
+                self.vital_bounds[field] = bounds
+        except (KeyError, TypeError, AttributeError) as e:
+            raise SeverityRulesError(f"missing or malformed rule: {e!r}") from e
+
+    def vital_severity(self, field: str, value: Optional[float]) -> str:
+        if value is None:
+            return "GREEN"
+        for severity, above, below in self.vital_bounds.get(field, ()):
+            if (above is not None and value > above) or (below is not None and value < below):
+                return severity
+        return "GREEN"
+
+
+# ---------------------------------------------------------------------------
+# Loading / hot reload
+# ---------------------------------------------------------------------------
+
+_rules: Optional[CompiledRules] = None
+_rules_mtime: Optional[float] = None
+_next_check = 0.0
+_lock = threading.Lock()
+
+
+def load_rules(path: str = None) -> CompiledRules:
+    """Parse and compile a rules file (raises SeverityRulesError / OSError)."""
+    with open(path or SEVERITY_RULES_PATH, "r", encoding="utf-8") as f:
+        try:
+            raw = json.load(f)
+        except json.JSONDecodeError as e:
+            raise SeverityRulesError(f"invalid JSON: {e}") from e
+    return CompiledRules(raw)
+
+
+def _reload_if_changed():
+    global _rules, _rules_mtime
+    try:
+        mtime = os.path.getmtime(SEVERITY_RULES_PATH)
+    except OSError as e:
+        if _rules is None:
+            raise
+        logger.error(f"Severity rules file not readable, keeping v{_rules.version}: {e}")
+        return
+    if _rules is not None and mtime == _rules_mtime:
+        return
+    try:
+        rules = load_rules()
+    except (SeverityRulesError, OSError) as e:
+        if _rules is None:
+            raise
+        logger.error(f"Severity rules reload failed, keeping v{_rules.version}: {e}")
+        _rules_mtime = mtime  # don't retry the same broken file every check
+        return
+    previous = _rules.version if _rules else None
+    _rules, _rules_mtime = rules, mtime
+    logger.info(f"Severity rules v{rules.version} loaded" + (f" (was v{previous})" if previous else ""))
+
+
+def current_rules() -> CompiledRules:
+    """The active rule set, reloaded when the file changed (checked at most every few seconds)."""
+    global _next_check
+    now = time.monotonic()
+    if _rules is None or now >= _next_check:
+        with _lock:
+            if _rules is None or now >= _next_check:
+                _reload_if_changed()
+                _next_check = now + SEVERITY_RULES_CHECK_SECONDS
+    return _rules
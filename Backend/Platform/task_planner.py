@@ -0,0 +1,299 @@
+"""
+Daily Plan Generation — shared by the task routes and the nightly batch.
+
+The planning crew takes minutes per patient, so running it only when a user
+opens the tasks page piles those runs up in the morning. The nightly batch
+(scheduler job `nightly_daily_plans`) instead builds the patient context and
+generates today's plan for every active patient off-peak; the generate
+endpoint then returns the precomputed tasks without an LLM call. Plan days
+are UTC dates, matching the scheduler's clock.
+
+Before running the crew, both paths try to reuse a recent plan whose
+planning context hashed the same (see plan_reuse). Otherwise the plan's
+baseline comes from the task KB without an LLM (medical_agents.task_kb); the
+crew only writes SMART_REMEDIATION alternatives for repeatedly skipped tasks,
+or the whole plan when a condition has no KB protocol.
+
+Batch runs go through the same gates as interactive ones:
+  - token budget (hard limit skips the patient, soft limit runs degraded)
+  - the planning admission controller, so the batch never holds more than
+    its share of planning slots and backs off while Groq is rate limiting
+
+Settings (env vars):
+  NIGHTLY_PLAN_HOUR / NIGHTLY_PLAN_MINUTE   UTC time of the batch (default 02:30)
+  NIGHTLY_PLAN_CONCURRENCY                  plans generated in parallel (default 1)
+  NIGHTLY_PLAN_ACTIVE_DAYS                  a patient is active if they had tasks
+                                            within this many days or have an account (default 14)
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from database.session import SessionLocal
+from database.models import DailyTask, Patient, User
+from medical_agents.crew import MedicalCrew
+from medical_agents.output_parsing import parse_list
+from medical_agents.tasks import DAILY_PLAN_TASK, REMEDIATION_TASK
+from medical_agents.task_kb import baseline_plan, remediation_fallback, remediation_hints
+from token_budget import enforce_budget, metered, TokenBudgetExceeded, FEATURE_PLANNING
+from admission import planning_admission, AdmissionRejected, ADMISSION_MAX_WAIT_S, holding, note_rate_limited
+from plan_fingerprint import context_hash
+from plan_reuse import find_reusable_plan, record_plan
+
+logger = logging.getLogger("task_planner")
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+NIGHTLY_PLAN_HOUR = int(os.getenv("NIGHTLY_PLAN_HOUR", "2"))
+NIGHTLY_PLAN_MINUTE = int(os.getenv("NIGHTLY_PLAN_MINUTE", "30"))
+NIGHTLY_PLAN_CONCURRENCY = int(os.getenv("NIGHTLY_PLAN_CONCURRENCY", "1"))
+NIGHTLY_PLAN_ACTIVE_DAYS = int(os.getenv("NIGHTLY_PLAN_ACTIVE_DAYS", "14"))
+NIGHTLY_PLAN_ADMIT_ATTEMPTS = 5
+
+AI_TASK_SOURCES = ["AI_GENERATED", "KB_BASELINE", "SMART_REMEDIATION"]
+
+
+class PlanGenerationError(Exception):
+    """The planner returned nothing usable."""
+
+    def __init__(self, raw_output: str):
+        self.raw_output = raw_output
+        super().__init__(f"AI Output Parse Error. Raw Output: {raw_output[:200]}...")
+
+
+# ---------------------------------------------------------------------------
+# Building blocks (used by routes/tasks.py and the batch)
+# ---------------------------------------------------------------------------
+
+def ai_tasks_for_day(db: Session, patient_id, day: date = None):
+    """Query for the patient's AI-planned tasks (not MANUAL ones) scheduled on `day`."""
+    day = day or datetime.utcnow().date()
+    return db.query(DailyTask).filter(
+        DailyTask.patient_id == patient_id,
+        DailyTask.scheduled_date >= datetime.combine(day, datetime.min.time()),
+        DailyTask.scheduled_date <= datetime.combine(day, datetime.max.time()),
+        DailyTask.source.in_(AI_TASK_SOURCES),
+    )
+
+
+def build_planning_input(db: Session, patient_id) -> Dict[str, Any]:
+    """Patient context for the planner (contains "error" if the patient is missing)."""
+    from routes.patient_context import build_patient_context
+    return build_patient_context(patient_id, db)
+
+
+def on_planning_event(event: dict):
+    if event.get("status") == "RATE_LIMITED":
+        note_rate_limited(event.get("wait_s", 0))
+
+
+def plan_without_llm(context: Dict[str, Any]) -> Optional[List[dict]]:
+    """
+    The KB plan when nothing needs the LLM: every condition has a protocol and
+    no task is repeatedly skipped. None otherwise (use run_planner).
+    """
+    if context.get("repeatedly_skipped_tasks"):
+        return None
+    return baseline_plan(context)
+
+
+def run_planner(patient_id, context: Dict[str, Any], degraded: bool = False) -> List[dict]:
+    """
+    Build the plan, calling the LLM only for what the task KB cannot provide,
+    and return the validated task dicts. Raises PlanGenerationError if the
+    full planner returns nothing usable. Callers hold a planning admission
+    slot around this.
+    """
+    baseline = baseline_plan(context)
+    if baseline is None:
+        return _run_full_planner(patient_id, context, degraded)
+    return baseline_with_remediation(patient_id, context, baseline, degraded)
+
+
+def _run_full_planner(patient_id, context: Dict[str, Any], degraded: bool) -> List[dict]:
+    patient_data_str = json.dumps(context, default=str)
+    crew = MedicalCrew(patient_id=str(patient_id), degraded=degraded)
+    with metered(patient_id, FEATURE_PLANNING):
+        result = crew.run_planning_crew(patient_data_str, on_event=on_planning_event)
+
+    # JSON array of PlannedTask; source/priority normalized by the schema coercer
+    tasks = parse_list(result, DAILY_PLAN_TASK.output_schema, "Task Planner Agent")
+    if not tasks:
+        output_str = str(getattr(result, "raw", result))
+        logger.warning(f"Planning crew returned unparseable output for patient {patient_id}: {output_str}")
+        raise PlanGenerationError(output_str)
+    return tasks
+
+
+def baseline_with_remediation(patient_id, context: Dict[str, Any], baseline: List[dict],
+                              degraded: bool = False) -> List[dict]:
+    """
+    KB baseline minus the repeatedly skipped tasks, plus one easier alternative
+    per skipped task. Only the alternatives come from the LLM (a prompt with
+    just the skipped tasks and KB hints); degraded runs and failed LLM calls
+    use the KB's own remediation hints instead.
+    """
+    skipped = context.get("repeatedly_skipped_tasks") or []
+    if not skipped:
+        return baseline
+
+    skipped_names = {str(item.get("task", "")).lower() for item in skipped}
+    plan = [task for task in baseline if task["task_description"].lower() not in skipped_names]
+
+    deltas = []
+    if not degraded:
+        remediation_data = json.dumps({
+            "repeatedly_skipped_tasks": skipped,
+            "compliance_by_category": (context.get("compliance") or {}).get("by_category"),
+            "risk_level": (context.get("risk") or {}).get("level"),
+            "kb_remediation_hints": remediation_hints(context),
+            "planned_tasks": [task["task_description"] for task in plan],
+        }, default=str)
+        try:
+            crew = MedicalCrew(patient_id=str(patient_id))
+            with metered(patient_id, FEATURE_PLANNING):
+                result = crew.run_remediation_crew(remediation_data, on_event=on_planning_event)
+            deltas = parse_list(result, REMEDIATION_TASK.output_schema, "Task Remediation Agent")
+        except Exception as e:
+            logger.error(f"Remediation crew failed for patient {patient_id}, using KB hints: {e}")
+
+    if not deltas:
+        deltas = remediation_fallback(context)
+    for task in deltas[:len(skipped)]:
+        task["source"] = "SMART_REMEDIATION"
+        plan.append(task)
+    return plan
+
+
+def save_plan(db: Session, patient_id, items: List[dict], day: date = None,
+              plan_hash: str = None, reused_from=None) -> List[DailyTask]:
+    """Create the day's DailyTask rows and, with `plan_hash`, the daily_plans record used for reuse."""
+    day = day or datetime.utcnow().date()
+    if plan_hash:
+        record_plan(db, patient_id, day, plan_hash, items, reused_from=reused_from)
+    generated_tasks = []
+    for item in items:
+        new_task = DailyTask(
+            id=uuid.uuid4(),
+            patient_id=patient_id,
+            task_description=item["task_description"],
+            category=item["category"],
+            scheduled_date=datetime.combine(day, datetime.min.time()),
+            status_patient="PENDING",
+            status_caretaker="PENDING",
+            source=item["source"],
+            priority=item["priority"],
+        )
+        db.add(new_task)
+        generated_tasks.append(new_task)
+    db.commit()
+    return generated_tasks
+
+
+def reuse_plan(db: Session, patient_id, context: Dict[str, Any], day: date = None) -> Optional[List[DailyTask]]:
+    """Clone a recent plan with the same context hash for `day`; None if there is none to reuse."""
+    day = day or datetime.utcnow().date()
+    plan_hash = context_hash(context)
+    source_plan = find_reusable_plan(db, patient_id, plan_hash, day)
+    if source_plan is None:
+        return None
+    logger.info(f"Reusing plan from {source_plan.plan_date} for patient {patient_id} (context unchanged)")
+    return save_plan(db, patient_id, source_plan.tasks, day, plan_hash=plan_hash, reused_from=source_plan)
+
+
+# ---------------------------------------------------------------------------
+# Nightly batch
+# ---------------------------------------------------------------------------
+
+def active_patients_without_plan(db: Session, day: date) -> List[uuid.UUID]:
+    """Active patients (recent tasks or a login account) with no AI plan for `day` yet."""
+    since = datetime.combine(day - timedelta(days=NIGHTLY_PLAN_ACTIVE_DAYS), datetime.min.time())
+    recently_planned = db.query(DailyTask.patient_id).filter(DailyTask.scheduled_date >= since)
+    with_account = db.query(User.patient_id).filter(User.patient_id.isnot(None))
+    already_planned = db.query(DailyTask.patient_id).filter(
+        DailyTask.scheduled_date >= datetime.combine(day, datetime.min.time()),
+        DailyTask.scheduled_date <= datetime.combine(day, datetime.max.time()),
+        DailyTask.source.in_(AI_TASK_SOURCES),
+    )
+    rows = db.query(Patient.id).filter(
+        or_(Patient.id.in_(recently_planned), Patient.id.in_(with_account)),
+        ~Patient.id.in_(already_planned),
+    ).all()
+    return [row.id for row in rows]
+
+
+def _admit_batch_run():
+    """A planning slot for a batch run; waits out load shedding instead of failing."""
+    for attempt in range(NIGHTLY_PLAN_ADMIT_ATTEMPTS):
+        try:
+            return planning_admission.try_admit(critical=False, max_wait_s=ADMISSION_MAX_WAIT_S)
+        except AdmissionRejected as e:
+            if attempt == NIGHTLY_PLAN_ADMIT_ATTEMPTS - 1:
+                raise
+            time.sleep(min(e.retry_after, 300))
+
+
+def _plan_patient(patient_id: uuid.UUID, day: date) -> str:
+    """Generate and store one patient's plan. Returns the outcome for the batch summary."""
+    db = SessionLocal()
+    try:
+        # A user may have generated it interactively since the batch started
+        if ai_tasks_for_day(db, patient_id, day).count() > 0:
+            return "existing"
+
+        try:
+            budget = enforce_budget(db, patient_id, FEATURE_PLANNING)
+        except TokenBudgetExceeded:
+            return "over_budget"
+
+        context = build_planning_input(db, patient_id)
+        if "error" in context:
+            return "failed"
+
+        if reuse_plan(db, patient_id, context, day) is not None:
+            return "reused"
+
+        kb_tasks = plan_without_llm(context)
+        if kb_tasks is not None:
+            save_plan(db, patient_id, kb_tasks, day, plan_hash=context_hash(context))
+            return "kb_only"
+
+        with holding(_admit_batch_run()):
+            items = run_planner(patient_id, context, degraded=budget.degraded)
+        save_plan(db, patient_id, items, day, plan_hash=context_hash(context))
+        return "generated"
+    except Exception as e:
+        logger.error(f"  ✘ Nightly plan failed for patient {patient_id}: {e}")
+        db.rollback()
+        return "failed"
+    finally:
+        db.close()
+
+
+def generate_all_daily_plans(day: date = None) -> Dict[str, int]:
+    """Generate `day`'s plan (default today) for every active patient that has none."""
+    day = day or datetime.utcnow().date()
+    db = SessionLocal()
+    try:
+        patient_ids = active_patients_without_plan(db, day)
+    finally:
+        db.close()
+
+    summary = {"patients": len(patient_ids), "generated": 0, "reused": 0, "kb_only": 0, "existing": 0, "over_budget": 0, "failed": 0}
+    if not patient_ids:
+        return summary
+
+    with ThreadPoolExecutor(max_workers=max(NIGHTLY_PLAN_CONCURRENCY, 1), thread_name_prefix="nightly-plan") as pool:
+        for outcome in pool.map(lambda pid: _plan_patient(pid, day), patient_ids):
+            summary[outcome] += 1
+    return summary
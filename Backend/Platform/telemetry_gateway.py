@@ -0,0 +1,232 @@
+"""
+Telemetry Gateway Channel — one long-lived WebSocket per device gateway.
+
+Gateways that relay wearables for many patients connect once to
+/ws/telemetry/gateway instead of paying an HTTP handshake, auth and JSON
+envelope per reading. Readings for any number of patients are multiplexed
+over the socket, buffered server-side and written with ingest_readings() in
+batches of TELEMETRY_GATEWAY_FLUSH_SIZE readings or every
+TELEMETRY_GATEWAY_FLUSH_MS, whichever comes first.
+
+Auth: `?token=` is either TELEMETRY_GATEWAY_TOKEN (shared gateway secret)
+or the JWT of an ADMIN / NURSE / DOCTOR user.
+
+Protocol (JSON text frames):
+  gateway -> {"type": "READINGS", "seq": 17, "readings": [
+                 {"patient_id": "...", "heart_rate": 88, "blood_pressure": "120/80",
+                  "spo2": 97, "timestamp": "2026-01-01T10:00:00Z"}, ...]}
+  server  -> {"type": "ACK", "seqs": [16, 17], "accepted": 412, "invalid": 0,
+              "patients": {patient_id: {"accepted", "alert_triggered", "severity"} | {"error"}}}
+             once the frames' readings are committed (at-least-once: resend
+             anything unacknowledged after a reconnect)
+  server  -> {"type": "NACK", "seqs": [...], "error": "..."} when a flush failed
+  server  -> {"type": "BACKPRESSURE", "paused": true|false, "pending": n}
+             the server stops reading frames while TELEMETRY_GATEWAY_MAX_PENDING
+             readings are waiting to be written, and resumes once the buffer
+             drained below half of it
+  gateway -> {"type": "PING"}   server -> {"type": "PONG"}
+
+Settings (env vars):
+  TELEMETRY_GATEWAY_TOKEN        shared secret for gateways (unset: JWT only)
+  TELEMETRY_GATEWAY_FLUSH_SIZE   (default 500)
+  TELEMETRY_GATEWAY_FLUSH_MS     (default 1000)
+  TELEMETRY_GATEWAY_MAX_PENDING  (default 5000)
+"""
+
+import os
+import hmac
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from fastapi import WebSocket, WebSocketDisconnect, status
+
+from database.session import SessionLocal
+from database.models import User, UserRole
+from auth.security import decode_token
+from telemetry_stream import ingest_readings
+
+logger = logging.getLogger("telemetry_gateway")
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+TELEMETRY_GATEWAY_TOKEN = os.getenv("TELEMETRY_GATEWAY_TOKEN")
+TELEMETRY_GATEWAY_FLUSH_SIZE = int(os.getenv("TELEMETRY_GATEWAY_FLUSH_SIZE", "500"))
+TELEMETRY_GATEWAY_FLUSH_MS = int(os.getenv("TELEMETRY_GATEWAY_FLUSH_MS", "1000"))
+TELEMETRY_GATEWAY_MAX_PENDING = int(os.getenv("TELEMETRY_GATEWAY_MAX_PENDING", "5000"))
+
+_STAFF_ROLES = (UserRole.ADMIN, UserRole.NURSE, UserRole.DOCTOR)
+
+
+def authenticate_gateway(token: Optional[str]) -> Optional[str]:
+    """Gateway identity for a connection token, or None if it may not stream telemetry."""
+    if not token:
+        return None
+    if TELEMETRY_GATEWAY_TOKEN and hmac.compare_digest(token, TELEMETRY_GATEWAY_TOKEN):
+        return "gateway-token"
+
+    payload = decode_token(token)
+    if not payload:
+        return None
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == payload.get("sub")).first()
+        if user and user.is_active and user.role in _STAFF_ROLES:
+            return f"user:{user.id}"
+        return None
+    finally:
+        db.close()
+
+
+def _parse_reading(raw: Any) -> Optional[Dict[str, Any]]:
+    if not isinstance(raw, dict) or not raw.get("patient_id"):
+        return None
+    try:
+        timestamp = raw.get("timestamp")
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        return {
+            "patient_id": str(UUID(str(raw["patient_id"]))),  # canonical form, as stored
+            "heart_rate": int(raw["heart_rate"]) if raw.get("heart_rate") is not None else None,
+            "blood_pressure": str(raw["blood_pressure"]) if raw.get("blood_pressure") else None,
+            "spo2": int(raw["spo2"]) if raw.get("spo2") is not None else None,
+            "timestamp": timestamp if isinstance(timestamp, datetime) else None,
+        }
+    except (TypeError, ValueError):
+        return None
+
+
+def _ingest(readings: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        return ingest_readings(db, readings)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class GatewaySession:
+    """Buffers one gateway connection's readings and flushes them in batches."""
+
+    def __init__(self, websocket: WebSocket, gateway_id: str):
+        self.websocket = websocket
+        self.gateway_id = gateway_id
+        self.pending: List[Dict[str, Any]] = []
+        self.pending_seqs: List[int] = []
+        self.invalid = 0
+        self.flush_now = asyncio.Event()
+        self.drained = asyncio.Event()
+        self.drained.set()
+        self.send_lock = asyncio.Lock()
+
+    async def send(self, message: Dict[str, Any]):
+        async with self.send_lock:
+            await self.websocket.send_json(message)
+
+    async def run(self):
+        receiver = asyncio.create_task(self._receive_loop())
+        flusher = asyncio.create_task(self._flush_loop())
+        try:
+            # Either side ending ends the session: a disconnect stops the
+            # receiver, a failed ACK/NACK send stops the flusher
+            done, _ = await asyncio.wait({receiver, flusher}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            receiver.cancel()
+            flusher.cancel()
+            self.drained.set()
+            await asyncio.gather(receiver, flusher, return_exceptions=True)
+            if self.pending:
+                # Never acknowledged: the gateway resends them after reconnecting
+                logger.info(f"Gateway {self.gateway_id} left with {len(self.pending)} unacknowledged readings")
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+
+    async def _receive_loop(self):
+        while True:
+            if len(self.pending) >= TELEMETRY_GATEWAY_MAX_PENDING:
+                # Stop reading frames (TCP backpressure) until the buffer drains
+                self.drained.clear()
+                self.flush_now.set()
+                await self.send({"type": "BACKPRESSURE", "paused": True, "pending": len(self.pending)})
+                await self.drained.wait()
+                await self.send({"type": "BACKPRESSURE", "paused": False, "pending": len(self.pending)})
+
+            data = await self.websocket.receive_json()
+            kind = data.get("type") if isinstance(data, dict) else None
+
+            if kind == "PING":
+                await self.send({"type": "PONG"})
+            elif kind == "READINGS":
+                for raw in data.get("readings") or []:
+                    reading = _parse_reading(raw)
+                    if reading is None:
+                        self.invalid += 1
+                    else:
+                        self.pending.append(reading)
+                if data.get("seq") is not None:
+                    self.pending_seqs.append(data["seq"])
+                if len(self.pending) >= TELEMETRY_GATEWAY_FLUSH_SIZE:
+                    self.flush_now.set()
+            else:
+                await self.send({"type": "ERROR", "error": f"Unknown message type: {kind}"})
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_now.wait(), timeout=TELEMETRY_GATEWAY_FLUSH_MS / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_now.clear()
+            if self.pending or self.pending_seqs:
+                await self._flush()
+
+    async def _flush(self):
+        batch, self.pending = self.pending, []
+        seqs, self.pending_seqs = self.pending_seqs, []
+        invalid, self.invalid = self.invalid, 0
+        try:
+            try:
+                outcomes = await asyncio.to_thread(_ingest, batch) if batch else {}
+            except Exception as e:
+                logger.error(f"Gateway {self.gateway_id} flush of {len(batch)} readings failed: {e}")
+                await self.send({"type": "NACK", "seqs": seqs, "error": "Failed to store readings"})
+            else:
+                await self.send({
+                    "type": "ACK",
+                    "seqs": seqs,
+                    "accepted": sum(o.get("accepted", 0) for o in outcomes.values()),
+                    "invalid": invalid,
+                    "patients": outcomes,
+                })
+        finally:
+            # Even when the send fails: never leave the receiver paused on a dead flusher
+            if not self.drained.is_set() and len(self.pending) < TELEMETRY_GATEWAY_MAX_PENDING // 2:
+                self.drained.set()
+
+
+async def serve_gateway(websocket: WebSocket):
+    """Handle one gateway connection (auth, then the READINGS/ACK loop until it disconnects)."""
+    gateway_id = await asyncio.to_thread(authenticate_gateway, websocket.query_params.get("token"))
+    if not gateway_id:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    logger.info(f"Telemetry gateway connected: {gateway_id}")
+    try:
+        await GatewaySession(websocket, gateway_id).run()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Telemetry gateway {gateway_id} error: {e}")
+        try:
+            await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+        except Exception:
+            pass
+    logger.info(f"Telemetry gateway disconnected: {gateway_id}")
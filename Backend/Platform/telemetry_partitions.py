@@ -0,0 +1,242 @@
+"""
+Telemetry Partitions — daily range partitions, retention and archival for telemetry_logs.
+
+telemetry_logs is declared `PARTITION BY RANGE (timestamp)` with one
+partition per UTC day (telemetry_logs_pYYYYMMDD) plus a DEFAULT partition
+that catches readings outside every daily range (e.g. a device with a wrong
+clock). Inserts and queries keep going through `telemetry_logs`. Postgres
+routes rows to a partition and prunes partitions from time-bounded queries.
+Each partition has its own small indexes, so insert cost no longer grows with
+the table.
+
+ensure_partitions() (every process at startup, and the daily maintenance job)
+creates partitions from yesterday to TELEMETRY_PARTITIONS_AHEAD_DAYS ahead.
+A new partition takes over any rows in its range from the DEFAULT partition
+before it is attached.
+
+archive_expired_partitions() (daily, on the scheduler leader) handles
+partitions older than TELEMETRY_RETENTION_DAYS. It detaches each one,
+exports it with COPY to TELEMETRY_ARCHIVE_DIR/<partition>.csv.gz, and drops
+it only once the file is on disk. A run that dies midway leaves a detached
+table, and the next run resumes from it. Expired rows in the DEFAULT
+partition are exported and deleted the same way. Long-range history stays
+available through telemetry_rollups.
+
+Existing installs convert the plain table once with
+scripts/partition_telemetry_logs.py; until then both functions log and do
+nothing.
+
+Settings (env vars):
+  TELEMETRY_PARTITIONS_AHEAD_DAYS   (default 7)
+  TELEMETRY_RETENTION_DAYS          (default 90)
+  TELEMETRY_ARCHIVE_DIR             (default Backend/archive/telemetry)
+  TELEMETRY_MAINTENANCE_HOUR        UTC hour of the daily maintenance job (default 2)
+"""
+
+import os
+import re
+import gzip
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from database.session import engine
+
+logger = logging.getLogger("telemetry_partitions")
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+TELEMETRY_PARTITIONS_AHEAD_DAYS = int(os.getenv("TELEMETRY_PARTITIONS_AHEAD_DAYS", "7"))
+TELEMETRY_RETENTION_DAYS = int(os.getenv("TELEMETRY_RETENTION_DAYS", "90"))
+TELEMETRY_ARCHIVE_DIR = os.getenv(
+    "TELEMETRY_ARCHIVE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "archive", "telemetry"),
+)
+TELEMETRY_MAINTENANCE_HOUR = int(os.getenv("TELEMETRY_MAINTENANCE_HOUR", "2"))
+
+PARENT = "telemetry_logs"
+DEFAULT_PARTITION = "telemetry_logs_default"
+_PARTITION_NAME = re.compile(r"^telemetry_logs_p(\d{8})$")
+# Serializes partition DDL across processes (arbitrary, fixed key)
+_DDL_LOCK_KEY = 720_311_905
+
+
+def partition_name(day: date) -> str:
+    return f"{PARENT}_p{day:%Y%m%d}"
+
+
+def _partition_day(name: str):
+    match = _PARTITION_NAME.match(name)
+    return datetime.strptime(match.group(1), "%Y%m%d").date() if match else None
+
+
+def _bounds(day: date):
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def is_partitioned(conn: Connection) -> bool:
+    relkind = conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"), {"name": PARENT}
+    ).scalar()
+    return relkind == "p"
+
+
+def attached_partitions(conn: Connection) -> Dict[str, date]:
+    """Daily partitions currently attached to telemetry_logs -> their day."""
+    rows = conn.execute(text("""
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = to_regclass(:parent)
+    """), {"parent": PARENT}).scalars()
+    return {name: day for name in rows if (day := _partition_day(name)) is not None}
+
+
+def _detached_partitions(conn: Connection) -> Dict[str, date]:
+    attached = attached_partitions(conn)
+    rows = conn.execute(text(
+        "SELECT relname FROM pg_class WHERE relkind = 'r' AND relname LIKE 'telemetry\\_logs\\_p%'"
+    )).scalars()
+    return {
+        name: day for name in rows
+        if name not in attached and (day := _partition_day(name)) is not None
+    }
+
+
+def _lock(conn: Connection):
+    conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _DDL_LOCK_KEY})
+
+
+# ---------------------------------------------------------------------------
+# Creating partitions
+# ---------------------------------------------------------------------------
+
+def create_partition(conn: Connection, day: date):
+    """Create and attach one day's partition, moving its rows out of the DEFAULT partition."""
+    name = partition_name(day)
+    start, end = _bounds(day)
+    bounds = {"start": start, "end": end}
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(text(
+        f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end"
+    ), bounds)
+    conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end"), bounds)
+    conn.execute(text(
+        f"ALTER TABLE {PARENT} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+
+
+def ensure_partitions(first_day: date = None) -> List[str]:
+    """Make sure daily partitions exist from `first_day` (default: yesterday) to the look-ahead horizon."""
+    today = datetime.utcnow().date()
+    first_day = first_day or today - timedelta(days=1)
+    created = []
+    try:
+        with engine.connect() as conn:
+            if not is_partitioned(conn):
+                logger.warning(f"{PARENT} is not partitioned yet; run scripts/partition_telemetry_logs.py")
+                return created
+            _lock(conn)
+            conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT} DEFAULT"))
+            attached = set(attached_partitions(conn).values())
+            day = first_day
+            while day <= today + timedelta(days=TELEMETRY_PARTITIONS_AHEAD_DAYS):
+                if day not in attached:
+                    create_partition(conn, day)
+                    created.append(partition_name(day))
+                day += timedelta(days=1)
+            conn.commit()
+    except Exception as e:
+        logger.error(f"Telemetry partition creation failed: {e}")
+        return []
+    if created:
+        logger.info(f"Created telemetry partitions: {', '.join(created)}")
+    return created
+
+
+# ---------------------------------------------------------------------------
+# Retention / archival
+# ---------------------------------------------------------------------------
+
+def _export(query: str, filename: str) -> str:
+    """
+    COPY a table or query to a gzip'd CSV in the archive dir (written to .tmp,
+    fsynced and renamed); the COPY's transaction commits only after that.
+    """
+    os.makedirs(TELEMETRY_ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(TELEMETRY_ARCHIVE_DIR, filename)
+    tmp_path = path + ".tmp"
+    raw = engine.raw_connection()
+    try:
+        with open(tmp_path, "wb") as out:
+            with gzip.GzipFile(fileobj=out, mode="wb") as archive:
+                raw.cursor().copy_expert(f"COPY {query} TO STDOUT WITH (FORMAT csv, HEADER)", archive)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, path)
+        raw.commit()
+    finally:
+        raw.close()
+    return path
+
+
+def archive_expired_partitions() -> List[str]:
+    """Detach, export and drop partitions older than the retention window. Returns the archive files."""
+    cutoff = datetime.utcnow().date() - timedelta(days=TELEMETRY_RETENTION_DAYS)
+    archived = []
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            logger.warning(f"{PARENT} is not partitioned yet; skipping telemetry retention")
+            return archived
+
+        # 1. Detach expired partitions (each in its own short transaction)
+        for name, day in sorted(attached_partitions(conn).items(), key=lambda item: item[1]):
+            if day < cutoff:
+                _lock(conn)
+                conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+                conn.commit()
+                logger.info(f"Detached telemetry partition {name}")
+
+        # 2. Export and drop every detached partition past retention (including
+        #    ones left behind by an interrupted run)
+        detached = sorted(_detached_partitions(conn).items(), key=lambda item: item[1])
+        conn.commit()
+        for name, day in detached:
+            if day >= cutoff:
+                continue
+            try:
+                archived.append(_export(name, f"{name}.csv.gz"))
+            except Exception as e:
+                logger.error(f"Export of telemetry partition {name} failed, keeping it: {e}")
+                continue
+            conn.execute(text(f"DROP TABLE {name}"))
+            conn.commit()
+            logger.info(f"Archived and dropped telemetry partition {name}")
+
+        # 3. Expired strays in the DEFAULT partition
+        cutoff_ts = datetime.combine(cutoff, time.min)
+        stale = conn.execute(
+            text(f"SELECT count(*) FROM {DEFAULT_PARTITION} WHERE timestamp < :cutoff"), {"cutoff": cutoff_ts}
+        ).scalar()
+        conn.commit()
+        if stale:
+            try:
+                # DELETE ... RETURNING inside COPY: rows go only if the file was written
+                archived.append(_export(
+                    f"(DELETE FROM {DEFAULT_PARTITION} WHERE timestamp < '{cutoff_ts.isoformat()}' RETURNING *)",
+                    f"{DEFAULT_PARTITION}_before_{cutoff:%Y%m%d}.csv.gz",
+                ))
+                logger.info(f"Archived {stale} expired rows from {DEFAULT_PARTITION}")
+            except Exception as e:
+                logger.error(f"Export of expired rows in {DEFAULT_PARTITION} failed, keeping them: {e}")
+    return archived
+
+
+def run_partition_maintenance() -> Dict[str, List[str]]:
+    """Daily job body: create upcoming partitions, then archive expired ones."""
+    return {"created": ensure_partitions(), "archived": archive_expired_partitions()}
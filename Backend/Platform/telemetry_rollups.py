@@ -0,0 +1,207 @@
+"""
+Telemetry Rollups — 1-minute / 1-hour / 1-day vitals aggregates.
+
+Charting a week of raw telemetry means scanning ~20k rows per patient. Every
+ingested reading is also folded into telemetry_rollups (min, max, sum and
+count per vital, per bucket) in the same transaction as its telemetry_logs
+row: one multi-row upsert per batch with LEAST / GREATEST / + merges, so the
+tiers never need a recompute pass.
+
+query_series() serves /api/v1/monitoring/telemetry/{patient_id} from the
+finest tier that returns at most TELEMETRY_MAX_POINTS points for the range,
+e.g. a day at 1m, a week at 1h, a year at 1d.
+
+rebuild_rollups() recomputes every tier from telemetry_logs (first deploy,
+or after a manual data fix); see scripts/rebuild_telemetry_rollups.py.
+
+Settings (env vars):
+  TELEMETRY_MAX_POINTS   points per series before a coarser tier is used (default 1000)
+"""
+
+import os
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from database.models import TelemetryRollup
+
+logger = logging.getLogger("telemetry_rollups")
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+TELEMETRY_MAX_POINTS = int(os.getenv("TELEMETRY_MAX_POINTS", "1000"))
+
+# Finest first; values are (bucket seconds, Postgres date_trunc unit)
+RESOLUTIONS = {
+    "1m": (60, "minute"),
+    "1h": (3600, "hour"),
+    "1d": (86400, "day"),
+}
+VITALS = ("heart_rate", "systolic", "diastolic", "spo2")
+
+_EPOCH = datetime(1970, 1, 1)
+_KEY = ["patient_id", "resolution", "bucket_start"]
+
+
+def naive_utc(ts: datetime) -> datetime:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def bucket_start(ts: datetime, resolution: str) -> datetime:
+    seconds = RESOLUTIONS[resolution][0]
+    elapsed = int((ts - _EPOCH).total_seconds())
+    return _EPOCH + timedelta(seconds=elapsed - elapsed % seconds)
+
+
+def _vitals(reading: Dict[str, Any]) -> Dict[str, Optional[int]]:
+    systolic = diastolic = None
+    blood_pressure = reading.get("blood_pressure")
+    if blood_pressure:
+        try:
+            systolic, diastolic = map(int, blood_pressure.split("/"))
+        except ValueError:
+            pass
+    return {
+        "heart_rate": reading.get("heart_rate"),
+        "systolic": systolic,
+        "diastolic": diastolic,
+        "spo2": reading.get("spo2"),
+    }
+
+
+def _empty_bucket(patient_id, resolution: str, start: datetime) -> Dict[str, Any]:
+    row = {"patient_id": patient_id, "resolution": resolution, "bucket_start": start, "readings": 0}
+    for vital in VITALS:
+        row.update({f"{vital}_min": None, f"{vital}_max": None, f"{vital}_sum": 0.0, f"{vital}_count": 0})
+    return row
+
+
+# ---------------------------------------------------------------------------
+# Incremental maintenance (ingest path)
+# ---------------------------------------------------------------------------
+
+def update_rollups(db: Session, readings: List[Dict[str, Any]]):
+    """
+    Fold readings (patient_id, heart_rate, blood_pressure, spo2, timestamp)
+    into every tier. The caller commits, together with the telemetry_logs rows.
+    """
+    buckets: Dict[tuple, Dict[str, Any]] = {}
+    for reading in readings:
+        values = _vitals(reading)
+        for resolution in RESOLUTIONS:
+            start = bucket_start(reading["timestamp"], resolution)
+            key = (str(reading["patient_id"]), resolution, start)
+            row = buckets.get(key)
+            if row is None:
+                row = buckets[key] = _empty_bucket(UUID(key[0]), resolution, start)
+            row["readings"] += 1
+            for vital, value in values.items():
+                if value is None:
+                    continue
+                low, high = row[f"{vital}_min"], row[f"{vital}_max"]
+                row[f"{vital}_min"] = value if low is None else min(low, value)
+                row[f"{vital}_max"] = value if high is None else max(high, value)
+                row[f"{vital}_sum"] += value
+                row[f"{vital}_count"] += 1
+    if not buckets:
+        return
+
+    table = TelemetryRollup.__table__
+    # Fixed key order so concurrent batches lock shared buckets in the same order
+    stmt = pg_insert(table).values([buckets[key] for key in sorted(buckets)])
+    merged = {"readings": table.c.readings + stmt.excluded.readings}
+    for vital in VITALS:
+        low, high, total, count = (f"{vital}_min", f"{vital}_max", f"{vital}_sum", f"{vital}_count")
+        merged[low] = func.least(table.c[low], stmt.excluded[low])
+        merged[high] = func.greatest(table.c[high], stmt.excluded[high])
+        merged[total] = table.c[total] + stmt.excluded[total]
+        merged[count] = table.c[count] + stmt.excluded[count]
+    db.execute(stmt.on_conflict_do_update(index_elements=_KEY, set_=merged))
+
+
+# ---------------------------------------------------------------------------
+# Range queries
+# ---------------------------------------------------------------------------
+
+def choose_resolution(start: datetime, end: datetime) -> str:
+    """The finest tier that keeps the range within TELEMETRY_MAX_POINTS buckets."""
+    span = (end - start).total_seconds()
+    for resolution, (seconds, _) in RESOLUTIONS.items():
+        if span / seconds <= TELEMETRY_MAX_POINTS:
+            return resolution
+    return "1d"
+
+
+def query_series(db: Session, patient_id, start: datetime, end: datetime,
+                 resolution: Optional[str] = None) -> Dict[str, Any]:
+    """Bucketed vitals for [start, end): {"resolution", "from", "to", "points": [...]}."""
+    start, end = naive_utc(start), naive_utc(end)
+    resolution = resolution or choose_resolution(start, end)
+    rows = db.query(TelemetryRollup).filter(
+        TelemetryRollup.patient_id == patient_id,
+        TelemetryRollup.resolution == resolution,
+        TelemetryRollup.bucket_start >= bucket_start(start, resolution),
+        TelemetryRollup.bucket_start < end,
+    ).order_by(TelemetryRollup.bucket_start).all()
+
+    points = []
+    for row in rows:
+        point = {"timestamp": row.bucket_start.isoformat(), "readings": row.readings}
+        for vital in VITALS:
+            count = getattr(row, f"{vital}_count")
+            point[vital] = {
+                "min": getattr(row, f"{vital}_min"),
+                "max": getattr(row, f"{vital}_max"),
+                "mean": round(getattr(row, f"{vital}_sum") / count, 1) if count else None,
+                "count": count,
+            }
+        points.append(point)
+    return {"resolution": resolution, "from": start.isoformat(), "to": end.isoformat(), "points": points}
+
+
+# ---------------------------------------------------------------------------
+# Full rebuild
+# ---------------------------------------------------------------------------
+
+_BP_PATTERN = r"'^\s*\d+\s*/\s*\d+\s*$'"
+
+
+def rebuild_rollups(db: Session) -> Dict[str, int]:
+    """
+    Recompute every tier from telemetry_logs in one transaction. The rollup
+    table is locked meanwhile, so readings ingested concurrently wait and are
+    folded in afterwards instead of being counted twice or lost.
+    """
+    columns = ["readings"] + [f"{vital}_{agg}" for vital in VITALS for agg in ("min", "max", "sum", "count")]
+    aggregates = ["count(*)"] + [
+        f"min({vital}), max({vital}), coalesce(sum({vital}), 0), count({vital})" for vital in VITALS
+    ]
+    source = f"""
+        SELECT patient_id, timestamp, heart_rate, spo2,
+               CASE WHEN blood_pressure ~ {_BP_PATTERN} THEN split_part(blood_pressure, '/', 1)::int END AS systolic,
+               CASE WHEN blood_pressure ~ {_BP_PATTERN} THEN split_part(blood_pressure, '/', 2)::int END AS diastolic
+        FROM telemetry_logs
+    """
+
+    counts = {}
+    db.execute(text("LOCK TABLE telemetry_rollups IN EXCLUSIVE MODE"))
+    db.execute(text("DELETE FROM telemetry_rollups"))
+    for resolution, (_, unit) in RESOLUTIONS.items():
+        result = db.execute(text(f"""
+            INSERT INTO telemetry_rollups (patient_id, resolution, bucket_start, {", ".join(columns)})
+            SELECT patient_id, '{resolution}', date_trunc('{unit}', timestamp), {", ".join(aggregates)}
+            FROM ({source}) AS readings
+            GROUP BY patient_id, date_trunc('{unit}', timestamp)
+        """))
+        counts[resolution] = result.rowcount
+    db.commit()
+    logger.info(f"Telemetry rollups rebuilt: {counts}")
+    return counts
@@ -0,0 +1,279 @@
+"""
+Telemetry Stream — in-process sliding-window anomaly detection for vitals.
+
+Every ingested reading used to be committed and then followed by a query for
+the patient's last 6 TelemetryLog rows. Instead each patient gets a fixed-size
+ring buffer (a compact `array` of severity ranks) holding the last
+TELEMETRY_ANOMALY_WINDOW readings and a running count of non-GREEN ones, so
+pushing a reading and updating the "sustained anomaly" verdict is O(1).
+
+A buffer is rebuilt from telemetry_logs only the first time a patient is
+seen by this process (after a restart, or after LRU eviction once more than
+TELEMETRY_STREAM_MAX_PATIENTS patients are tracked).
+
+ingest_readings() is the batched write path (HTTP batch endpoint, gateway
+channel, MCP ingest_telemetry tool): one patient IN query, one multi-row
+INSERT (plus the rollup upsert, see telemetry_rollups), then the windows.
+Each patient's newest reading is published to its WebSocket room as a
+VITALS message (publish_reading; rate-limited per connection by the
+ConnectionManager; a no-op in the MCP process, which has no sockets).
+
+Buffers are per process and nothing routes a patient to a particular worker.
+With several uvicorn workers, each worker's window holds only the readings
+that worker received, so "TELEMETRY_ANOMALY_WINDOW abnormal readings in a row"
+is judged per worker and a sustained anomaly can take longer to trip. Run
+telemetry ingestion (webhook, batch endpoint, gateway channel) on a single
+worker when the exact window matters. Reads that must be current across
+workers (e.g. /telemetry/latest) go to telemetry_logs, not the buffers.
+
+Settings (env vars):
+  TELEMETRY_ANOMALY_WINDOW       readings that must all be abnormal (default 6 = 3 min at 30 s)
+  TELEMETRY_STREAM_MAX_PATIENTS  buffers kept in memory (default 50000)
+"""
+
+import os
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from database.ids import uuid7
+from database.models import Patient, TelemetryLog
+from severity_rules import SEVERITY_ORDER
+from severity_engine import evaluate_vitals_severity
+from telemetry_rollups import update_rollups
+from websocket_manager import manager
+
+logger = logging.getLogger("telemetry_stream")
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+TELEMETRY_ANOMALY_WINDOW = int(os.getenv("TELEMETRY_ANOMALY_WINDOW", "6"))
+TELEMETRY_STREAM_MAX_PATIENTS = int(os.getenv("TELEMETRY_STREAM_MAX_PATIENTS", "50000"))
+
+_SEVERITY_NAMES = {rank: name for name, rank in SEVERITY_ORDER.items()}
+
+
+class PatientWindow:
+    """Ring buffer of one patient's last `size` readings."""
+
+    __slots__ = ("size", "head", "count", "abnormal", "severity", "lock")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.head = 0        # slot the next reading goes to
+        self.count = 0       # readings held (<= size)
+        self.abnormal = 0    # readings in the window with severity above GREEN
+        self.severity = array("b", [0] * size)  # severity rank per reading
+        self.lock = threading.Lock()
+
+    def push(self, heart_rate, blood_pressure, spo2) -> int:
+        """Add a reading (evicting the oldest when full). Returns its severity rank."""
+        rank = SEVERITY_ORDER.get(evaluate_vitals_severity(heart_rate, blood_pressure, spo2), 0)
+        i = self.head
+        if self.count == self.size:
+            self.abnormal -= self.severity[i] > 0
+        else:
+            self.count += 1
+        self.severity[i] = rank
+        self.abnormal += rank > 0
+        self.head = (i + 1) % self.size
+        return rank
+
+    @property
+    def sustained_anomaly(self) -> bool:
+        """Every reading in a full window is above GREEN."""
+        return self.count == self.size and self.abnormal == self.size
+
+
+class TelemetryVerdict:
+    def __init__(self, sustained_anomaly: bool, severity: str):
+        self.sustained_anomaly = sustained_anomaly
+        self.severity = severity  # severity of the reading just observed
+
+
+class TelemetryStream:
+    """Per-patient windows, LRU-bounded."""
+
+    def __init__(self, window: int = TELEMETRY_ANOMALY_WINDOW, max_patients: int = TELEMETRY_STREAM_MAX_PATIENTS):
+        self.window = window
+        self.max_patients = max_patients
+        self._windows: "OrderedDict[str, PatientWindow]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, patient_id) -> Optional[PatientWindow]:
+        key = str(patient_id)
+        with self._lock:
+            buf = self._windows.get(key)
+            if buf is not None:
+                self._windows.move_to_end(key)
+            return buf
+
+    def _load(self, db: Session, patient_id, before: datetime = None) -> PatientWindow:
+        """Rebuild a patient's window from its most recent telemetry_logs rows (cold start only)."""
+        query = db.query(
+            TelemetryLog.heart_rate, TelemetryLog.blood_pressure, TelemetryLog.spo2, TelemetryLog.timestamp,
+        ).filter(TelemetryLog.patient_id == patient_id)
+        if before is not None:
+            query = query.filter(TelemetryLog.timestamp < before)
+        rows = query.order_by(TelemetryLog.timestamp.desc()).limit(self.window).all()
+
+        buf = PatientWindow(self.window)
+        for row in reversed(rows):
+            buf.push(row.heart_rate, row.blood_pressure, row.spo2)
+
+        key = str(patient_id)
+        with self._lock:
+            existing = self._windows.get(key)
+            if existing is not None:
+                return existing  # another thread loaded it meanwhile
+            self._windows[key] = buf
+            while len(self._windows) > self.max_patients:
+                self._windows.popitem(last=False)
+        return buf
+
+    def observe(self, db: Session, patient_id, heart_rate=None, blood_pressure=None, spo2=None,
+                timestamp: datetime = None) -> TelemetryVerdict:
+        """
+        Push a reading and return the window verdict. `db` is only used the
+        first time the patient is seen (readings older than `timestamp`).
+        """
+        timestamp = timestamp or datetime.utcnow()
+        buf = self._get(patient_id) or self._load(db, patient_id, before=timestamp)
+        with buf.lock:
+            rank = buf.push(heart_rate, blood_pressure, spo2)
+            return TelemetryVerdict(buf.sustained_anomaly, _SEVERITY_NAMES.get(rank, "GREEN"))
+
+    def forget(self, patient_id):
+        with self._lock:
+            self._windows.pop(str(patient_id), None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"patients": len(self._windows), "window": self.window, "max_patients": self.max_patients}
+
+
+telemetry_stream = TelemetryStream()
+
+
+# ---------------------------------------------------------------------------
+# Batched ingestion
+# ---------------------------------------------------------------------------
+
+def publish_reading(patient_id, heart_rate, blood_pressure, spo2, timestamp: datetime,
+                    severity: str, alert_severity: Optional[str] = None):
+    """Push a reading to dashboards watching the patient (no-op when nobody is connected)."""
+    manager.publish_vitals_threadsafe(str(patient_id), {
+        "heart_rate": heart_rate,
+        "blood_pressure": blood_pressure,
+        "spo2": spo2,
+        "severity": severity,
+        "alert_severity": alert_severity,
+        "timestamp": timestamp.isoformat(),
+    })
+
+
+def _naive_utc(ts: Optional[datetime], default: datetime) -> datetime:
+    if ts is None:
+        return default
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _canonical_id(value) -> str:
+    """Lowercase hyphenated form of a patient id (unparseable ids are kept as sent)."""
+    try:
+        return str(UUID(str(value)))
+    except ValueError:
+        return str(value)
+
+
+def ingest_readings(db: Session, readings: List[Dict[str, Any]], escalate: bool = True) -> Dict[str, Dict[str, Any]]:
+    """
+    Store many readings (any mix of patients) and run the anomaly window over them.
+
+    Each reading is a dict with patient_id, heart_rate, blood_pressure, spo2 and
+    an optional timestamp (default: now). Patient ids are validated with one IN
+    query, all rows are written with a single multi-row INSERT, then each
+    patient's readings are pushed through its window in time order. A patient
+    in sustained anomaly at any point of the batch is escalated once, RED if
+    any of its anomalous readings was RED.
+
+    Returns {patient_id: {"accepted", "alert_triggered", "severity"}} and
+    {"error": "Patient not found"} for unknown patient ids.
+    """
+    from severity_engine import handle_telemetry_escalation
+
+    now = datetime.utcnow()
+    patient_ids = {_canonical_id(r["patient_id"]) for r in readings}
+    valid_ids = []
+    for pid in patient_ids:
+        try:
+            valid_ids.append(UUID(pid))
+        except ValueError:
+            pass
+    known = {
+        str(row.id) for row in db.query(Patient.id).filter(Patient.id.in_(valid_ids)).all()
+    } if valid_ids else set()
+
+    rows = []
+    by_patient: Dict[str, List[Dict[str, Any]]] = {}
+    for r in readings:
+        pid = _canonical_id(r["patient_id"])
+        if pid not in known:
+            continue
+        row = {
+            "id": uuid7(),
+            "patient_id": UUID(pid),
+            "heart_rate": r.get("heart_rate"),
+            "blood_pressure": r.get("blood_pressure"),
+            "spo2": r.get("spo2"),
+            "timestamp": _naive_utc(r.get("timestamp"), now),
+        }
+        rows.append(row)
+        by_patient.setdefault(pid, []).append(row)
+
+    if rows:
+        db.execute(insert(TelemetryLog.__table__), rows)
+        update_rollups(db, rows)
+        db.commit()
+
+    outcomes: Dict[str, Dict[str, Any]] = {pid: {"error": "Patient not found"} for pid in patient_ids - known}
+    for pid, patient_rows in by_patient.items():
+        patient_rows.sort(key=lambda row: row["timestamp"])
+        alert_severity = None
+        verdict = None
+        for row in patient_rows:
+            verdict = telemetry_stream.observe(
+                db, pid, row["heart_rate"], row["blood_pressure"], row["spo2"], row["timestamp"],
+            )
+            if verdict.sustained_anomaly:
+                # ORANGE unless an anomalous reading itself is RED
+                if verdict.severity == "RED" or alert_severity is None:
+                    alert_severity = "RED" if verdict.severity == "RED" else "ORANGE"
+
+        if alert_severity and escalate:
+            try:
+                handle_telemetry_escalation(UUID(pid), alert_severity, db)
+            except Exception as e:
+                logger.error(f"Telemetry escalation failed for patient {pid}: {e}")
+                db.rollback()
+        newest = patient_rows[-1]
+        publish_reading(
+            pid, newest["heart_rate"], newest["blood_pressure"], newest["spo2"], newest["timestamp"],
+            verdict.severity, alert_severity,
+        )
+        outcomes[pid] = {
+            "accepted": len(patient_rows),
+            "alert_triggered": alert_severity is not None,
+            "severity": alert_severity,
+        }
+    return outcomes
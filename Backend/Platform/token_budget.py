@@ -0,0 +1,267 @@
+"""
+Token Budgets — daily LLM token limits per patient and for the whole platform.
+
+Every LLM feature (the analysis crew, the planning crew, the monitoring agent)
+meters its token usage into the llm_token_ledger table, one row per
+(patient, feature, UTC day), updated with a Postgres upsert.
+
+Before a feature runs, `enforce_budget` compares today's consumption with the
+limits below:
+  OK    below every soft limit — run normally.
+  SOFT  a soft limit is reached — run degraded:
+          analysis   triage fast path (3 stages, 8B model, no HITL)
+          planning   planner without tools, single iteration
+          monitoring gemini-2.5-flash-lite
+  HARD  a hard limit is reached — TokenBudgetExceeded (HTTP 429 until UTC midnight).
+
+Limits (tokens per UTC day, env vars):
+  TOKEN_BUDGET_PATIENT_SOFT   (default 150000)
+  TOKEN_BUDGET_PATIENT_HARD   (default 300000)
+  TOKEN_BUDGET_GLOBAL_SOFT    (default 3000000)
+  TOKEN_BUDGET_GLOBAL_HARD    (default 5000000)
+"""
+
+import os
+import logging
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta
+from typing import Any, Dict
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from database.session import SessionLocal
+from database.models import LLMTokenLedger
+
+logger = logging.getLogger("token_budget")
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+TOKEN_BUDGET_PATIENT_SOFT = int(os.getenv("TOKEN_BUDGET_PATIENT_SOFT", "150000"))
+TOKEN_BUDGET_PATIENT_HARD = int(os.getenv("TOKEN_BUDGET_PATIENT_HARD", "300000"))
+TOKEN_BUDGET_GLOBAL_SOFT = int(os.getenv("TOKEN_BUDGET_GLOBAL_SOFT", "3000000"))
+TOKEN_BUDGET_GLOBAL_HARD = int(os.getenv("TOKEN_BUDGET_GLOBAL_HARD", "5000000"))
+
+FEATURE_ANALYSIS = "ANALYSIS"
+FEATURE_PLANNING = "PLANNING"
+FEATURE_MONITORING = "MONITORING"
+
+BUDGET_OK = "OK"
+BUDGET_SOFT = "SOFT"
+BUDGET_HARD = "HARD"
+
+
+class TokenBudgetExceeded(Exception):
+    """A hard token limit is reached; the request must be rejected until the day rolls over."""
+
+    def __init__(self, scope: str, used: int, limit: int):
+        self.scope = scope
+        self.used = used
+        self.limit = limit
+        self.retry_after = seconds_until_reset()
+        super().__init__(
+            f"Daily {scope} token budget exhausted ({used}/{limit} tokens). "
+            f"Retry after {self.retry_after}s."
+        )
+
+
+class BudgetDecision:
+    def __init__(self, level: str, patient_tokens: int, global_tokens: int, reason: str = None):
+        self.level = level
+        self.patient_tokens = patient_tokens
+        self.global_tokens = global_tokens
+        self.reason = reason
+
+    @property
+    def degraded(self) -> bool:
+        return self.level == BUDGET_SOFT
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "level": self.level,
+            "patient_tokens": self.patient_tokens,
+            "global_tokens": self.global_tokens,
+            "reason": self.reason,
+        }
+
+
+def today_utc() -> date:
+    return datetime.utcnow().date()
+
+
+def seconds_until_reset() -> int:
+    now = datetime.utcnow()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return max(int((midnight - now).total_seconds()), 1)
+
+
+# ---------------------------------------------------------------------------
+# Checking
+# ---------------------------------------------------------------------------
+
+def get_usage(db: Session, patient_id, day: date = None) -> tuple:
+    """(patient_tokens, global_tokens) consumed on `day` (default: today UTC)."""
+    day = day or today_utc()
+    patient_tokens = db.query(func.coalesce(func.sum(LLMTokenLedger.total_tokens), 0)).filter(
+        LLMTokenLedger.day == day,
+        LLMTokenLedger.patient_id == patient_id,
+    ).scalar()
+    global_tokens = db.query(func.coalesce(func.sum(LLMTokenLedger.total_tokens), 0)).filter(
+        LLMTokenLedger.day == day,
+    ).scalar()
+    return int(patient_tokens), int(global_tokens)
+
+
+def check_budget(db: Session, patient_id, feature: str = None) -> BudgetDecision:
+    """Budget state for the patient. Limits span all features; `feature` is for logging."""
+    patient_tokens, global_tokens = get_usage(db, patient_id)
+
+    if patient_tokens >= TOKEN_BUDGET_PATIENT_HARD:
+        return BudgetDecision(BUDGET_HARD, patient_tokens, global_tokens, "patient")
+    if global_tokens >= TOKEN_BUDGET_GLOBAL_HARD:
+        return BudgetDecision(BUDGET_HARD, patient_tokens, global_tokens, "global")
+    if patient_tokens >= TOKEN_BUDGET_PATIENT_SOFT:
+        return BudgetDecision(BUDGET_SOFT, patient_tokens, global_tokens, "patient")
+    if global_tokens >= TOKEN_BUDGET_GLOBAL_SOFT:
+        return BudgetDecision(BUDGET_SOFT, patient_tokens, global_tokens, "global")
+    return BudgetDecision(BUDGET_OK, patient_tokens, global_tokens)
+
+
+def enforce_budget(db: Session, patient_id, feature: str) -> BudgetDecision:
+    """check_budget that raises TokenBudgetExceeded on a hard limit."""
+    decision = check_budget(db, patient_id, feature)
+    if decision.level == BUDGET_HARD:
+        if decision.reason == "patient":
+            used, limit = decision.patient_tokens, TOKEN_BUDGET_PATIENT_HARD
+        else:
+            used, limit = decision.global_tokens, TOKEN_BUDGET_GLOBAL_HARD
+        logger.warning(f"{feature} rejected for patient {patient_id}: {decision.reason} hard limit ({used}/{limit})")
+        raise TokenBudgetExceeded(decision.reason, used, limit)
+    if decision.degraded:
+        logger.info(f"{feature} for patient {patient_id} running degraded: {decision.reason} soft limit reached")
+    return decision
+
+
+# ---------------------------------------------------------------------------
+# Metering
+# ---------------------------------------------------------------------------
+
+def record_usage(patient_id, feature: str, metrics: Dict[str, Any]):
+    """
+    Add a run's token usage (a run_metrics to_dict() payload) to today's ledger
+    row. Never raises — metering must not fail the request that produced it.
+    """
+    prompt_tokens = int(metrics.get("prompt_tokens") or 0)
+    completion_tokens = int(metrics.get("completion_tokens") or 0)
+    if not prompt_tokens and not completion_tokens:
+        return
+    requests = sum(u.get("requests", 0) for u in (metrics.get("token_usage") or {}).values())
+    cost = float(metrics.get("estimated_cost_usd") or 0.0)
+
+    stmt = pg_insert(LLMTokenLedger).values(
+        patient_id=patient_id,
+        feature=feature,
+        day=today_utc(),
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+        requests=requests,
+        estimated_cost_usd=cost,
+        updated_at=datetime.utcnow(),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["patient_id", "feature", "day"],
+        set_={
+            "prompt_tokens": LLMTokenLedger.prompt_tokens + stmt.excluded.prompt_tokens,
+            "completion_tokens": LLMTokenLedger.completion_tokens + stmt.excluded.completion_tokens,
+            "total_tokens": LLMTokenLedger.total_tokens + stmt.excluded.total_tokens,
+            "requests": LLMTokenLedger.requests + stmt.excluded.requests,
+            "estimated_cost_usd": LLMTokenLedger.estimated_cost_usd + stmt.excluded.estimated_cost_usd,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+
+    db = SessionLocal()
+    try:
+        db.execute(stmt)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to meter {feature} tokens for patient {patient_id}: {e}")
+    finally:
+        db.close()
+
+
+@contextmanager
+def metered(patient_id, feature: str):
+    """
+    Collect the token usage of everything run inside the block and add it to
+    the ledger on exit (also when the block raises).
+    """
+    from medical_agents.run_metrics import RunMetricsCollector, collecting
+
+    collector = RunMetricsCollector(f"{feature.lower()}-{patient_id}")
+    try:
+        with collecting(collector):
+            yield collector
+    finally:
+        record_usage(patient_id, feature, collector.to_dict())
+
+
+# ---------------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------------
+
+def limits() -> Dict[str, int]:
+    return {
+        "patient_soft": TOKEN_BUDGET_PATIENT_SOFT,
+        "patient_hard": TOKEN_BUDGET_PATIENT_HARD,
+        "global_soft": TOKEN_BUDGET_GLOBAL_SOFT,
+        "global_hard": TOKEN_BUDGET_GLOBAL_HARD,
+    }
+
+
+def usage_report(db: Session, day: date = None, top: int = 20) -> Dict[str, Any]:
+    """Consumption for one day: global totals per feature and the top patients."""
+    day = day or today_utc()
+    rows = db.query(LLMTokenLedger).filter(LLMTokenLedger.day == day).all()
+
+    by_feature: Dict[str, Dict[str, Any]] = {}
+    by_patient: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        feature_entry = by_feature.setdefault(row.feature, {"total_tokens": 0, "requests": 0, "estimated_cost_usd": 0.0})
+        feature_entry["total_tokens"] += row.total_tokens
+        feature_entry["requests"] += row.requests
+        feature_entry["estimated_cost_usd"] += row.estimated_cost_usd
+
+        patient_entry = by_patient.setdefault(str(row.patient_id), {"total_tokens": 0, "features": {}})
+        patient_entry["total_tokens"] += row.total_tokens
+        patient_entry["features"][row.feature] = row.total_tokens
+
+    for entry in by_feature.values():
+        entry["estimated_cost_usd"] = round(entry["estimated_cost_usd"], 4)
+
+    patients = sorted(
+        ({"patient_id": pid, **entry} for pid, entry in by_patient.items()),
+        key=lambda e: e["total_tokens"],
+        reverse=True,
+    )
+    for entry in patients:
+        if entry["total_tokens"] >= TOKEN_BUDGET_PATIENT_HARD:
+            entry["budget_level"] = BUDGET_HARD
+        elif entry["total_tokens"] >= TOKEN_BUDGET_PATIENT_SOFT:
+            entry["budget_level"] = BUDGET_SOFT
+        else:
+            entry["budget_level"] = BUDGET_OK
+
+    global_tokens = sum(e["total_tokens"] for e in by_feature.values())
+    return {
+        "day": day.isoformat(),
+        "limits": limits(),
+        "global_tokens": global_tokens,
+        "resets_in_s": seconds_until_reset() if day == today_utc() else None,
+        "by_feature": by_feature,
+        "patients": patients[:top],
+    }
@@ -1,16 +1,42 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 from fastapi import WebSocket
+import os
+import time
 import logging
 import asyncio
 
 logger = logging.getLogger(__name__)
 
+# Most VITALS messages per second sent to one connection; readings arriving
+# faster are coalesced (only the latest is sent)
+VITALS_MAX_HZ = float(os.getenv("VITALS_MAX_HZ", "1"))
+
+
+class _VitalsSlot:
+    """Per-connection mailbox holding only the newest unsent VITALS message."""
+    __slots__ = ("latest", "last_sent", "task")
+
+    def __init__(self):
+        self.latest: Optional[Dict] = None
+        self.last_sent = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+
 class ConnectionManager:
     def __init__(self):
         # Map patient_id -> list of active connections
         self.active_connections: Dict[str, List[WebSocket]] = {}
+        # Event loop the connections live on, for broadcasts from worker threads
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Live vitals: connection -> its coalescing mailbox
+        self._vitals: Dict[WebSocket, _VitalsSlot] = {}
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
 
     async def connect(self, websocket: WebSocket, patient_id: str):
+        if self._loop is None:
+            self.bind_loop(asyncio.get_running_loop())
         await websocket.accept()
         if patient_id not in self.active_connections:
             self.active_connections[patient_id] = []
@@ -18,6 +44,9 @@ class ConnectionManager:
         logger.info(f"WebSocket connected for patient {patient_id}")
 
     def disconnect(self, websocket: WebSocket, patient_id: str):
+        slot = self._vitals.pop(websocket, None)
+        if slot is not None and slot.task is not None:
+            slot.task.cancel()
         if patient_id in self.active_connections:
             if websocket in self.active_connections[patient_id]:
                 self.active_connections[patient_id].remove(websocket)
@@ -41,4 +70,55 @@ class ConnectionManager:
             for dead in dead_connections:
                 self.disconnect(dead, patient_id)
 
+    def broadcast_threadsafe(self, message: Dict, patient_id: str):
+        """Fire-and-forget broadcast from a non-async thread (background jobs, executors)."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            logger.debug(f"No event loop bound, dropping WS message for patient {patient_id}")
+            return
+        asyncio.run_coroutine_threadsafe(self.broadcast(message, patient_id), loop)
+
+    # --- Live vitals ---
+
+    def publish_vitals_threadsafe(self, patient_id: str, reading: Dict):
+        """
+        Offer a telemetry reading to every connection in the patient's room
+        (callable from any thread). Each connection gets at most VITALS_MAX_HZ
+        VITALS messages per second; a newer reading replaces one that has not
+        gone out yet, so slow clients skip intermediate values rather than
+        queueing them.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed() or patient_id not in self.active_connections:
+            return
+        message = {"type": "VITALS", "patient_id": patient_id, "reading": reading}
+        loop.call_soon_threadsafe(self._offer_vitals, patient_id, message)
+
+    def _offer_vitals(self, patient_id: str, message: Dict):
+        for connection in self.active_connections.get(patient_id, []):
+            slot = self._vitals.get(connection)
+            if slot is None:
+                slot = self._vitals[connection] = _VitalsSlot()
+            slot.latest = message
+            if slot.task is None:
+                slot.task = asyncio.create_task(self._send_vitals(connection, patient_id, slot))
+
+    async def _send_vitals(self, connection: WebSocket, patient_id: str, slot: _VitalsSlot):
+        interval = 1.0 / VITALS_MAX_HZ if VITALS_MAX_HZ > 0 else 0.0
+        try:
+            while slot.latest is not None:
+                wait = slot.last_sent + interval - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)  # newer readings overwrite slot.latest meanwhile
+                message, slot.latest = slot.latest, None
+                slot.last_sent = time.monotonic()
+                await connection.send_json(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Failed to send vitals to WS: {e}")
+            self.disconnect(connection, patient_id)
+        finally:
+            slot.task = None
+
 manager = ConnectionManager()
\ No newline at end of file
@@ -1,39 +1,57 @@
 from crewai import Crew, Process
 from medical_agents.agents import MedicalAgents
 from medical_agents.tasks import MedicalTasks
+from medical_agents.run_capture import console_write, log_debug
+from medical_agents import run_metrics
 import time
-import sys
-import datetime
 import random
+import logging
+
+logger = logging.getLogger("medical_crew")
 
 # Cooldown between sequential crew steps (seconds)
 # Gives Groq rate limits time to reset between steps
 STEP_COOLDOWN = 15
 
-def log_debug(msg):
-    with open("crew_debug.log", "a") as f:
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        f.write(f"[{timestamp}] {msg}\n")
+# Stage names reported to the optional `on_event` callback of MedicalCrew.run
+ANALYSIS_STAGES = [
+    "Vital Analysis",
+    "Symptom Inquiry",
+    "Context Aggregation",
+    "Risk Assessment",
+    "Decision Action",
+]
 
+# Triage fast path (token budget soft limit): no HITL interview, no aggregation step
+TRIAGE_STAGES = [
+    "Vital Analysis",
+    "Risk Assessment",
+    "Decision Action",
+]
 
 class MedicalCrew:
-    def __init__(self, patient_id=None):
-        self.agents = MedicalAgents(patient_id=patient_id)
+    def __init__(self, patient_id=None, degraded=False):
+        self.agents = MedicalAgents(patient_id=patient_id, degraded=degraded)
         self.tasks = MedicalTasks()
+        self._on_event = None  # on_event of the current run, also told about rate-limit backoffs
 
     def kickoff_with_retry(self, crew_instance, step_name):
         max_retries = 6
         base_wait = 60  # Start with 60 seconds
         for attempt in range(max_retries):
             try:
-                return crew_instance.kickoff()
+                result = crew_instance.kickoff()
+                run_metrics.record_crew_usage(crew_instance, result)
+                return result
             except Exception as e:
                 error_msg = str(e).lower()
                 if "rate_limit" in error_msg or "429" in error_msg or "too many requests" in error_msg or "upstream" in error_msg or "resource_exhausted" in error_msg:
                     # Exponential backoff with jitter: 60s → 90s → 135s → 202s → 303s
                     wait_time = base_wait * (1.5 ** attempt) + random.uniform(5, 15)
                     wait_time = min(wait_time, 300)  # Cap at 5 minutes
-                    sys.__stdout__.write(f"\n[RATE LIMIT] {step_name}: Waiting {wait_time:.0f}s before retry {attempt + 1}/{max_retries}...\n")
+                    console_write(f"\n[RATE LIMIT] {step_name}: Waiting {wait_time:.0f}s before retry {attempt + 1}/{max_retries}...\n")
+                    run_metrics.record_retry(step_name, wait_time)
+                    self._notify_rate_limited(step_name, wait_time)
                     time.sleep(wait_time)
                 else:
                     raise e
@@ -41,11 +59,47 @@ class MedicalCrew:
 
     def _cooldown(self, next_step_name):
         """Pause between crew steps to let Groq rate limits recover."""
-        sys.__stdout__.write(f"\n[COOLDOWN] Waiting {STEP_COOLDOWN}s before {next_step_name}...\n")
+        console_write(f"\n[COOLDOWN] Waiting {STEP_COOLDOWN}s before {next_step_name}...\n")
+        run_metrics.record_cooldown(STEP_COOLDOWN)
         time.sleep(STEP_COOLDOWN)
 
-    def run(self, patient_data):
+    def _notify_rate_limited(self, step_name, wait_time):
+        """Tell the caller we are backing off (feeds admission control's limiter headroom)."""
+        if self._on_event is None:
+            return
+        try:
+            self._on_event({"stage": step_name, "status": "RATE_LIMITED", "wait_s": round(wait_time, 1)})
+        except Exception as e:
+            log_debug(f"on_event callback failed for rate limit in {step_name}: {e}")
+
+    def _emit(self, on_event, stage_name, status, stages=ANALYSIS_STAGES):
+        """Record stage timing and report the transition to the caller (never lets a callback break the run)."""
+        if status == "STARTED":
+            run_metrics.stage_started(stage_name)
+        else:
+            run_metrics.stage_completed(stage_name)
+        if on_event is None:
+            return
+        try:
+            on_event({
+                "stage": stage_name,
+                "index": stages.index(stage_name) + 1,
+                "total": len(stages),
+                "status": status,
+            })
+        except Exception as e:
+            log_debug(f"on_event callback failed for {stage_name}: {e}")
+
+    def run(self, patient_data, on_event=None):
+        """
+        Run the 5-stage analysis pipeline.
+
+        `on_event` is an optional callable receiving a dict per stage transition
+        ({"stage", "index", "total", "status": STARTED | COMPLETED}) and per
+        rate-limit backoff ({"stage", "status": RATE_LIMITED, "wait_s"}).
+        """
         print(f"DEBUG: MedicalCrew.run called with: {patient_data}")
+        self._on_event = on_event
         # Instantiate Agents
         detective_agent = self.agents.vital_analysis_agent()
         interviewer_agent = self.agents.symptom_inquiry_agent()
@@ -62,8 +116,10 @@ class MedicalCrew:
 
         # Execution Chain with Retry Wrapper
         print("\n[1/5] Running Vital Analysis Agent...")
+        self._emit(on_event, "Vital Analysis", "STARTED")
         c1 = Crew(agents=[detective_agent], tasks=[vital_analysis], verbose=True)
         res1 = self.kickoff_with_retry(c1, "Vital Analysis")
+        self._emit(on_event, "Vital Analysis", "COMPLETED")
         print(f"DEBUG: Vitals Output: {res1}")
         print("Analysis Complete.")
 
@@ -81,8 +137,10 @@ class MedicalCrew:
         # CRITICAL FIX: Inject ORIGINAL PATIENT DATA (which now includes history/meds) so this agent doesn't rely solely on the previous agent's summary
         symptom_inquiry.description += f"\n\n[ORIGINAL PATIENT DATA & HISTORY]:\n{patient_data}\n\n[CONTEXT - VITAL ANALYSIS]:\n{out1}"
         
+        self._emit(on_event, "Symptom Inquiry", "STARTED")
         c2 = Crew(agents=[interviewer_agent], tasks=[symptom_inquiry], verbose=True)
         res2 = self.kickoff_with_retry(c2, "Symptom Inquiry")
+        self._emit(on_event, "Symptom Inquiry", "COMPLETED")
         print(f"DEBUG: Symptom Output: {res2}")
         print("Inquiry Complete.")
         
@@ -93,8 +151,10 @@ class MedicalCrew:
         # Inject previous contexts AND original data
         aggregation.description += f"\n\n[ORIGINAL PATIENT DATA & HISTORY]:\n{patient_data}\n\n[CONTEXT - VITAL ANALYSIS]:\n{out1}\n\n[CONTEXT - SYMPTOM INQUIRY]:\n{out2}"
         
+        self._emit(on_event, "Context Aggregation", "STARTED")
         c3 = Crew(agents=[aggregator_agent], tasks=[aggregation], verbose=True)
         res3 = self.kickoff_with_retry(c3, "Context Aggregation")
+        self._emit(on_event, "Context Aggregation", "COMPLETED")
         print(f"DEBUG: Aggregation Output: {res3}")
         print("Aggregation Complete.")
 
@@ -105,8 +165,10 @@ class MedicalCrew:
         # Inject Ground Truth again
         risk_assessment.description += f"\n\n[ORIGINAL PATIENT DATA & HISTORY]:\n{patient_data}\n\n[CONTEXT - CLINICAL AGGREGATION]:\n{out3}"
         
+        self._emit(on_event, "Risk Assessment", "STARTED")
         c4 = Crew(agents=[risk_agent], tasks=[risk_assessment], verbose=True)
         risk_result = self.kickoff_with_retry(c4, "Risk Assessment")
+        self._emit(on_event, "Risk Assessment", "COMPLETED")
         print(f"DEBUG: Risk Result: {risk_result}")
         print("Assessment Complete.")
 
@@ -116,8 +178,10 @@ class MedicalCrew:
         print("\n[5/5] Running Decision & Action Agent...")
         decision_making.description += f"\n\n[ORIGINAL PATIENT DATA & HISTORY]:\n{patient_data}\n\n[CONTEXT - RISK ASSESSMENT]:\n{out4}"
         
+        self._emit(on_event, "Decision Action", "STARTED")
         c5 = Crew(agents=[decision_agent], tasks=[decision_making], verbose=True)
         decision_result = self.kickoff_with_retry(c5, "Decision Action")
+        self._emit(on_event, "Decision Action", "COMPLETED")
         print(f"DEBUG: Decision Result: {decision_result}")
 
         
@@ -126,8 +190,60 @@ class MedicalCrew:
             "decision_action": decision_result
         }
 
-    def run_planning_crew(self, patient_data):
+    def run_triage(self, patient_data, on_event=None):
+        """
+        Reduced 3-stage pipeline used when the patient or platform is over its
+        token budget soft limit: Vital Analysis -> Risk Assessment -> Decision.
+        Skips the HITL interview and aggregation; construct the crew with
+        degraded=True so risk assessment runs on the 8B model.
+        Returns the same shape as run().
+        """
+        self._on_event = on_event
+        detective_agent = self.agents.vital_analysis_agent()
+        risk_agent = self.agents.risk_assessment_agent()
+        decision_agent = self.agents.decision_action_agent()
+
+        vital_analysis = self.tasks.analyze_vitals_task(detective_agent, patient_data)
+        risk_assessment = self.tasks.assess_risk_task(risk_agent, context=[vital_analysis])
+        decision_making = self.tasks.decide_action_task(decision_agent, context=[risk_assessment])
+
+        def get_output_str(res):
+            if hasattr(res, 'raw'):
+                return res.raw
+            return str(res)
+
+        logger.info("[1/3] Running Vital Analysis Agent (triage)...")
+        self._emit(on_event, "Vital Analysis", "STARTED", TRIAGE_STAGES)
+        c1 = Crew(agents=[detective_agent], tasks=[vital_analysis], verbose=True)
+        res1 = self.kickoff_with_retry(c1, "Vital Analysis")
+        self._emit(on_event, "Vital Analysis", "COMPLETED", TRIAGE_STAGES)
+        out1 = get_output_str(res1)
+
+        self._cooldown("Risk Assessment")
+        logger.info("[2/3] Running Risk Assessment Agent (triage)...")
+        risk_assessment.description += f"\n\n[ORIGINAL PATIENT DATA & HISTORY]:\n{patient_data}\n\n[CONTEXT - CLINICAL AGGREGATION]:\n(Triage: vital analysis only, no patient interview)\n{out1}"
+        self._emit(on_event, "Risk Assessment", "STARTED", TRIAGE_STAGES)
+        c2 = Crew(agents=[risk_agent], tasks=[risk_assessment], verbose=True)
+        risk_result = self.kickoff_with_retry(c2, "Risk Assessment")
+        self._emit(on_event, "Risk Assessment", "COMPLETED", TRIAGE_STAGES)
+        out2 = get_output_str(risk_result)
+
+        self._cooldown("Decision Action")
+        logger.info("[3/3] Running Decision & Action Agent (triage)...")
+        decision_making.description += f"\n\n[ORIGINAL PATIENT DATA & HISTORY]:\n{patient_data}\n\n[CONTEXT - RISK ASSESSMENT]:\n{out2}"
+        self._emit(on_event, "Decision Action", "STARTED", TRIAGE_STAGES)
+        c3 = Crew(agents=[decision_agent], tasks=[decision_making], verbose=True)
+        decision_result = self.kickoff_with_retry(c3, "Decision Action")
+        self._emit(on_event, "Decision Action", "COMPLETED", TRIAGE_STAGES)
+
+        return {
+            "risk_assessment": risk_result,
+            "decision_action": decision_result
+        }
+
+    def run_planning_crew(self, patient_data, on_event=None):
         print(f"DEBUG: MedicalCrew.run_planning_crew called with: {patient_data}")
+        self._on_event = on_event
         
         planner_agent = self.agents.task_planner_agent()
         planning_task = self.tasks.create_daily_plan_task(planner_agent, patient_data)
@@ -141,3 +257,18 @@ class MedicalCrew:
         result = self.kickoff_with_retry(crew, "Daily Task Planning")
         print(f"DEBUG: Planning Result: {result}")
         return result
+
+    def run_remediation_crew(self, remediation_data, on_event=None):
+        """Easier alternatives for repeatedly skipped tasks (the rest of the plan comes from medical_agents.task_kb)."""
+        self._on_event = on_event
+
+        remediation_agent = self.agents.task_remediation_agent()
+        remediation_task = self.tasks.create_remediation_task(remediation_agent, remediation_data)
+
+        crew = Crew(
+            agents=[remediation_agent],
+            tasks=[remediation_task],
+            verbose=True
+        )
+
+        return self.kickoff_with_retry(crew, "Task Remediation")
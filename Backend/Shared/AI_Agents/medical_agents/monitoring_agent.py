@@ -10,6 +10,7 @@ PYDANTIC_V2 = int(PYDANTIC_VERSION.split(".")[0]) >= 2
 from google import genai
 from google.genai import types
 from medical_agents.rag_manager import RAGManager
+from medical_agents import run_metrics
 
 logger = logging.getLogger("monitoring_agent")
 
@@ -22,8 +23,24 @@ class TargetedQuestion(BaseModel):
 class MonitoringCheckInPlan(BaseModel):
     questions: List[TargetedQuestion] = Field(..., description="List of generated questions for this check-in session.")
 
+# Used instead of gemini-2.5-flash when the token budget soft limit is reached
+DEGRADED_MODEL_NAME = "gemini-2.5-flash-lite"
+
+
+def _record_usage(model_name: str, response):
+    """Report Gemini usage_metadata to the active run_metrics collector (if any)."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    run_metrics.record_tokens(
+        model_name,
+        getattr(usage, "prompt_token_count", 0) or 0,
+        getattr(usage, "candidates_token_count", 0) or 0,
+    )
+
+
 class MonitoringAgent:
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, degraded: bool = False):
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY_2") or os.getenv("GOOGLE_API_KEY")
         if not self.api_key:
             raise ValueError("GOOGLE_API_KEY is required for MonitoringAgent.")
@@ -31,6 +48,8 @@ class MonitoringAgent:
         # Initialize GenAI Client
         self.client = genai.Client(api_key=self.api_key)
         self.model_name = "gemini-2.5-flash"  # Fast, cheap, and supports structured output natively
+        if degraded:
+            self.model_name = DEGRADED_MODEL_NAME
         
         # Initialize RAG
         self.rag_manager = RAGManager()
@@ -104,6 +123,8 @@ class MonitoringAgent:
                 ),
             )
             
+            _record_usage(self.model_name, response)
+
             # The structured JSON output string from Gemini
             json_output = response.text
             
@@ -150,6 +171,7 @@ class MonitoringAgent:
                     temperature=0.0,
                 ),
             )
+            _record_usage(self.model_name, response)
             result = response.text.strip().upper()
             if result in ("GREEN", "YELLOW", "ORANGE", "RED"):
                 return result
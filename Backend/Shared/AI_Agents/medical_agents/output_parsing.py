@@ -0,0 +1,269 @@
+"""
+Typed parsing of agent outputs.
+
+Each agent's expected output is declared as a Pydantic schema on its task
+template in medical_agents.tasks (`output_schema`). Raw agent text is turned
+into that schema in three steps, cheapest first:
+
+  1. strict    json.loads on the text (markdown fences stripped)
+  2. extracted json.loads on the outermost {...} / [...] span, for outputs
+               wrapped in prose ("Here is the plan: [...]")
+  3. repaired  json_repair.loads — only when the strict paths fail
+
+The decoded JSON then goes through the schema's coercer (the single place
+where e.g. risk_score "85/100" becomes 85, or an invalid priority becomes
+NORMAL) and is validated against the schema.
+
+Outcomes are counted per agent (`parse_stats()`) so a prompt or model change
+that degrades output quality shows up as a rising repaired/failed rate.
+"""
+
+import re
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Type
+
+import json_repair
+from pydantic import BaseModel, ValidationError
+
+logger = logging.getLogger("output_parsing")
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+
+# ---------------------------------------------------------------------------
+# Per-agent parse statistics
+# ---------------------------------------------------------------------------
+_OUTCOMES = ("strict", "extracted", "repaired", "failed", "invalid")
+_stats: Dict[str, Dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+def _count(agent: str, outcome: str, n: int = 1):
+    with _stats_lock:
+        entry = _stats.setdefault(agent, {key: 0 for key in _OUTCOMES})
+        entry[outcome] += n
+
+
+def parse_stats() -> Dict[str, Dict[str, Any]]:
+    """Counters per agent plus the share of outputs that needed repair or failed."""
+    with _stats_lock:
+        snapshot = {agent: dict(counts) for agent, counts in _stats.items()}
+    for counts in snapshot.values():
+        total = counts["strict"] + counts["extracted"] + counts["repaired"] + counts["failed"]
+        counts["total"] = total
+        counts["repair_rate"] = round(counts["repaired"] / total, 4) if total else 0.0
+        counts["failure_rate"] = round(counts["failed"] / total, 4) if total else 0.0
+    return snapshot
+
+
+# ---------------------------------------------------------------------------
+# Decoding
+# ---------------------------------------------------------------------------
+
+def _to_text(raw: Any) -> str:
+    if hasattr(raw, "raw"):  # CrewOutput / TaskOutput
+        raw = raw.raw
+    text = str(raw)
+    fenced = _FENCE_RE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    return text.strip()
+
+
+def _outer_span(text: str, open_char: str, close_char: str) -> Optional[str]:
+    start = text.find(open_char)
+    end = text.rfind(close_char)
+    if start == -1 or end <= start:
+        return None
+    return text[start:end + 1]
+
+
+def decode_json(raw: Any, agent: str, expect: type = dict) -> Any:
+    """
+    Decode agent output into `expect` (dict or list). Returns None if even
+    json_repair cannot produce the expected container.
+    """
+    if isinstance(raw, expect):
+        _count(agent, "strict")
+        return raw
+
+    text = _to_text(raw)
+
+    try:
+        decoded = json.loads(text)
+        if isinstance(decoded, expect):
+            _count(agent, "strict")
+            return decoded
+    except ValueError:
+        pass
+
+    span = _outer_span(text, *("[]" if expect is list else "{}"))
+    if span and span != text:
+        try:
+            decoded = json.loads(span)
+            if isinstance(decoded, expect):
+                _count(agent, "extracted")
+                return decoded
+        except ValueError:
+            pass
+
+    try:
+        decoded = json_repair.loads(span or text)
+        if isinstance(decoded, dict) and expect is list:
+            decoded = [decoded]  # a single object where an array was asked for
+        if isinstance(decoded, expect) and decoded:
+            _count(agent, "repaired")
+            logger.info(f"{agent}: output needed json_repair")
+            return decoded
+    except Exception as e:
+        logger.error(f"{agent}: json_repair failed: {e}")
+
+    _count(agent, "failed")
+    logger.error(f"{agent}: could not decode output as {expect.__name__}. Preview: {text[:200]}...")
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Coercion (the only place output fields are normalized)
+# ---------------------------------------------------------------------------
+
+def coerce_int(value: Any, default: int = 0, lo: int = None, hi: int = None) -> int:
+    """85, 85.0, "85", "85/100", "Score: 85" -> 85 (clamped to [lo, hi])."""
+    if isinstance(value, bool):
+        result = default
+    elif isinstance(value, (int, float)):
+        result = int(value)
+    else:
+        match = re.search(r"-?\d+(?:\.\d+)?", str(value or ""))
+        result = int(float(match.group())) if match else default
+    if lo is not None:
+        result = max(result, lo)
+    if hi is not None:
+        result = min(result, hi)
+    return result
+
+
+def coerce_bool(value: Any, default: bool = False) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return value != 0
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ("true", "yes", "y", "1"):
+            return True
+        if lowered in ("false", "no", "n", "0"):
+            return False
+    return default
+
+
+def coerce_choice(value: Any, choices: Dict[str, str], default: str) -> str:
+    """Case-insensitive match against `choices` ({lowercase: canonical})."""
+    if value is None:
+        return default
+    return choices.get(str(value).strip().lower().replace(" ", "_"), default)
+
+
+def coerce_text(value: Any, default: str = "") -> str:
+    if value is None:
+        return default
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+def _choices(*values: str) -> Dict[str, str]:
+    return {v.lower(): v for v in values}
+
+
+RISK_LEVELS = _choices("LOW", "MODERATE", "HIGH", "CRITICAL")
+ACTIONS = _choices("MONITOR", "MONITOR_HOME", "SCHEDULE_APPOINTMENT", "ALERT_CAREGIVER", "ALERT_DOCTOR", "EMERGENCY", "EMERGENCY_ESCALATION")
+URGENCIES = _choices("Normal", "High", "Critical")
+TASK_SOURCES = _choices("AI_GENERATED", "KB_BASELINE", "SMART_REMEDIATION")
+TASK_PRIORITIES = _choices("LOW", "NORMAL", "HIGH", "CRITICAL")
+
+
+def _coerce_risk_assessment(data: Dict[str, Any]) -> Dict[str, Any]:
+    data = dict(data)
+    data["risk_level"] = coerce_choice(data.get("risk_level"), RISK_LEVELS, "UNKNOWN")
+    data["risk_score"] = coerce_int(data.get("risk_score"), default=0, lo=0, hi=100)
+    data["requires_immediate_action"] = coerce_bool(data.get("requires_immediate_action"))
+    if not isinstance(data.get("justification"), (dict, str)):
+        data["justification"] = coerce_text(data.get("justification"), "No justification provided.")
+    return data
+
+
+def _coerce_action_decision(data: Dict[str, Any]) -> Dict[str, Any]:
+    data = dict(data)
+    data["action"] = coerce_choice(data.get("action"), ACTIONS, str(data.get("action") or "MONITOR").upper())
+    data["urgency"] = coerce_choice(data.get("urgency"), URGENCIES, "Normal")
+    data["doctor_note"] = coerce_text(data.get("doctor_note"), "No specific note provided.")
+    return data
+
+
+def _coerce_planned_task(data: Dict[str, Any]) -> Dict[str, Any]:
+    data = dict(data)
+    data["task_description"] = coerce_text(data.get("task_description"), "Unnamed Task")
+    data["category"] = coerce_text(data.get("category"), "General")
+    data["source"] = coerce_choice(data.get("source"), TASK_SOURCES, "AI_GENERATED")
+    data["priority"] = coerce_choice(data.get("priority"), TASK_PRIORITIES, "NORMAL")
+    return data
+
+
+_COERCERS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "RiskAssessmentOutput": _coerce_risk_assessment,
+    "ActionDecisionOutput": _coerce_action_decision,
+    "PlannedTask": _coerce_planned_task,
+}
+
+
+def _dump(model: BaseModel) -> Dict[str, Any]:
+    return model.model_dump() if hasattr(model, "model_dump") else model.dict()
+
+
+def _validate(data: Dict[str, Any], schema: Type[BaseModel], agent: str) -> Optional[Dict[str, Any]]:
+    coercer = _COERCERS.get(schema.__name__)
+    if coercer:
+        data = coercer(data)
+    try:
+        return _dump(schema(**data))
+    except ValidationError as e:
+        _count(agent, "invalid")
+        logger.warning(f"{agent}: output failed {schema.__name__} validation: {e}")
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def parse_object(raw: Any, schema: Type[BaseModel], agent: str) -> Dict[str, Any]:
+    """
+    Parse a single JSON object output. Returns the validated dict; if
+    validation fails the coerced (partial) dict; {} if nothing decodes.
+    """
+    decoded = decode_json(raw, agent, expect=dict)
+    if decoded is None:
+        return {}
+    validated = _validate(decoded, schema, agent)
+    if validated is not None:
+        return validated
+    coercer = _COERCERS.get(schema.__name__)
+    return coercer(decoded) if coercer else decoded
+
+
+def parse_list(raw: Any, item_schema: Type[BaseModel], agent: str) -> List[Dict[str, Any]]:
+    """Parse a JSON array output. Items failing validation are dropped. [] if nothing decodes."""
+    decoded = decode_json(raw, agent, expect=list)
+    if decoded is None:
+        return []
+    items = []
+    for item in decoded:
+        if not isinstance(item, dict):
+            _count(agent, "invalid")
+            continue
+        validated = _validate(item, item_schema, agent)
+        if validated is not None:
+            items.append(validated)
+    return items
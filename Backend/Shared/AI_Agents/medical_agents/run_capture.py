@@ -0,0 +1,156 @@
+"""
+Run-scoped output capture for crew executions.
+
+`contextlib.redirect_stdout` swaps the process-wide sys.stdout, so two crews
+running in different threads race on the redirect and interleave output.
+Instead, sys.stdout / sys.stderr are replaced ONCE by routing streams that look
+up the active run in a ContextVar and write to that run's own sink. Threads
+with no active run (the API itself) keep writing to the real console.
+
+Usage:
+    with capture_run(run_id="analysis-<patient_id>") as sink:
+        crew.run(...)
+    sink.getvalue()   # everything that run printed
+
+asyncio.to_thread copies the current context, so starting the capture inside
+the thread function (or before to_thread) scopes it correctly.
+"""
+
+import os
+import sys
+import datetime
+import threading
+from io import StringIO
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Directory for per-run log files (CREW_RUN_LOG_DIR); shared crew_debug.log stays the fallback
+CREW_RUN_LOG_DIR = os.getenv("CREW_RUN_LOG_DIR", "crew_logs")
+SHARED_DEBUG_LOG = "crew_debug.log"
+
+
+class RunSink:
+    """Buffer (and optional log file) collecting everything one run prints."""
+
+    def __init__(self, run_id: str, log_path: Optional[str] = None):
+        self.run_id = run_id
+        self.log_path = log_path
+        self._buffer = StringIO()
+        self._lock = threading.Lock()
+        self._log_file = None
+        if log_path:
+            os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+            self._log_file = open(log_path, "a", encoding="utf-8")
+
+    def write(self, text: str) -> int:
+        with self._lock:
+            self._buffer.write(text)
+            if self._log_file:
+                self._log_file.write(text)
+        return len(text)
+
+    def flush(self):
+        with self._lock:
+            if self._log_file:
+                self._log_file.flush()
+
+    def getvalue(self) -> str:
+        with self._lock:
+            return self._buffer.getvalue()
+
+    def close(self):
+        with self._lock:
+            if self._log_file:
+                self._log_file.close()
+                self._log_file = None
+
+
+_current_sink: ContextVar[Optional[RunSink]] = ContextVar("crew_run_sink", default=None)
+
+
+class _RoutingStream:
+    """sys.stdout/sys.stderr stand-in that writes to the active run's sink."""
+
+    def __init__(self, original):
+        self._original = original
+
+    def write(self, text):
+        sink = _current_sink.get()
+        if sink is not None:
+            return sink.write(text)
+        return self._original.write(text)
+
+    def flush(self):
+        sink = _current_sink.get()
+        if sink is not None:
+            sink.flush()
+        else:
+            self._original.flush()
+
+    def isatty(self):
+        # Keeps rich/CrewAI from emitting terminal control codes into run buffers
+        if _current_sink.get() is not None:
+            return False
+        return self._original.isatty()
+
+    def __getattr__(self, name):
+        return getattr(self._original, name)
+
+
+_install_lock = threading.Lock()
+
+
+def install_routing_streams():
+    """Replace sys.stdout/sys.stderr with routing streams (idempotent)."""
+    with _install_lock:
+        if not isinstance(sys.stdout, _RoutingStream):
+            sys.stdout = _RoutingStream(sys.stdout)
+        if not isinstance(sys.stderr, _RoutingStream):
+            sys.stderr = _RoutingStream(sys.stderr)
+
+
+def current_sink() -> Optional[RunSink]:
+    return _current_sink.get()
+
+
+@contextmanager
+def capture_run(run_id: str, log_to_file: bool = False):
+    """
+    Route everything printed in this context (and threads started via
+    asyncio.to_thread from it) to a run-scoped sink.
+    """
+    install_routing_streams()
+    log_path = os.path.join(CREW_RUN_LOG_DIR, f"{run_id}.log") if log_to_file else None
+    sink = RunSink(run_id, log_path)
+    token = _current_sink.set(sink)
+    try:
+        yield sink
+    finally:
+        _current_sink.reset(token)
+        sink.close()
+
+
+def console_write(msg: str):
+    """
+    Status line that must stay visible (rate-limit waits, cooldowns).
+    Goes to the run sink when capturing, otherwise straight to the real stdout
+    (bypassing rich's stdout proxy, as crew.py did with sys.__stdout__).
+    """
+    sink = _current_sink.get()
+    if sink is not None:
+        sink.write(msg)
+    else:
+        sys.__stdout__.write(msg)
+
+
+def log_debug(msg: str):
+    """Timestamped debug line into the active run's sink, or the shared crew_debug.log."""
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    line = f"[{timestamp}] {msg}\n"
+    sink = _current_sink.get()
+    if sink is not None:
+        sink.write(line)
+        return
+    with open(SHARED_DEBUG_LOG, "a") as f:
+        f.write(line)
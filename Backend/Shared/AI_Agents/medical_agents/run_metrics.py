@@ -0,0 +1,197 @@
+"""
+Per-run instrumentation for crew executions.
+
+A RunMetricsCollector is bound to the current context (ContextVar) by whoever
+starts a run; crew.py, the tools and the retry wrapper report into it through
+the module-level helpers below, which are no-ops when nothing is collecting.
+
+Collected per run:
+  - start/end timestamps and duration of every stage
+  - retry count, rate-limit backoff seconds and inter-step cooldown seconds
+  - HITL wait seconds (time spent polling for patient answers)
+  - prompt/completion tokens per model and an estimated cost
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+# USD per 1M tokens (prompt, completion). Override with MODEL_PRICING_JSON env var.
+MODEL_PRICING_PER_MTOK = {
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+}
+if os.getenv("MODEL_PRICING_JSON"):
+    MODEL_PRICING_PER_MTOK.update({k: tuple(v) for k, v in json.loads(os.getenv("MODEL_PRICING_JSON")).items()})
+
+
+def _normalize_model(model: str) -> str:
+    """'openai/llama-3.1-8b-instant' -> 'llama-3.1-8b-instant'."""
+    return (model or "unknown").split("/")[-1]
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = MODEL_PRICING_PER_MTOK.get(_normalize_model(model), (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class RunMetricsCollector:
+    def __init__(self, run_id: str = None):
+        self.run_id = run_id
+        self.started_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self._t0 = time.monotonic()
+        self._stage_t0: Dict[str, float] = {}
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.retry_count = 0
+        self.backoff_seconds = 0.0
+        self.cooldown_seconds = 0.0
+        self.hitl_wait_seconds = 0.0
+        self.hitl_questions = 0
+        self.token_usage: Dict[str, Dict[str, int]] = {}
+
+    def stage_started(self, stage: str):
+        self._stage_t0[stage] = time.monotonic()
+        self.stages[stage] = {
+            "started_at": datetime.utcnow().isoformat(),
+            "finished_at": None,
+            "duration_s": None,
+            "retries": 0,
+        }
+
+    def stage_completed(self, stage: str):
+        entry = self.stages.setdefault(stage, {"started_at": None, "retries": 0})
+        entry["finished_at"] = datetime.utcnow().isoformat()
+        if stage in self._stage_t0:
+            entry["duration_s"] = round(time.monotonic() - self._stage_t0[stage], 3)
+
+    def record_retry(self, stage: str, wait_seconds: float):
+        self.retry_count += 1
+        self.backoff_seconds += wait_seconds
+        if stage in self.stages:
+            self.stages[stage]["retries"] += 1
+
+    def record_cooldown(self, seconds: float):
+        self.cooldown_seconds += seconds
+
+    def record_hitl_wait(self, seconds: float):
+        self.hitl_questions += 1
+        self.hitl_wait_seconds += seconds
+
+    def record_tokens(self, model: str, prompt_tokens: int, completion_tokens: int):
+        entry = self.token_usage.setdefault(
+            _normalize_model(model),
+            {"prompt_tokens": 0, "completion_tokens": 0, "requests": 0},
+        )
+        entry["prompt_tokens"] += prompt_tokens or 0
+        entry["completion_tokens"] += completion_tokens or 0
+        entry["requests"] += 1
+
+    def finish(self):
+        if self.finished_at is None:
+            self.finished_at = datetime.utcnow()
+
+    def to_dict(self) -> Dict[str, Any]:
+        self.finish()
+        prompt_tokens = sum(u["prompt_tokens"] for u in self.token_usage.values())
+        completion_tokens = sum(u["completion_tokens"] for u in self.token_usage.values())
+        cost = sum(
+            estimate_cost(model, u["prompt_tokens"], u["completion_tokens"])
+            for model, u in self.token_usage.items()
+        )
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat(),
+            "total_duration_s": round(time.monotonic() - self._t0, 3),
+            "stage_timings": self.stages,
+            "retry_count": self.retry_count,
+            "backoff_seconds": round(self.backoff_seconds, 3),
+            "cooldown_seconds": round(self.cooldown_seconds, 3),
+            "hitl_wait_seconds": round(self.hitl_wait_seconds, 3),
+            "hitl_questions": self.hitl_questions,
+            "token_usage": self.token_usage,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "estimated_cost_usd": round(cost, 6),
+        }
+
+
+_current_collector: ContextVar[Optional[RunMetricsCollector]] = ContextVar("crew_run_metrics", default=None)
+
+
+def current_metrics() -> Optional[RunMetricsCollector]:
+    return _current_collector.get()
+
+
+@contextmanager
+def collecting(collector: RunMetricsCollector):
+    token = _current_collector.set(collector)
+    try:
+        yield collector
+    finally:
+        collector.finish()
+        _current_collector.reset(token)
+
+
+# ---------------------------------------------------------------------------
+# Reporting helpers (no-ops when no collector is active)
+# ---------------------------------------------------------------------------
+
+def stage_started(stage: str):
+    collector = _current_collector.get()
+    if collector:
+        collector.stage_started(stage)
+
+
+def stage_completed(stage: str):
+    collector = _current_collector.get()
+    if collector:
+        collector.stage_completed(stage)
+
+
+def record_retry(stage: str, wait_seconds: float):
+    collector = _current_collector.get()
+    if collector:
+        collector.record_retry(stage, wait_seconds)
+
+
+def record_cooldown(seconds: float):
+    collector = _current_collector.get()
+    if collector:
+        collector.record_cooldown(seconds)
+
+
+def record_hitl_wait(seconds: float):
+    collector = _current_collector.get()
+    if collector:
+        collector.record_hitl_wait(seconds)
+
+
+def record_tokens(model: str, prompt_tokens: int, completion_tokens: int):
+    collector = _current_collector.get()
+    if collector:
+        collector.record_tokens(model, prompt_tokens, completion_tokens)
+
+
+def record_crew_usage(crew_instance, crew_output):
+    """Pull token usage from a CrewOutput and attribute it to the crew's agent model."""
+    collector = _current_collector.get()
+    usage = getattr(crew_output, "token_usage", None)
+    if not collector or usage is None:
+        return
+    model = "unknown"
+    agents = getattr(crew_instance, "agents", None) or []
+    if agents and getattr(agents[0], "llm", None) is not None:
+        model = getattr(agents[0].llm, "model", "unknown")
+    collector.record_tokens(
+        model,
+        getattr(usage, "prompt_tokens", 0),
+        getattr(usage, "completion_tokens", 0),
+    )
@@ -0,0 +1,282 @@
+"""
+Deterministic daily-plan baseline from task_planning_kb.md.
+
+The task KB already spells out each condition's daily routine. This module
+parses it once per process into structured protocols (condition tag ->
+KB_BASELINE tasks per category + SMART_REMEDIATION hints) and builds the
+baseline of a patient's plan from the planning context in milliseconds,
+applying the KB's adaptive escalation rules that need no judgement
+(task cap for low compliance, medication reminders, alert follow-ups,
+monitoring priority for high risk).
+
+The LLM planner is then only needed for what the KB cannot decide: easier
+alternatives for tasks the patient repeatedly skipped (remediation deltas),
+or a full plan when no protocol matches the patient's conditions.
+"""
+
+import os
+import re
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("task_kb")
+
+KB_FILENAME = "task_planning_kb.md"
+
+# Plan size (the planner prompt asks for 10-14; KB escalation: 8-10 for low compliance)
+KB_PLAN_MAX_TASKS = 12
+KB_PLAN_MAX_TASKS_LOW_COMPLIANCE = 9
+LOW_COMPLIANCE_RATE = 50
+LOW_ADHERENCE_RATE = 80
+
+# Section title (minus "Daily Protocol" / "Protocol") -> condition tag, where they differ
+_TAG_ALIASES = {
+    "POST_SURGERY_RECOVERY": "POST_SURGERY",
+}
+
+# Keywords matched in known_conditions when the patient has no condition tags
+_TAG_KEYWORDS = {
+    "HYPERTENSION": ["hypertension", "high blood pressure"],
+    "DIABETES_TYPE_2": ["diabetes", "high blood sugar"],
+    "POST_SURGERY": ["surgery", "post-op", "operative"],
+    "HEART_FAILURE": ["heart failure", "chf"],
+}
+
+# KB bullets that are measurements/checks rather than routines
+_MONITORING_RE = re.compile(r"\b(monitor|measure|check|weigh|reading|inspect)\b", re.IGNORECASE)
+
+# Category guess for free-text remediation hints
+_TEXT_CATEGORIES = [
+    ("Medication", ("medication", "pill", "dose")),
+    ("Monitoring", ("check", "weigh", "measure", "photo", "record")),
+    ("Exercise", ("walk", "stretch", "exercise", "move", "breathing")),
+    ("Diet", ("snack", "diet", "eat", "vegetable", "meal", "banana")),
+]
+
+_SECTION_RE = re.compile(r"^## (.+)$", re.MULTILINE)
+_BLOCK_RE = re.compile(r"^\*\*(.+?)\*\*:?\s*(.*)$")
+
+# KB "Active Alerts Present" rule, keyed by alert type keyword
+_ALERT_TASKS = [
+    (("bp", "blood pressure", "hypertens"), "Take blood pressure reading now and record"),
+    (("sugar", "glucose"), "Check blood sugar level now"),
+    (("heart", "hr", "pulse"), "Rest for 10 minutes, then check pulse"),
+]
+
+
+def _task(category: str, description: str, source: str = "KB_BASELINE", priority: str = "NORMAL") -> Dict[str, str]:
+    return {"category": category, "task_description": description, "source": source, "priority": priority}
+
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+
+class ConditionProtocol:
+    def __init__(self, tag: str, title: str):
+        self.tag = tag
+        self.title = title
+        self.baseline: List[Dict[str, str]] = []      # KB_BASELINE tasks, in KB order
+        self.remediation: List[str] = []              # SMART_REMEDIATION hints
+
+    def __repr__(self):
+        return f"ConditionProtocol({self.tag}, {len(self.baseline)} baseline, {len(self.remediation)} remediation)"
+
+
+def _tag_for_title(title: str) -> str:
+    name = re.sub(r"\b(daily\s+)?protocol\b", "", title, flags=re.IGNORECASE).strip()
+    tag = re.sub(r"[^A-Z0-9]+", "_", name.upper()).strip("_")
+    return _TAG_ALIASES.get(tag, tag)
+
+
+def _category_for_block(label: str) -> Optional[str]:
+    label = label.lower()
+    if "non-compliant" in label or "smart_remediation" in label:
+        return "REMEDIATION"
+    for category in ("Diet", "Exercise", "Lifestyle"):
+        if label.startswith(category.lower()):
+            return category
+    if label.startswith("sleep"):
+        return "Lifestyle"
+    return None
+
+
+def _category_for_text(text: str) -> str:
+    text = text.lower()
+    for category, keywords in _TEXT_CATEGORIES:
+        if any(kw in text for kw in keywords):
+            return category
+    return "Lifestyle"
+
+
+def parse_task_kb(text: str) -> Dict[str, ConditionProtocol]:
+    """Condition protocols from the KB markdown, keyed by condition tag. Non-condition sections are skipped."""
+    protocols: Dict[str, ConditionProtocol] = {}
+    headers = list(_SECTION_RE.finditer(text))
+    for i, header in enumerate(headers):
+        body = text[header.end():headers[i + 1].start() if i + 1 < len(headers) else len(text)]
+        if "**Condition**" not in body:
+            continue  # e.g. "Adaptive Escalation Protocols" — applied as rules below
+
+        title = header.group(1).strip()
+        protocol = ConditionProtocol(_tag_for_title(title), title)
+        category = None
+        for line in body.splitlines():
+            line = line.strip()
+            block = _BLOCK_RE.match(line)
+            if block:
+                label, inline = block.group(1), block.group(2).strip()
+                category = _category_for_block(label)
+                if category and category != "REMEDIATION" and inline:
+                    protocol.baseline.append(_task(category, inline))  # e.g. **Sleep**: 7-8 hours
+                continue
+            if not line.startswith("- ") or category is None:
+                continue
+            item = line[2:].strip()
+            if category == "REMEDIATION":
+                protocol.remediation.append(item)
+            elif _MONITORING_RE.search(item):
+                protocol.baseline.append(_task("Monitoring", item))
+            else:
+                protocol.baseline.append(_task(category, item))
+        protocols[protocol.tag] = protocol
+    return protocols
+
+
+_protocols: Optional[Dict[str, ConditionProtocol]] = None
+_load_lock = threading.Lock()
+
+
+def load_protocols() -> Dict[str, ConditionProtocol]:
+    """Parsed task KB, loaded once per process ({} if the file is missing)."""
+    global _protocols
+    if _protocols is None:
+        with _load_lock:
+            if _protocols is None:
+                kb_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), KB_FILENAME)
+                try:
+                    with open(kb_path, "r", encoding="utf-8") as f:
+                        _protocols = parse_task_kb(f.read())
+                    logger.info(f"Loaded {len(_protocols)} task protocols from {KB_FILENAME}")
+                except OSError as e:
+                    logger.error(f"Task knowledge base not readable at {kb_path}: {e}")
+                    _protocols = {}
+    return _protocols
+
+
+# ---------------------------------------------------------------------------
+# Plan building
+# ---------------------------------------------------------------------------
+
+def patient_tags(context: Dict[str, Any]) -> List[str]:
+    """The patient's condition tags (or tags inferred from known_conditions if untagged)."""
+    profile = context.get("profile") or {}
+    tags = [str(t).upper() for t in profile.get("condition_tags") or []]
+    if not tags:
+        conditions = str(profile.get("known_conditions") or "").lower()
+        tags = [tag for tag, keywords in _TAG_KEYWORDS.items() if any(kw in conditions for kw in keywords)]
+    return list(dict.fromkeys(tags))
+
+
+def matching_protocols(context: Dict[str, Any]) -> List[ConditionProtocol]:
+    protocols = load_protocols()
+    return [protocols[tag] for tag in patient_tags(context) if tag in protocols]
+
+
+def _interleave(protocols: List[ConditionProtocol]) -> List[Dict[str, str]]:
+    """
+    Round-robin across categories, and within a category across protocols, so
+    a cap keeps every category and condition represented. Drops duplicates.
+    """
+    by_category: Dict[str, List[List[Dict[str, str]]]] = {}
+    for protocol in protocols:
+        for task in protocol.baseline:
+            queues = by_category.setdefault(task["category"], [[] for _ in protocols])
+            queues[protocols.index(protocol)].append(task)
+
+    category_queues = []
+    for queues in by_category.values():
+        merged = []
+        while any(queues):
+            for queue in queues:
+                if queue:
+                    merged.append(queue.pop(0))
+        category_queues.append(merged)
+
+    seen = set()
+    plan = []
+    while any(category_queues):
+        for queue in category_queues:
+            if queue:
+                task = queue.pop(0)
+                key = task["task_description"].lower()
+                if key not in seen:
+                    seen.add(key)
+                    plan.append(dict(task))
+    return plan
+
+
+def baseline_plan(context: Dict[str, Any]) -> Optional[List[Dict[str, str]]]:
+    """
+    Deterministic plan from the KB for the planning context, or None when some
+    condition has no protocol (the LLM planner must then build the whole plan).
+    """
+    tags = patient_tags(context)
+    protocols = matching_protocols(context)
+    if not protocols or len(protocols) < len(tags):
+        return None
+
+    compliance = (context.get("compliance") or {}).get("overall_7d_rate")
+    risk = context.get("risk") or {}
+    adherence = context.get("medication_adherence") or {}
+    high_risk = risk.get("level") in ("HIGH", "CRITICAL") or risk.get("trend") == "deteriorating"
+
+    # Escalation rules first: they must survive the cap
+    escalations = []
+    for alert in context.get("active_alerts") or []:
+        alert_type = str(alert.get("type") if isinstance(alert, dict) else alert).lower()
+        for keywords, description in _ALERT_TASKS:
+            if any(kw in alert_type for kw in keywords):
+                escalations.append(_task("Monitoring", description, "SMART_REMEDIATION", "CRITICAL"))
+                break
+    if adherence.get("rate_7d") is not None and adherence["rate_7d"] < LOW_ADHERENCE_RATE:
+        for medication in (adherence.get("missed_medications") or [])[:2]:
+            escalations.append(_task("Medication", f"Set phone alarm for {medication} and take it at the prescribed time", "KB_BASELINE", "HIGH"))
+        escalations.append(_task("Medication", "Check pill organizer in the morning", "KB_BASELINE", "HIGH"))
+    if high_risk:
+        escalations.append(_task("Lifestyle", "Contact caretaker/nurse if you feel unwell", "KB_BASELINE", "CRITICAL"))
+
+    baseline = _interleave(protocols)
+    for task in baseline:
+        if task["category"] == "Monitoring" and high_risk:
+            task["priority"] = "HIGH"
+
+    low_compliance = compliance is not None and compliance < LOW_COMPLIANCE_RATE
+    cap = KB_PLAN_MAX_TASKS_LOW_COMPLIANCE if low_compliance else KB_PLAN_MAX_TASKS
+    seen = {t["task_description"].lower() for t in escalations}
+    plan = list(escalations)
+    for task in baseline:
+        if len(plan) >= cap:
+            break
+        if task["task_description"].lower() not in seen:
+            plan.append(task)
+    return plan
+
+
+def remediation_hints(context: Dict[str, Any]) -> List[str]:
+    """The KB's SMART_REMEDIATION hints for the patient's conditions."""
+    hints = []
+    for protocol in matching_protocols(context):
+        hints.extend(protocol.remediation)
+    return hints
+
+
+def remediation_fallback(context: Dict[str, Any]) -> List[Dict[str, str]]:
+    """KB-only remediation tasks (used when the LLM remediation step yields nothing)."""
+    tasks = []
+    for hint in remediation_hints(context):
+        match = re.search(r'with "(.+?)"', hint) or re.match(r'Add "(.+?)"', hint)
+        if match:
+            tasks.append(_task(_category_for_text(match.group(1)), match.group(1), "SMART_REMEDIATION"))
+    return tasks[:3]
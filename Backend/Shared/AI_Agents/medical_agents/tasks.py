@@ -1,13 +1,13 @@
-from crewai import Task
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
+from medical_agents.templates import TaskTemplate, PATIENT_DATA_SLOT
 
 # --- Pydantic Output Models ---
 
 class RiskAssessmentOutput(BaseModel):
     risk_level: str = Field(..., description="Overall risk level: LOW, MODERATE, HIGH, or CRITICAL")
     risk_score: int = Field(..., description="Risk score from 0-100")
-    justification: Dict[str, Any] = Field(..., description="Detailed medical justification as a nested object (Patient Context, History, Symptoms, Vitals Evaluation, Potential Diagnosis)")
+    justification: Union[Dict[str, Any], str] = Field(..., description="Detailed medical justification, as a nested object (Patient Context, History, Symptoms, Vitals Evaluation, Potential Diagnosis) or a report string")
     requires_immediate_action: bool = Field(..., description="True if immediate medical intervention is needed")
 
 class ActionDecisionOutput(BaseModel):
@@ -15,208 +15,272 @@ class ActionDecisionOutput(BaseModel):
     urgency: str = Field(..., description="Normal | High | Critical")
     doctor_note: str = Field(..., description="Concise briefing note for the doctor")
 
-class MedicalTasks:
-    def analyze_vitals_task(self, agent, patient_data):
-        return Task(
-            description=(
-                f"Analyze the following patient vital signs: {patient_data}. "
-                "Compare the [CURRENT VITALS] against standard medical thresholds (e.g., BP 120/80, HR 60-100). "
-                "CRITICAL INSTRUCTIONS:\n"
-                "1. USE ONLY THE NUMBERS PROVIDED IN [CURRENT VITALS]. DO NOT HALLUCINATE OR INVENT VALUES.\n"
-                "2. IF A FIELD IS EMPTY, MISSING, OR 'None', STATE 'NOT PROVIDED'. DO NOT GUESS A NUMBER.\n"
-                "3. If [RECENT VITALS HISTORY] is empty or [] or None, ASSUME NO HISTORY. Do NOT invent a history.\n"
-                "4. Compare current vitals to history ONLY IF history exists.\n"
-                "5. Determine severity (NORMAL, WARNING, CRITICAL) based strictly on the provided numbers.\n"
-                "6. CHECK [CURRENT MEDICATIONS]. If provided, consider their effect on vitals (e.g., 'BP controlled by medication')."
-            ),
-            expected_output=(
-                "A JSON object containing:\n"
-                "{\n"
-                "  \"status\": \"NORMAL | WARNING | CRITICAL\",\n"
-                "  \"abnormal_findings\": [\"High BP\", \"Rising HR Trend\"],\n"
-                "  \"trend_analysis\": \"Brief summary... OR 'No history available'\",\n"
-                "  \"requires_symptom_check\": true\n"
-                "}"
-            ),
-            agent=agent
-        )
+class PlannedTask(BaseModel):
+    category: str = Field(..., description="Diet | Exercise | Lifestyle | Medication | Monitoring")
+    task_description: str = Field(..., description="Specific, actionable task in simple language")
+    source: str = Field("AI_GENERATED", description="KB_BASELINE | AI_GENERATED | SMART_REMEDIATION")
+    priority: str = Field("NORMAL", description="LOW | NORMAL | HIGH | CRITICAL")
+
+# --- Task Templates ---
+# Static prompt text, built once per process. crew.py appends run context to
+# the bound Task's description, never to the template.
+# `output_schema` is what medical_agents.output_parsing parses the task's raw
+# output into (strict JSON first, json_repair only as fallback): a JSON object
+# for risk assessment / decision, a JSON array of PlannedTask for the planners.
+# Not bound via output_pydantic: CrewAI's converter would spend an extra LLM
+# call on every malformed output.
+
+VITAL_ANALYSIS_TASK = TaskTemplate(
+    "vital_analysis",
+    description=(
+        f"Analyze the following patient vital signs: {PATIENT_DATA_SLOT}. "
+        "Compare the [CURRENT VITALS] against standard medical thresholds (e.g., BP 120/80, HR 60-100). "
+        "CRITICAL INSTRUCTIONS:\n"
+        "1. USE ONLY THE NUMBERS PROVIDED IN [CURRENT VITALS]. DO NOT HALLUCINATE OR INVENT VALUES.\n"
+        "2. IF A FIELD IS EMPTY, MISSING, OR 'None', STATE 'NOT PROVIDED'. DO NOT GUESS A NUMBER.\n"
+        "3. If [RECENT VITALS HISTORY] is empty or [] or None, ASSUME NO HISTORY. Do NOT invent a history.\n"
+        "4. Compare current vitals to history ONLY IF history exists.\n"
+        "5. Determine severity (NORMAL, WARNING, CRITICAL) based strictly on the provided numbers.\n"
+        "6. CHECK [CURRENT MEDICATIONS]. If provided, consider their effect on vitals (e.g., 'BP controlled by medication')."
+    ),
+    expected_output=(
+        "A JSON object containing:\n"
+        "{\n"
+        "  \"status\": \"NORMAL | WARNING | CRITICAL\",\n"
+        "  \"abnormal_findings\": [\"High BP\", \"Rising HR Trend\"],\n"
+        "  \"trend_analysis\": \"Brief summary... OR 'No history available'\",\n"
+        "  \"requires_symptom_check\": true\n"
+        "}"
+    ),
+)
+
 ##"6. EVEN IF VITALS ARE CRITICAL: You may ask up to 2 high-priority questions to confirm the severity or nature of the symptoms. Do not incorrectly assume you have 'enough info' just because vitals are high."
 
+SYMPTOM_INQUIRY_TASK = TaskTemplate(
+    "symptom_inquiry",
+    description=(
+        "Based on the vital analysis and any initial symptoms reported, determine if further questions are needed. "
+        "CRITICAL INSTRUCTIONS:\n"
+        "1. CHECK [CONTEXT - VITAL ANALYSIS]. If status is 'NORMAL' AND input reported_symptoms is 'None' or empty, DO NOT ASK QUESTIONS.\n"
+        "2. If no questions needed, return \"symptom_summary\": \"No symptoms reported, patient healthy\".\n"
+        "3. SEARCH KNOWLEDGE BASE: You MUST use the 'Search Knowledge Base' tool to find the specific protocol for the patient's symptoms (e.g., 'Chest Pain', 'Hypertension').\n"
+        "4. CHECK CONTEXT FIRST (CRITICAL): Before asking a question from the protocol, CHECK [ORIGINAL PATIENT DATA & HISTORY].\n"
+        "   - If the patient has already provided the answer (e.g., 'known_conditions' answers 'history'), DO NOT ASK IT AGAIN.\n"
+        "   - If the patient's 'reported_symptoms' already covers the question (e.g., they said 'chest pain', don't ask 'do you have chest pain'), DO NOT ASK IT AGAIN.\n"
+        "5. ASK ONLY NEW QUESTIONS: Formulate your questions based ONLY on missing information from the protocol.\n"
+        "6. You MUST ask at least 1-2 clarifying questions using the 'ask_patient' tool if there is ANY ambiguity or risk. Do not assume you know enough.\n"
+        "7. MANDATORY TOOL USAGE: If the patient has ANY reported symptoms or ABNORMAL vitals, you MUST use the 'ask_patient' tool to verify the severity. Do NOT just summarize. Ask a question.\n"
+        "8. Even if you know the medical diagnosis or you have enough context about the patient to do analysis still you must ask atleast 3 relevant question to user for gathering more context regarding the known medical condition from the knowledge base.\n"
+        "9. DO NOT return the final JSON until you have either asked the necessary questions or confirmed the patient is healthy.\n"
+        "10. CRITICAL: You MUST use proper JSON tool calling format. NEVER use <function>...</function> XML tags. If you use XML tags to call tools, the system will crash."
+    ),
+    expected_output=(
+        "A JSON object containing:\n"
+        "{\n"
+        "  \"symptom_summary\": \"Patient reports...\",\n"
+        "  \"follow_up_questions_asked\": [\"Question 1\", \"Question 2\"],\n"
+        "  \"patient_responses\": [\"Answer 1\", \"Answer 2\"]\n"
+        "}"
+    ),
+)
+
+CONTEXT_AGGREGATION_TASK = TaskTemplate(
+    "context_aggregation",
+    description=(
+        "Combine the vital analysis and the symptom inquiry results into a cohesive clinical summary. "
+        "Highlight correlations between vitals and symptoms. "
+        "Identify key risk factors present in the data.\n"
+        "CRITICAL: \n"
+        "1. If Symptom Inquiry says 'No symptoms' and Vitals are 'NORMAL', the aggregate summary MUST reflect a healthy patient.\n"
+        "2. If Vital Analysis says 'NOT PROVIDED' or 'MISSING', DO NOT INVENT VITALS in the summary.\n"
+        "3. REVIEW [CURRENT MEDICATIONS]. explicitly mention them in the clinical summary if relevant (e.g. 'Patient on Metformin').\n"
+        "4. NUMERIC ACCURACY: You MUST exactly copy ANY numbers (like Blood Pressure, Blood Sugar, Heart Rate) from [ORIGINAL PATIENT DATA & HISTORY]. NEVER guess, swap, or invent numbers."
+    ),
+    expected_output=(
+        "A JSON object containing:\n"
+        "{\n"
+        "  \"clinical_summary\": \"Evaluated BP with...\",\n"
+        "  \"key_risk_factors\": [\"Hypertension\", \"Angina risk\"],\n"
+        "  \"trend\": \"Stable | Worsening | Improving\"\n"
+        "}"
+    ),
+)
+
+RISK_ASSESSMENT_TASK = TaskTemplate(
+    "risk_assessment",
+    description=(
+        "Evaluate the aggregated clinical context and determine the overall health risk. "
+        "Assign a risk level (LOW, MODERATE, HIGH, CRITICAL) and provide a medical justification.\n"
+        "CRITICAL INSTRUCTIONS:\n"
+        "1. IF [CONTEXT - CLINICAL AGGREGATION] says 'No symptoms' AND vitals are 'NORMAL', Risk Level MUST be 'LOW'.\n"
+        "2. DO NOT HALLUCINATE RISKS. If vitals are benign, do not claim 'hypertensive crisis'.\n"
+        "3. Consistency Check: If BP is < 130/85, Risk CANNOT be HIGH unless severe symptoms exist.\n"
+        "5. CHECK [MEDICATION ADHERENCE LOG] & [DAILY LIFESTYLE TASKS]:\n"
+        "   - If 'Status: MISSED', 'SKIPPED' or 'OVERDUE' appears for critical meds, Risk Level MUST INCREASE.\n"
+        "   - If 'REFUSED BY CARETAKER' appears, flag this as a compliance issue.\n"
+        "6. Your 'justification' MUST be a COMPREHENSIVE MEDICAL REPORT. It must explicitly include:\n"
+        "   - Patient Context (Age/Gender)\n"
+        "   - Known Medical History (from input)\n"
+        "   - Current Medications (from input)\n"
+        "   - Adherence Check (Missed Meds/Tasks?)\n"
+        "   - Reported Symptoms (detailed)\n"
+        "   - Vital Signs Evaluation (MUST EXACTLY MATCH the numbers provided in [ORIGINAL PATIENT DATA & HISTORY]. DO NOT INVENT OR SWAP NUMBERS.)\n"
+        "   - Potential Conditions/Diagnosis (e.g., 'Suspected Hypertensive Urgency')\n"
+        "   - Rationale for Risk Level.\n"
+        "7. OUTPUT FORMAT RULE: You MUST return ONLY the raw JSON object. Do NOT wrap it in markdown codes (like ```json). Ensure all strings use \\n for newlines. Valid JSON only."
+    ),
+    expected_output=(
+        "A JSON object containing:\n"
+        "{\n"
+        "  \"risk_level\": \"HIGH\",\n"
+        "  \"risk_score\": 85,\n"
+        "  \"justification\": \"Patient has critical BP and specific symptoms... Missed Metformin dose...\",\n"
+        "  \"requires_immediate_action\": true\n"
+        "}"
+    ),
+    output_schema=RiskAssessmentOutput,
+)
+
+DECISION_ACTION_TASK = TaskTemplate(
+    "decision_action",
+    description=(
+        "Based on the risk assessment, decide the next operational step. "
+        "Draft a detailed note for the doctor if the action is to alert or escalate. "
+        "CRITICAL: The 'doctor_note' must be a standalone Briefing. It must include:\n"
+        "1. Patient Identity & Demographics\n"
+        "2. Chief Complaint & Symptoms\n"
+        "3. Medical History & Adherence: YOU MUST EXPLICITLY LIST any medications marked as 'MISSED', 'SKIPPED', or 'OVERDUE' from the logs. Do not just say 'inconsistent adherence'. Also list REFUSED tasks.\n"
+        "4. EXACT VITALS: You MUST exactly copy the Blood Pressure, Heart Rate, and Blood Sugar values from [ORIGINAL PATIENT DATA & HISTORY]. DO NOT HALLUCINATE OR SWAP NUMBERS.\n"
+        "5. Suspected Condition & Recommended Action.\n"
+        "6. OUTPUT FORMAT RULE: You MUST return ONLY the raw JSON object. Do NOT wrap it in markdown codes (like ```json). Ensure all strings use \\n for newlines. Valid JSON only."
+    ),
+    expected_output=(
+        "A JSON object containing:\n"
+        "{\n"
+        "  \"action\": \"MONITOR | ALERT_DOCTOR | EMERGENCY\",\n"
+        "  \"urgency\": \"Normal | High | Critical\",\n"
+        "  \"doctor_note\": \"Patient presenting with... Recommended action...\"\n"
+        "}"
+    ),
+    output_schema=ActionDecisionOutput,
+)
+
+DAILY_PLAN_TASK = TaskTemplate(
+    "daily_plan",
+    description=(
+        f"Create a PERSONALIZED daily health plan for the following patient.\n\n"
+        f"PATIENT CONTEXT (JSON):\n{PATIENT_DATA_SLOT}\n\n"
+
+        "=== CONTEXT SECTIONS EXPLAINED ===\n"
+        "- profile: basic info (age, gender, conditions, medications, symptoms)\n"
+        "- compliance: 7-day task completion rates broken down by category (Diet, Exercise, Lifestyle, etc.)\n"
+        "- repeatedly_skipped_tasks: tasks the patient skipped 2+ days — these need EASIER alternatives\n"
+        "- medication_adherence: 7-day adherence rate + names of missed medications\n"
+        "- vitals_summary: latest vital readings + any anomalies in the past 7 days\n"
+        "- risk: current risk score (0-100), level (LOW/MODERATE/HIGH/CRITICAL), and trend\n"
+        "- active_alerts: unresolved medical alerts that need attention\n"
+        "- health_score: composite health score (0-100) and trend direction\n"
+        "- recent_recommendations: unreviewed doctor recommendations\n\n"
+
+        "=== ADAPTIVE PLANNING RULES (FOLLOW STRICTLY) ===\n"
+        "1. SEARCH the Task Knowledge Base for protocols matching the patient's known_conditions. "
+        "Include baseline tasks from these protocols — these are the foundation.\n"
+        "2. CHECK compliance.by_category: If a category has completion_rate < 50%, simplify tasks in that category "
+        "(e.g., 'Walk 30 mins' → 'Walk 10 mins', 'Full DASH diet lunch' → 'Replace one snack with fruit').\n"
+        "3. CHECK repeatedly_skipped_tasks: For each item, generate an EASIER alternative in the same category. "
+        "Mark these as source='SMART_REMEDIATION' and add a brief '(adjusted from: <original>)' note.\n"
+        "4. CHECK medication_adherence: If rate_7d < 80%, add 1-2 medication reminder tasks "
+        "(e.g., 'Set alarm and take [med_name] at prescribed time'). Mark priority='HIGH'.\n"
+        "5. CHECK vitals_summary.anomalies: If anomalies exist, add specific monitoring tasks "
+        "(e.g., 'Measure and record blood pressure after breakfast'). Mark priority='HIGH'.\n"
+        "6. CHECK risk.level: If HIGH or CRITICAL, add safety/monitoring tasks and mark them priority='CRITICAL'. "
+        "Also reduce physical intensity (light stretching instead of brisk walks).\n"
+        "7. CHECK active_alerts: For each unresolved alert, add a relevant task (e.g., BP alert → 'Take BP reading now').\n"
+        "8. If health_score.trend is 'improving', you may include 1-2 progressive/challenging tasks to maintain momentum.\n\n"
+
+        "=== OUTPUT FORMAT ===\n"
+        "Generate 10 to 14 tasks. Return ONLY a JSON array of objects.\n"
+        "Each object MUST have:\n"
+        "- category: 'Diet' | 'Exercise' | 'Lifestyle' | 'Medication' | 'Monitoring'\n"
+        "- task_description: specific, actionable task in simple language\n"
+        "- source: 'KB_BASELINE' (from knowledge base protocols) | 'AI_GENERATED' (personalized) | 'SMART_REMEDIATION' (easier alternative for skipped task)\n"
+        "- priority: 'LOW' | 'NORMAL' | 'HIGH' | 'CRITICAL'\n\n"
+
+        "Example:\n"
+        '[{"category": "Diet", "task_description": "Eat a low-sodium lunch with vegetables", "source": "KB_BASELINE", "priority": "NORMAL"}, '
+        '{"category": "Exercise", "task_description": "Take a gentle 10-minute walk after lunch (adjusted from: Walk 30 mins)", "source": "SMART_REMEDIATION", "priority": "NORMAL"}, '
+        '{"category": "Monitoring", "task_description": "Measure blood pressure and record reading", "source": "AI_GENERATED", "priority": "HIGH"}]'
+    ),
+    expected_output=(
+        "A JSON array containing 10-14 task objects:\n"
+        "[\n"
+        "  {\n"
+        "    \"category\": \"Diet | Exercise | Lifestyle | Medication | Monitoring\",\n"
+        "    \"task_description\": \"Specific action item\",\n"
+        "    \"source\": \"KB_BASELINE | AI_GENERATED | SMART_REMEDIATION\",\n"
+        "    \"priority\": \"LOW | NORMAL | HIGH | CRITICAL\"\n"
+        "  }\n"
+        "]"
+    ),
+    output_schema=PlannedTask,
+)
+
+REMEDIATION_TASK = TaskTemplate(
+    "remediation",
+    description=(
+        f"The patient's daily plan is already built from the knowledge base. Your ONLY job is to replace the tasks "
+        f"the patient keeps skipping with easier alternatives.\n\n"
+        f"REMEDIATION CONTEXT (JSON):\n{PATIENT_DATA_SLOT}\n\n"
+
+        "=== CONTEXT SECTIONS EXPLAINED ===\n"
+        "- repeatedly_skipped_tasks: tasks the patient skipped 2+ days — each needs ONE easier alternative\n"
+        "- compliance_by_category: 7-day completion rates per category\n"
+        "- risk_level: current risk level (HIGH/CRITICAL → keep physical intensity low)\n"
+        "- kb_remediation_hints: the knowledge base's suggested easier alternatives for the patient's conditions\n"
+        "- planned_tasks: tasks already in today's plan — DO NOT repeat them\n\n"
+
+        "=== RULES ===\n"
+        "1. For each item in repeatedly_skipped_tasks, produce exactly one easier, smaller task in the same category.\n"
+        "2. Prefer the kb_remediation_hints when one fits the skipped task.\n"
+        "3. Append '(adjusted from: <original>)' to each task_description.\n"
+        "4. source MUST be 'SMART_REMEDIATION'. priority: 'NORMAL', or 'HIGH' for Medication/Monitoring tasks.\n\n"
+
+        "=== OUTPUT FORMAT ===\n"
+        "Return ONLY a JSON array of objects with category, task_description, source, priority. No prose, no markdown."
+    ),
+    expected_output=(
+        "A JSON array with one object per skipped task:\n"
+        "[\n"
+        "  {\n"
+        "    \"category\": \"Diet | Exercise | Lifestyle | Medication | Monitoring\",\n"
+        "    \"task_description\": \"Easier action item (adjusted from: original)\",\n"
+        "    \"source\": \"SMART_REMEDIATION\",\n"
+        "    \"priority\": \"NORMAL | HIGH\"\n"
+        "  }\n"
+        "]"
+    ),
+    output_schema=PlannedTask,
+)
+
+class MedicalTasks:
+    # Thin per-run binders over the module-level templates (kept for crew.py and the MCP server)
+    def analyze_vitals_task(self, agent, patient_data):
+        return VITAL_ANALYSIS_TASK.bind(agent, patient_data=patient_data)
 
     def symptom_inquiry_task(self, agent, context):
-        return Task(
-            description=(
-                "Based on the vital analysis and any initial symptoms reported, determine if further questions are needed. "
-                "CRITICAL INSTRUCTIONS:\n"
-                "1. CHECK [CONTEXT - VITAL ANALYSIS]. If status is 'NORMAL' AND input reported_symptoms is 'None' or empty, DO NOT ASK QUESTIONS.\n"
-                "2. If no questions needed, return \"symptom_summary\": \"No symptoms reported, patient healthy\".\n"
-                "3. SEARCH KNOWLEDGE BASE: You MUST use the 'Search Knowledge Base' tool to find the specific protocol for the patient's symptoms (e.g., 'Chest Pain', 'Hypertension').\n"
-                "4. CHECK CONTEXT FIRST (CRITICAL): Before asking a question from the protocol, CHECK [ORIGINAL PATIENT DATA & HISTORY].\n"
-                "   - If the patient has already provided the answer (e.g., 'known_conditions' answers 'history'), DO NOT ASK IT AGAIN.\n"
-                "   - If the patient's 'reported_symptoms' already covers the question (e.g., they said 'chest pain', don't ask 'do you have chest pain'), DO NOT ASK IT AGAIN.\n"
-                "5. ASK ONLY NEW QUESTIONS: Formulate your questions based ONLY on missing information from the protocol.\n"
-                "6. You MUST ask at least 1-2 clarifying questions using the 'ask_patient' tool if there is ANY ambiguity or risk. Do not assume you know enough.\n"
-                "7. MANDATORY TOOL USAGE: If the patient has ANY reported symptoms or ABNORMAL vitals, you MUST use the 'ask_patient' tool to verify the severity. Do NOT just summarize. Ask a question.\n"
-                "8. Even if you know the medical diagnosis or you have enough context about the patient to do analysis still you must ask atleast 3 relevant question to user for gathering more context regarding the known medical condition from the knowledge base.\n"
-                "9. DO NOT return the final JSON until you have either asked the necessary questions or confirmed the patient is healthy.\n"
-                "10. CRITICAL: You MUST use proper JSON tool calling format. NEVER use <function>...</function> XML tags. If you use XML tags to call tools, the system will crash."
-                
-            ),
-            expected_output=(
-                "A JSON object containing:\n"
-                "{\n"
-                "  \"symptom_summary\": \"Patient reports...\",\n"
-                "  \"follow_up_questions_asked\": [\"Question 1\", \"Question 2\"],\n"
-                "  \"patient_responses\": [\"Answer 1\", \"Answer 2\"]\n"
-                "}"
-            ),
-            agent=agent,
-            context=context # Explicitly pass context from vital analysis
-        )
+        return SYMPTOM_INQUIRY_TASK.bind(agent, context=context)  # Explicitly pass context from vital analysis
 
     def aggregate_context_task(self, agent, context):
-        return Task(
-            description=(
-                "Combine the vital analysis and the symptom inquiry results into a cohesive clinical summary. "
-                "Highlight correlations between vitals and symptoms. "
-                "Identify key risk factors present in the data.\n"
-                "CRITICAL: \n"
-                "1. If Symptom Inquiry says 'No symptoms' and Vitals are 'NORMAL', the aggregate summary MUST reflect a healthy patient.\n"
-                "2. If Vital Analysis says 'NOT PROVIDED' or 'MISSING', DO NOT INVENT VITALS in the summary.\n"
-                "3. REVIEW [CURRENT MEDICATIONS]. explicitly mention them in the clinical summary if relevant (e.g. 'Patient on Metformin').\n"
-                "4. NUMERIC ACCURACY: You MUST exactly copy ANY numbers (like Blood Pressure, Blood Sugar, Heart Rate) from [ORIGINAL PATIENT DATA & HISTORY]. NEVER guess, swap, or invent numbers."
-            ),
-            expected_output=(
-                "A JSON object containing:\n"
-                "{\n"
-                "  \"clinical_summary\": \"Evaluated BP with...\",\n"
-                "  \"key_risk_factors\": [\"Hypertension\", \"Angina risk\"],\n"
-                "  \"trend\": \"Stable | Worsening | Improving\"\n"
-                "}"
-            ),
-            agent=agent,
-            context=context
-        )
+        return CONTEXT_AGGREGATION_TASK.bind(agent, context=context)
 
     def assess_risk_task(self, agent, context):
-        return Task(
-            description=(
-                "Evaluate the aggregated clinical context and determine the overall health risk. "
-                "Assign a risk level (LOW, MODERATE, HIGH, CRITICAL) and provide a medical justification.\n"
-                "CRITICAL INSTRUCTIONS:\n"
-                "1. IF [CONTEXT - CLINICAL AGGREGATION] says 'No symptoms' AND vitals are 'NORMAL', Risk Level MUST be 'LOW'.\n"
-                "2. DO NOT HALLUCINATE RISKS. If vitals are benign, do not claim 'hypertensive crisis'.\n"
-                "3. Consistency Check: If BP is < 130/85, Risk CANNOT be HIGH unless severe symptoms exist.\n"
-                "5. CHECK [MEDICATION ADHERENCE LOG] & [DAILY LIFESTYLE TASKS]:\n"
-                "   - If 'Status: MISSED', 'SKIPPED' or 'OVERDUE' appears for critical meds, Risk Level MUST INCREASE.\n"
-                "   - If 'REFUSED BY CARETAKER' appears, flag this as a compliance issue.\n"
-                "6. Your 'justification' MUST be a COMPREHENSIVE MEDICAL REPORT. It must explicitly include:\n"
-                "   - Patient Context (Age/Gender)\n"
-                "   - Known Medical History (from input)\n"
-                "   - Current Medications (from input)\n"
-                "   - Adherence Check (Missed Meds/Tasks?)\n"
-                "   - Reported Symptoms (detailed)\n"
-                "   - Vital Signs Evaluation (MUST EXACTLY MATCH the numbers provided in [ORIGINAL PATIENT DATA & HISTORY]. DO NOT INVENT OR SWAP NUMBERS.)\n"
-                "   - Potential Conditions/Diagnosis (e.g., 'Suspected Hypertensive Urgency')\n"
-                "   - Rationale for Risk Level.\n"
-                "7. OUTPUT FORMAT RULE: You MUST return ONLY the raw JSON object. Do NOT wrap it in markdown codes (like ```json). Ensure all strings use \\n for newlines. Valid JSON only."
-            ),
-            expected_output=(
-                "A JSON object containing:\n"
-                "{\n"
-                "  \"risk_level\": \"HIGH\",\n"
-                "  \"risk_score\": 85,\n"
-                "  \"justification\": \"Patient has critical BP and specific symptoms... Missed Metformin dose...\",\n"
-                "  \"requires_immediate_action\": true\n"
-                "}"
-            ),
-            agent=agent,
-            context=context,
-            # output_pydantic=RiskAssessmentOutput # DISABLED: Processed by robust clean_json_string in main.py
-        )
+        return RISK_ASSESSMENT_TASK.bind(agent, context=context)
 
     def decide_action_task(self, agent, context):
-        return Task(
-            description=(
-                "Based on the risk assessment, decide the next operational step. "
-                "Draft a detailed note for the doctor if the action is to alert or escalate. "
-                "CRITICAL: The 'doctor_note' must be a standalone Briefing. It must include:\n"
-                "1. Patient Identity & Demographics\n"
-                "2. Chief Complaint & Symptoms\n"
-                "3. Medical History & Adherence: YOU MUST EXPLICITLY LIST any medications marked as 'MISSED', 'SKIPPED', or 'OVERDUE' from the logs. Do not just say 'inconsistent adherence'. Also list REFUSED tasks.\n"
-                "4. EXACT VITALS: You MUST exactly copy the Blood Pressure, Heart Rate, and Blood Sugar values from [ORIGINAL PATIENT DATA & HISTORY]. DO NOT HALLUCINATE OR SWAP NUMBERS.\n"
-                "5. Suspected Condition & Recommended Action.\n"
-                "6. OUTPUT FORMAT RULE: You MUST return ONLY the raw JSON object. Do NOT wrap it in markdown codes (like ```json). Ensure all strings use \\n for newlines. Valid JSON only."
-            ),
-            expected_output=(
-                "A JSON object containing:\n"
-                "{\n"
-                "  \"action\": \"MONITOR | ALERT_DOCTOR | EMERGENCY\",\n"
-                "  \"urgency\": \"Normal | High | Critical\",\n"
-                "  \"doctor_note\": \"Patient presenting with... Recommended action...\"\n"
-                "}"
-            ),
-            agent=agent,
-            context=context,
-            # output_pydantic=ActionDecisionOutput # DISABLED: Processed by robust clean_json_string in main.py
-        )
+        return DECISION_ACTION_TASK.bind(agent, context=context)
 
     def create_daily_plan_task(self, agent, patient_data):
-        return Task(
-            description=(
-                f"Create a PERSONALIZED daily health plan for the following patient.\n\n"
-                f"PATIENT CONTEXT (JSON):\n{patient_data}\n\n"
-
-                "=== CONTEXT SECTIONS EXPLAINED ===\n"
-                "- profile: basic info (age, gender, conditions, medications, symptoms)\n"
-                "- compliance: 7-day task completion rates broken down by category (Diet, Exercise, Lifestyle, etc.)\n"
-                "- repeatedly_skipped_tasks: tasks the patient skipped 2+ days — these need EASIER alternatives\n"
-                "- medication_adherence: 7-day adherence rate + names of missed medications\n"
-                "- vitals_summary: latest vital readings + any anomalies in the past 7 days\n"
-                "- risk: current risk score (0-100), level (LOW/MODERATE/HIGH/CRITICAL), and trend\n"
-                "- active_alerts: unresolved medical alerts that need attention\n"
-                "- health_score: composite health score (0-100) and trend direction\n"
-                "- recent_recommendations: unreviewed doctor recommendations\n\n"
-
-                "=== ADAPTIVE PLANNING RULES (FOLLOW STRICTLY) ===\n"
-                "1. SEARCH the Task Knowledge Base for protocols matching the patient's known_conditions. "
-                "Include baseline tasks from these protocols — these are the foundation.\n"
-                "2. CHECK compliance.by_category: If a category has completion_rate < 50%, simplify tasks in that category "
-                "(e.g., 'Walk 30 mins' → 'Walk 10 mins', 'Full DASH diet lunch' → 'Replace one snack with fruit').\n"
-                "3. CHECK repeatedly_skipped_tasks: For each item, generate an EASIER alternative in the same category. "
-                "Mark these as source='SMART_REMEDIATION' and add a brief '(adjusted from: <original>)' note.\n"
-                "4. CHECK medication_adherence: If rate_7d < 80%, add 1-2 medication reminder tasks "
-                "(e.g., 'Set alarm and take [med_name] at prescribed time'). Mark priority='HIGH'.\n"
-                "5. CHECK vitals_summary.anomalies: If anomalies exist, add specific monitoring tasks "
-                "(e.g., 'Measure and record blood pressure after breakfast'). Mark priority='HIGH'.\n"
-                "6. CHECK risk.level: If HIGH or CRITICAL, add safety/monitoring tasks and mark them priority='CRITICAL'. "
-                "Also reduce physical intensity (light stretching instead of brisk walks).\n"
-                "7. CHECK active_alerts: For each unresolved alert, add a relevant task (e.g., BP alert → 'Take BP reading now').\n"
-                "8. If health_score.trend is 'improving', you may include 1-2 progressive/challenging tasks to maintain momentum.\n\n"
-
-                "=== OUTPUT FORMAT ===\n"
-                "Generate 10 to 14 tasks. Return ONLY a JSON array of objects.\n"
-                "Each object MUST have:\n"
-                "- category: 'Diet' | 'Exercise' | 'Lifestyle' | 'Medication' | 'Monitoring'\n"
-                "- task_description: specific, actionable task in simple language\n"
-                "- source: 'KB_BASELINE' (from knowledge base protocols) | 'AI_GENERATED' (personalized) | 'SMART_REMEDIATION' (easier alternative for skipped task)\n"
-                "- priority: 'LOW' | 'NORMAL' | 'HIGH' | 'CRITICAL'\n\n"
-
-                "Example:\n"
-                '[{"category": "Diet", "task_description": "Eat a low-sodium lunch with vegetables", "source": "KB_BASELINE", "priority": "NORMAL"}, '
-                '{"category": "Exercise", "task_description": "Take a gentle 10-minute walk after lunch (adjusted from: Walk 30 mins)", "source": "SMART_REMEDIATION", "priority": "NORMAL"}, '
-                '{"category": "Monitoring", "task_description": "Measure blood pressure and record reading", "source": "AI_GENERATED", "priority": "HIGH"}]'
-            ),
-            expected_output=(
-                "A JSON array containing 10-14 task objects:\n"
-                "[\n"
-                "  {\n"
-                "    \"category\": \"Diet | Exercise | Lifestyle | Medication | Monitoring\",\n"
-                "    \"task_description\": \"Specific action item\",\n"
-                "    \"source\": \"KB_BASELINE | AI_GENERATED | SMART_REMEDIATION\",\n"
-                "    \"priority\": \"LOW | NORMAL | HIGH | CRITICAL\"\n"
-                "  }\n"
-                "]"
-            ),
-            agent=agent
-        )
+        return DAILY_PLAN_TASK.bind(agent, patient_data=patient_data)
+
+    def create_remediation_task(self, agent, remediation_data):
+        return REMEDIATION_TASK.bind(agent, patient_data=remediation_data)
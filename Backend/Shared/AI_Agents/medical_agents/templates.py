@@ -0,0 +1,107 @@
+"""
+Immutable agent and task templates.
+
+CrewAI Agents and Tasks carry per-run state (task output, the agent executor,
+tool usage counters, descriptions that crew.py extends with run context), so
+one instance cannot be shared between concurrent runs. Everything that
+*defines* them can be: role/goal/backstory, the LLM client, flags, stateless
+tools and the static prompt text of each task.
+
+Templates hold exactly that, frozen, and are built once per process when
+agents.py / tasks.py are imported (process-mode crew workers pay this during
+warm-up). Per run, bind() creates the Agent/Task with only the run-specific
+pieces: patient_id-bound tools, patient data, context tasks.
+"""
+
+import threading
+from types import MappingProxyType
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+from crewai import Agent, Task
+
+# Placeholder replaced by the run's patient data in task descriptions. Plain
+# str.replace, not str.format: the prompts contain literal JSON braces.
+PATIENT_DATA_SLOT = "<<PATIENT_DATA>>"
+
+
+class AgentTemplate:
+    """
+    Frozen Agent definition.
+
+    shared_tools    callable returning stateless tool instances; resolved once
+                    per process on first bind and reused by every run (a
+                    failed load is retried on the next bind)
+    tool_factories  callables (patient_id) -> tool, for per-run stateful tools
+    """
+
+    __slots__ = ("name", "spec", "_shared_tools_factory", "_tool_factories", "_shared_tools", "_lock")
+
+    def __init__(
+        self,
+        name: str,
+        shared_tools: Optional[Callable[[], List[Any]]] = None,
+        tool_factories: Sequence[Callable[[Optional[str]], Any]] = (),
+        **spec,
+    ):
+        self.name = name
+        self.spec = MappingProxyType(dict(spec))
+        self._shared_tools_factory = shared_tools
+        self._tool_factories = tuple(tool_factories)
+        self._shared_tools: Optional[tuple] = None
+        self._lock = threading.Lock()
+
+    def variant(self, name: str, **overrides) -> "AgentTemplate":
+        """A new template differing only in `overrides` (e.g. degraded LLM)."""
+        spec = dict(self.spec)
+        shared_tools = overrides.pop("shared_tools", self._shared_tools_factory)
+        tool_factories = overrides.pop("tool_factories", self._tool_factories)
+        spec.update(overrides)
+        return AgentTemplate(name, shared_tools=shared_tools, tool_factories=tool_factories, **spec)
+
+    def shared_tools(self) -> tuple:
+        if self._shared_tools is None:
+            with self._lock:
+                if self._shared_tools is None:
+                    if self._shared_tools_factory is None:
+                        self._shared_tools = ()
+                    else:
+                        try:
+                            self._shared_tools = tuple(self._shared_tools_factory())
+                        except Exception as e:
+                            print(f"❌ CRITICAL ERROR: Failed to load Tools for {self.name}. Details: {e}")
+                            return ()
+        return self._shared_tools
+
+    def bind(self, patient_id: Optional[str] = None, **overrides) -> Agent:
+        """Create this run's Agent. Shared tools are reused, per-run tools built for `patient_id`."""
+        tools = [factory(patient_id) for factory in self._tool_factories] + list(self.shared_tools())
+        kwargs = dict(self.spec)
+        if tools or self._shared_tools_factory is not None or self._tool_factories:
+            kwargs["tools"] = tools
+        kwargs.update(overrides)
+        return Agent(**kwargs)
+
+
+class TaskTemplate:
+    """Frozen Task definition; `output_schema` is the Pydantic model its output is parsed into."""
+
+    __slots__ = ("name", "description", "expected_output", "output_schema")
+
+    def __init__(self, name: str, description: str, expected_output: str, output_schema: type = None):
+        self.name = name
+        self.description = description
+        self.expected_output = expected_output
+        self.output_schema = output_schema
+
+    def bind(self, agent: Agent, context: Optional[Iterable[Task]] = None, patient_data: Any = None) -> Task:
+        description = self.description
+        if PATIENT_DATA_SLOT in description:
+            description = description.replace(PATIENT_DATA_SLOT, str(patient_data))
+        kwargs = {
+            "description": description,
+            "expected_output": self.expected_output,
+            "agent": agent,
+        }
+        if context is not None:
+            kwargs["context"] = list(context)
+        return Task(**kwargs)
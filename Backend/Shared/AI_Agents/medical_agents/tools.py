@@ -15,6 +15,7 @@ import uuid
 # Import DB session and model
 from database.session import SessionLocal
 from database.models import AgentInteraction
+from medical_agents import run_metrics
 
 from pydantic import BaseModel, Field
 
@@ -79,6 +80,7 @@ class AskPatientTool(BaseTool):
 
         # 3. Poll for Answer
         max_retries = 150 # 5 minutes
+        wait_started = time.monotonic()
         
         print(f"[AskPatientTool] Waiting for answer for Interaction {interaction_id}...")
         for _ in range(max_retries):
@@ -88,10 +90,12 @@ class AskPatientTool(BaseTool):
                 record = db.query(AgentInteraction).filter(AgentInteraction.id == interaction_id).first()
                 if record and record.status == "ANSWERED" and record.answer:
                     print(f"[AskPatientTool] Answer received: {record.answer}")
+                    run_metrics.record_hitl_wait(time.monotonic() - wait_started)
                     return record.answer
             finally:
                 db.close()
         
+        run_metrics.record_hitl_wait(time.monotonic() - wait_started)
         return "Timeout: Patient did not provide an answer in time. Proceed with available information."
 
 from medical_agents.rag_manager import RAGManager
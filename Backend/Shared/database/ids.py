@@ -0,0 +1,78 @@
+"""
+Time-ordered primary keys (UUIDv7, RFC 9562).
+
+uuid4 keys land at random positions of a B-tree index, so every insert into
+a big, hot table touches (and often splits) a random leaf page. uuid7 puts a
+48-bit Unix millisecond timestamp in the high bits. New keys are appended at
+the right edge of the index, the way a sequence would be, and the column
+type stays UUID.
+
+Layout: unix_ts_ms (48) | ver=7 (4) | rand_a (12) | var=0b10 (2) | rand_b (62)
+
+Within one process, keys are strictly increasing. rand_a is a counter that
+starts at a random value each millisecond (RFC 9562 method 1). If the counter
+overflows, or the clock steps back, the key borrows the next millisecond.
+
+uuid7_at(ts) builds a key for a historical timestamp (used when re-keying
+existing rows; see scripts/rekey_uuid7.py). uuid7 itself takes no arguments,
+so it can be a SQLAlchemy column default.
+"""
+
+import os
+import time
+import uuid
+import threading
+from datetime import datetime, timedelta, timezone
+
+_EPOCH = datetime(1970, 1, 1)
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def _unix_ms(at: datetime) -> int:
+    """Milliseconds since the epoch; naive datetimes are taken as UTC (as stored in the DB)."""
+    if at.tzinfo is not None:
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    return (at - _EPOCH) // timedelta(milliseconds=1)
+
+
+def _pack(unix_ms: int, rand_a: int) -> uuid.UUID:
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    value = (
+        (unix_ms & ((1 << 48) - 1)) << 80
+        | 0x7 << 76
+        | (rand_a & 0xFFF) << 64
+        | 0b10 << 62
+        | rand_b
+    )
+    return uuid.UUID(int=value)
+
+
+def uuid7() -> uuid.UUID:
+    """A new time-ordered UUID for now (monotonic per process)."""
+    global _last_ms, _counter
+
+    with _lock:
+        unix_ms = time.time_ns() // 1_000_000
+        if unix_ms > _last_ms:
+            # Random start in the lower half leaves room for many keys in this millisecond
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        else:
+            unix_ms = _last_ms
+            _counter += 1
+            if _counter > 0xFFF:
+                unix_ms += 1
+                _counter = 0
+        _last_ms = unix_ms
+        return _pack(unix_ms, _counter)
+
+
+def uuid7_at(at: datetime) -> uuid.UUID:
+    """A uuid7 for a past (or future) timestamp; random within that millisecond."""
+    return _pack(_unix_ms(at), int.from_bytes(os.urandom(2), "big"))
+
+
+def uuid7_time(value: uuid.UUID) -> datetime:
+    """The (naive UTC) creation time embedded in a uuid7."""
+    return _EPOCH + timedelta(milliseconds=value.int >> 80)
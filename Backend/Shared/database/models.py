@@ -1,9 +1,10 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, JSON, Boolean, Enum
+from sqlalchemy import Column, String, Integer, Float, Date, DateTime, ForeignKey, JSON, Boolean, Enum, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
 from sqlalchemy.orm import relationship as sa_relationship
 from database.session import Base
+from database.ids import uuid7
 import enum
 
 
@@ -61,7 +62,7 @@ class Patient(Base):
     
 class monitoring_logs(Base):
     __tablename__ = "monitoring_logs"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)  # time-ordered: high insert rate
     patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.id"), nullable=False)
     blood_pressure = Column(String, nullable=False)
     heart_rate = Column(String, nullable=False)
@@ -141,7 +142,7 @@ class CaretakerPatientLink(Base):
 
 class MedicationLog(Base):
     __tablename__ = "medication_logs"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)  # time-ordered: high insert rate
     patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.id"), nullable=False)
     medicine_name = Column(String, nullable=False)
     scheduled_time = Column(DateTime, nullable=False) # The theoretical time
@@ -179,7 +180,7 @@ class DeviceToken(Base):
 
 class NotificationLog(Base):
     __tablename__ = "notification_logs"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)  # time-ordered: high insert rate
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
     event_type = Column(String, nullable=False) # e.g. HEALTH_CHECKUP_COMPLETED, EMERGENCY_CRITICAL
     payload = Column(JSONB, nullable=True)
@@ -221,18 +222,171 @@ class MonitoringResponse(Base):
     answer_value = Column(String, nullable=False) # The raw answer (e.g. "YES", "BAD", "WORSE")
     notes = Column(String, nullable=True) # Optional additional context
     evaluated_severity = Column(String, nullable=True) # GREEN, YELLOW, ORANGE, RED (assessed by AI/rules)
+    severity_rule_version = Column(String, nullable=True) # severity_rules.json version that produced evaluated_severity
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     
     question = sa_relationship("MonitoringQuestion", back_populates="responses")
     responder = sa_relationship("User")
 
 class TelemetryLog(Base):
+    """Raw vitals; range-partitioned by day on timestamp (see Platform/telemetry_partitions.py)."""
     __tablename__ = "telemetry_logs"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    __table_args__ = (
+        # Newest reading per patient (/telemetry/latest, window loads): one index probe
+        Index("ix_telemetry_logs_patient_id_timestamp", "patient_id", "timestamp"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)  # time-ordered: high insert rate
     patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.id"), nullable=False, index=True)
     heart_rate = Column(Integer, nullable=True)
     blood_pressure = Column(String, nullable=True)
     spo2 = Column(Integer, nullable=True)
-    timestamp = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    # Part of the primary key: a partitioned table's keys must include the partition column
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow, index=True)
     
     patient = sa_relationship("Patient")
+
+class AnalysisRunMetric(Base):
+    """One row per analysis crew run: stage timings, retries, HITL waits, tokens and cost."""
+    __tablename__ = "analysis_run_metrics"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.id"), nullable=False, index=True)
+    run_id = Column(String, nullable=False, index=True)
+    executor = Column(String, nullable=True) # thread, process
+    status = Column(String, nullable=False) # COMPLETED, FAILED
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    total_duration_s = Column(Float, nullable=True)
+    stage_timings = Column(JSONB, nullable=True) # {stage: {started_at, finished_at, duration_s, retries}}
+    retry_count = Column(Integer, default=0)
+    backoff_seconds = Column(Float, default=0.0)
+    cooldown_seconds = Column(Float, default=0.0)
+    hitl_wait_seconds = Column(Float, default=0.0)
+    hitl_questions = Column(Integer, default=0)
+    token_usage = Column(JSONB, nullable=True) # {model: {prompt_tokens, completion_tokens, requests}}
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    estimated_cost_usd = Column(Float, default=0.0)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    patient = sa_relationship("Patient")
+
+class LLMTokenLedger(Base):
+    """Daily LLM token consumption per patient and feature (ANALYSIS, PLANNING, MONITORING)."""
+    __tablename__ = "llm_token_ledger"
+    __table_args__ = (
+        UniqueConstraint("patient_id", "feature", "day", name="uq_llm_token_ledger_patient_feature_day"),
+    )
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.id"), nullable=False, index=True)
+    feature = Column(String, nullable=False)
+    day = Column(Date, nullable=False, index=True) # UTC day
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    total_tokens = Column(Integer, nullable=False, default=0)
+    requests = Column(Integer, nullable=False, default=0)
+    estimated_cost_usd = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    patient = sa_relationship("Patient")
+
+
+class DailyPlan(Base):
+    """One generated daily plan per patient and day, keyed by a hash of the planning context for reuse."""
+    __tablename__ = "daily_plans"
+    __table_args__ = (
+        UniqueConstraint("patient_id", "plan_date", name="uq_daily_plans_patient_date"),
+    )
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.id"), nullable=False, index=True)
+    plan_date = Column(Date, nullable=False)
+    context_hash = Column(String(64), nullable=False, index=True)
+    source = Column(String, nullable=False, default="PLANNER")  # PLANNER | REUSED
+    reused_from_id = Column(UUID(as_uuid=True), ForeignKey("daily_plans.id", ondelete="SET NULL"), nullable=True)
+    tasks = Column(JSONB, nullable=False)  # Planned task dicts (category, task_description, source, priority)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    patient = sa_relationship("Patient")
+
+
+class PlanGenerationJob(Base):
+    """Background daily-plan generation, one row per patient and day (re-queued on regenerate or retry)."""
+    __tablename__ = "plan_generation_jobs"
+    __table_args__ = (
+        UniqueConstraint("patient_id", "plan_date", name="uq_plan_generation_jobs_patient_date"),
+    )
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.id"), nullable=False, index=True)
+    plan_date = Column(Date, nullable=False)
+    kind = Column(String, nullable=False, default="GENERATE")  # GENERATE | REGENERATE
+    status = Column(String, nullable=False, default="QUEUED")  # QUEUED | RUNNING | COMPLETED | FAILED
+    requested_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    task_count = Column(Integer, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    patient = sa_relationship("Patient")
+
+
+class SchedulerLease(Base):
+    """Which process currently runs the periodic jobs (see Platform/scheduler_leader.py)."""
+    __tablename__ = "scheduler_leases"
+    name = Column(String, primary_key=True)  # lease name, e.g. "apscheduler"
+    holder = Column(String, nullable=True)  # "<hostname>:<pid>" of the leader, NULL when released
+    acquired_at = Column(DateTime, nullable=True)
+    renewed_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)
+
+
+class SchedulerJobRun(Base):
+    """One execution of a periodic job; the last COMPLETED run drives catch-up/skip on startup."""
+    __tablename__ = "scheduler_job_runs"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    job_id = Column(String, nullable=False, index=True)  # APScheduler job id, e.g. "generate_check_ins"
+    instance = Column(String, nullable=True)  # "<hostname>:<pid>" of the leader that ran it
+    status = Column(String, nullable=False, default="RUNNING")  # RUNNING | COMPLETED | FAILED
+    started_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    finished_at = Column(DateTime, nullable=True)
+    items_processed = Column(Integer, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+
+
+class AlertSuppression(Base):
+    """Cooldown of one (patient, alert class, severity) escalation (see Platform/alert_dedup.py)."""
+    __tablename__ = "alert_suppressions"
+    patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.id"), primary_key=True)
+    alert_class = Column(String, primary_key=True)  # TELEMETRY | MONITORING
+    severity = Column(String, primary_key=True)  # ORANGE | RED
+    last_fired_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    suppressed_until = Column(DateTime, nullable=False)
+    suppressed_count = Column(Integer, nullable=False, default=0)  # repeats swallowed in the previous cooldown
+
+
+class TelemetryRollup(Base):
+    """Per-patient vitals aggregate for one time bucket (see Platform/telemetry_rollups.py)."""
+    __tablename__ = "telemetry_rollups"
+    patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.id"), primary_key=True)
+    resolution = Column(String, primary_key=True)  # 1m | 1h | 1d
+    bucket_start = Column(DateTime, primary_key=True)  # UTC, aligned to the resolution
+    readings = Column(Integer, nullable=False, default=0)
+    # Per vital: min / max / sum / count of the readings that reported it (mean = sum / count)
+    heart_rate_min = Column(Integer, nullable=True)
+    heart_rate_max = Column(Integer, nullable=True)
+    heart_rate_sum = Column(Float, nullable=False, default=0)
+    heart_rate_count = Column(Integer, nullable=False, default=0)
+    systolic_min = Column(Integer, nullable=True)
+    systolic_max = Column(Integer, nullable=True)
+    systolic_sum = Column(Float, nullable=False, default=0)
+    systolic_count = Column(Integer, nullable=False, default=0)
+    diastolic_min = Column(Integer, nullable=True)
+    diastolic_max = Column(Integer, nullable=True)
+    diastolic_sum = Column(Float, nullable=False, default=0)
+    diastolic_count = Column(Integer, nullable=False, default=0)
+    spo2_min = Column(Integer, nullable=True)
+    spo2_max = Column(Integer, nullable=True)
+    spo2_sum = Column(Float, nullable=False, default=0)
+    spo2_count = Column(Integer, nullable=False, default=0)
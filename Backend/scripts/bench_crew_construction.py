@@ -0,0 +1,90 @@
+"""
+Microbenchmark: per-run Agent/Task construction cost for the full analysis crew.
+
+  legacy    every run rebuilds each agent from scratch, including fresh
+            KnowledgeBaseSearchTool / SearchTaskKnowledgeBaseTool instances
+            (what MedicalAgents did before the templates)
+  template  MedicalAgents / MedicalTasks binding the process-wide templates
+
+No LLM calls are made; only object construction is timed.
+
+Run: python scripts/bench_crew_construction.py [iterations]
+"""
+import sys
+import os
+import time
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Shared'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Shared', 'AI_Agents'))
+
+from crewai import Agent
+from medical_agents import agents as agent_defs
+from medical_agents.agents import MedicalAgents
+from medical_agents.tasks import MedicalTasks
+
+PATIENT_ID = "00000000-0000-0000-0000-000000000000"
+PATIENT_DATA = "[CURRENT VITALS]: BP 150/95, HR 98, SpO2 96, Blood Sugar 180"
+
+ANALYSIS_TEMPLATES = [
+    agent_defs.VITAL_ANALYSIS_AGENT,
+    agent_defs.SYMPTOM_INQUIRY_AGENT,
+    agent_defs.CONTEXT_AGGREGATION_AGENT,
+    agent_defs.RISK_ASSESSMENT_AGENT,
+    agent_defs.DECISION_ACTION_AGENT,
+]
+
+
+def _legacy_agent(template):
+    kwargs = dict(template.spec)
+    tools = [factory(PATIENT_ID) for factory in template._tool_factories]
+    if template._shared_tools_factory is not None:
+        tools += template._shared_tools_factory()
+    if tools:
+        kwargs["tools"] = tools
+    return Agent(**kwargs)
+
+
+def _build_tasks(agents):
+    tasks = MedicalTasks()
+    vital_analysis = tasks.analyze_vitals_task(agents[0], PATIENT_DATA)
+    symptom_inquiry = tasks.symptom_inquiry_task(agents[1], context=[vital_analysis])
+    aggregation = tasks.aggregate_context_task(agents[2], context=[vital_analysis, symptom_inquiry])
+    risk_assessment = tasks.assess_risk_task(agents[3], context=[aggregation])
+    tasks.decide_action_task(agents[4], context=[risk_assessment])
+
+
+def build_legacy():
+    _build_tasks([_legacy_agent(t) for t in ANALYSIS_TEMPLATES])
+
+
+def build_template():
+    medical_agents = MedicalAgents(patient_id=PATIENT_ID)
+    _build_tasks([
+        medical_agents.vital_analysis_agent(),
+        medical_agents.symptom_inquiry_agent(),
+        medical_agents.context_aggregation_agent(),
+        medical_agents.risk_assessment_agent(),
+        medical_agents.decision_action_agent(),
+    ])
+
+
+def bench(name, fn, iterations):
+    fn()  # warm-up (template path resolves its shared tools here)
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    p95 = samples[min(int(len(samples) * 0.95), len(samples) - 1)]
+    print(f"{name:<10} mean {statistics.mean(samples):8.2f} ms   median {statistics.median(samples):8.2f} ms   p95 {p95:8.2f} ms")
+    return statistics.mean(samples)
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print(f"🔧 Building the 5-agent analysis crew {iterations}x per strategy\n")
+    legacy = bench("legacy", build_legacy, iterations)
+    template = bench("template", build_template, iterations)
+    print(f"\n✅ Template binding saves {legacy - template:.2f} ms per run ({(1 - template / legacy) * 100:.1f}%)")
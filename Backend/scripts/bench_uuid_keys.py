@@ -0,0 +1,119 @@
+"""
+Benchmark: uuid4 vs uuid7 primary keys under a telemetry-like insert load.
+
+For each key kind this script:
+  - times key generation in Python,
+  - creates a temp table shaped like telemetry_logs with a UUID primary key,
+  - inserts `rows` rows in multi-row batches of `batch`, in time order, as
+    ingestion does,
+  - reports insert throughput, the primary key index size, and the table size.
+
+Random uuid4 keys split B-tree pages across the whole index, so the index
+ends up larger, with half-full leaves, and inserts slow down once it outgrows
+shared_buffers. uuid7 keys append at the right edge.
+
+Needs DATABASE_URL (temp tables only, nothing persists).
+
+Run: python scripts/bench_uuid_keys.py [rows] [batch]
+"""
+import sys
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Shared'))
+
+from sqlalchemy import text
+
+from database.session import engine
+from database.ids import uuid7
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+BATCH = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+
+KINDS = {"uuid4": uuid.uuid4, "uuid7": uuid7}
+
+
+def bench_generation(factory, n: int) -> float:
+    started = time.perf_counter()
+    for _ in range(n):
+        factory()
+    return n / (time.perf_counter() - started)
+
+
+def bench_inserts(conn, kind: str, factory) -> dict:
+    table = f"bench_keys_{kind}"
+    conn.execute(text(f"""
+        CREATE TEMP TABLE {table} (
+            id UUID PRIMARY KEY,
+            patient_id UUID NOT NULL,
+            heart_rate INTEGER,
+            blood_pressure VARCHAR,
+            spo2 INTEGER,
+            timestamp TIMESTAMP NOT NULL
+        )
+    """))
+    patients = [uuid.uuid4() for _ in range(100)]
+    start_ts = datetime.utcnow() - timedelta(days=1)
+    insert = text(
+        f"INSERT INTO {table} (id, patient_id, heart_rate, blood_pressure, spo2, timestamp) "
+        "VALUES (:id, :patient_id, :heart_rate, :blood_pressure, :spo2, :timestamp)"
+    )
+
+    batch_times = []
+    for offset in range(0, ROWS, BATCH):
+        rows = [
+            {
+                "id": factory(),
+                "patient_id": patients[i % len(patients)],
+                "heart_rate": 60 + i % 40,
+                "blood_pressure": "120/80",
+                "spo2": 95 + i % 5,
+                "timestamp": start_ts + timedelta(milliseconds=300 * i),
+            }
+            for i in range(offset, min(offset + BATCH, ROWS))
+        ]
+        started = time.perf_counter()
+        conn.execute(insert, rows)
+        conn.commit()
+        batch_times.append(time.perf_counter() - started)
+
+    sizes = conn.execute(text(
+        f"SELECT pg_relation_size('{table}_pkey'), pg_relation_size('{table}')"
+    )).one()
+    tail = batch_times[-max(1, len(batch_times) // 10):]
+    return {
+        "rows_per_sec": ROWS / sum(batch_times),
+        "tail_rows_per_sec": len(tail) * BATCH / sum(tail),  # last 10% of batches: the index is big by then
+        "index_mb": sizes[0] / 1024 / 1024,
+        "table_mb": sizes[1] / 1024 / 1024,
+    }
+
+
+def main():
+    print(f"Key generation ({ROWS} keys):")
+    for kind, factory in KINDS.items():
+        print(f"  {kind}: {bench_generation(factory, ROWS):,.0f} keys/s")
+
+    print(f"\nInserts ({ROWS} rows, batches of {BATCH}):")
+    results = {}
+    with engine.connect() as conn:
+        for kind, factory in KINDS.items():
+            results[kind] = bench_inserts(conn, kind, factory)
+            r = results[kind]
+            print(
+                f"  {kind}: {r['rows_per_sec']:,.0f} rows/s overall, "
+                f"{r['tail_rows_per_sec']:,.0f} rows/s in the last 10%, "
+                f"pkey index {r['index_mb']:.1f} MB, table {r['table_mb']:.1f} MB"
+            )
+
+    v4, v7 = results["uuid4"], results["uuid7"]
+    print(
+        f"\nuuid7 vs uuid4: {v7['rows_per_sec'] / v4['rows_per_sec']:.2f}x insert throughput, "
+        f"{v7['index_mb'] / v4['index_mb']:.2f}x index size"
+    )
+
+
+if __name__ == "__main__":
+    main()
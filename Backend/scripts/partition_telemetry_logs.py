@@ -0,0 +1,85 @@
+"""
+One-off migration: convert the plain telemetry_logs table into the daily
+range-partitioned layout (see Platform/telemetry_partitions.py).
+
+Runs in a single transaction, with telemetry_logs locked. Stop ingestion
+first, or expect writers to wait:
+  1. rename telemetry_logs (and its indexes) to *_legacy,
+  2. create the partitioned telemetry_logs, its DEFAULT partition, and one
+     partition per day from the oldest reading to the look-ahead horizon,
+  3. copy every row over and check the counts,
+  4. drop the legacy table (kept with --keep-legacy).
+
+Partitions past TELEMETRY_RETENTION_DAYS are archived by the next daily
+maintenance run, not here.
+
+Usage: python scripts/partition_telemetry_logs.py [--keep-legacy]
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add Shared and Platform directories to path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "Shared"))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "Platform"))
+
+from sqlalchemy import text
+
+from database.session import engine
+from database.models import TelemetryLog
+from telemetry_partitions import (
+    PARENT, DEFAULT_PARTITION, TELEMETRY_PARTITIONS_AHEAD_DAYS, is_partitioned, create_partition,
+)
+
+LEGACY = f"{PARENT}_legacy"
+COLUMNS = "id, patient_id, heart_rate, blood_pressure, spo2, timestamp"
+
+keep_legacy = "--keep-legacy" in sys.argv
+
+with engine.connect() as conn:
+    if is_partitioned(conn):
+        print(f"{PARENT} is already partitioned. Nothing to do.")
+        sys.exit(0)
+
+    print(f"Locking {PARENT}...")
+    conn.execute(text(f"LOCK TABLE {PARENT} IN ACCESS EXCLUSIVE MODE"))
+
+    print(f"Renaming {PARENT} -> {LEGACY}...")
+    conn.execute(text(f"ALTER TABLE {PARENT} RENAME TO {LEGACY}"))
+    indexes = conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE tablename = :table"), {"table": LEGACY}
+    ).scalars().all()
+    for index in indexes:
+        conn.execute(text(f'ALTER INDEX "{index}" RENAME TO "{index}_legacy"'))
+
+    print(f"Creating partitioned {PARENT}...")
+    TelemetryLog.__table__.create(conn)
+    conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT} DEFAULT"))
+
+    oldest = conn.execute(text(f"SELECT min(timestamp) FROM {LEGACY}")).scalar()
+    today = datetime.utcnow().date()
+    day = oldest.date() if oldest else today - timedelta(days=1)
+    last_day = today + timedelta(days=TELEMETRY_PARTITIONS_AHEAD_DAYS)
+    partitions = 0
+    while day <= last_day:
+        create_partition(conn, day)
+        partitions += 1
+        day += timedelta(days=1)
+    print(f"  {partitions} daily partitions created")
+
+    print("Copying rows...")
+    copied = conn.execute(text(f"INSERT INTO {PARENT} ({COLUMNS}) SELECT {COLUMNS} FROM {LEGACY}")).rowcount
+    legacy_rows = conn.execute(text(f"SELECT count(*) FROM {LEGACY}")).scalar()
+    if copied != legacy_rows:
+        conn.rollback()
+        print(f"Row count mismatch ({copied} copied, {legacy_rows} in {LEGACY}); rolled back.")
+        sys.exit(1)
+    print(f"  {copied} rows copied")
+
+    if not keep_legacy:
+        conn.execute(text(f"DROP TABLE {LEGACY}"))
+        print(f"Dropped {LEGACY}.")
+
+    conn.commit()
+
+print("telemetry_logs partitioned successfully.")
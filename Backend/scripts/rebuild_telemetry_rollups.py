@@ -0,0 +1,23 @@
+import sys
+import os
+
+# Add Shared and Platform directories to path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "Shared"))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "Platform"))
+
+from database.session import engine, SessionLocal
+from database.models import Base
+from telemetry_rollups import rebuild_rollups
+
+print("Creating telemetry_rollups if missing...")
+Base.metadata.create_all(engine)
+
+print("Rebuilding 1m / 1h / 1d rollups from telemetry_logs...")
+db = SessionLocal()
+try:
+    counts = rebuild_rollups(db)
+finally:
+    db.close()
+for resolution, buckets in counts.items():
+    print(f"  {resolution}: {buckets} buckets")
+print("Rollups rebuilt successfully.")
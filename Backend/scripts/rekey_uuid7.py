@@ -0,0 +1,85 @@
+"""
+Migration path for the uuid4 -> uuid7 primary keys (see Shared/database/ids.py).
+
+New rows get uuid7 keys from the model defaults, so no schema change is
+needed and old uuid4 rows remain valid. This script is optional: it re-keys
+the old rows so the whole index is time-ordered, not only the new tail.
+Each row gets uuid7_at(<its own timestamp>). Nothing references these ids
+by foreign key. Rows younger than --older-than-hours are left alone, because
+a client may still hold their ids: medication log ids are PUT back by the
+dashboards, and the reminders flow hands them to n8n.
+
+Runs in batches of --batch-size rows, committing each batch, then rebuilds
+the table's indexes with REINDEX ... CONCURRENTLY.
+
+telemetry_logs is skipped unless named. It is the biggest table to rewrite,
+and its uuid4 rows leave with their partitions under the retention policy.
+
+Usage:
+  python scripts/rekey_uuid7.py [table ...] [--batch-size N] [--older-than-hours H]
+  tables: notification_logs monitoring_logs medication_logs (default) telemetry_logs
+"""
+import sys
+import os
+import argparse
+import time
+
+# Add Shared directory to path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "Shared"))
+
+from datetime import datetime, timedelta
+from sqlalchemy import text
+
+from database.session import engine
+from database.ids import uuid7_at
+
+# table -> timestamp column the new key is derived from
+TABLES = {
+    "notification_logs": "created_at",
+    "monitoring_logs": "created_at",
+    "medication_logs": "created_at",
+    "telemetry_logs": "timestamp",
+}
+DEFAULT_TABLES = ["notification_logs", "monitoring_logs", "medication_logs"]
+
+parser = argparse.ArgumentParser(description="Re-key uuid4 primary keys as time-ordered uuid7")
+parser.add_argument("tables", nargs="*")
+parser.add_argument("--batch-size", type=int, default=5000)
+parser.add_argument("--older-than-hours", type=int, default=24)
+args = parser.parse_args()
+unknown = [table for table in args.tables if table not in TABLES]
+if unknown:
+    parser.error(f"unknown table(s): {', '.join(unknown)} (expected: {', '.join(TABLES)})")
+
+cutoff = datetime.utcnow() - timedelta(hours=args.older_than_hours)
+
+for table in args.tables or DEFAULT_TABLES:
+    ts_column = TABLES[table]
+    print(f"Re-keying {table} (rows before {cutoff:%Y-%m-%d %H:%M} UTC)...")
+    started = time.perf_counter()
+    total = 0
+    while True:
+        with engine.connect() as conn:
+            # Version nibble of the textual UUID: xxxxxxxx-xxxx-Vxxx-...
+            rows = conn.execute(text(f"""
+                SELECT id, {ts_column} AS ts FROM {table}
+                WHERE substr(id::text, 15, 1) <> '7' AND {ts_column} < :cutoff
+                ORDER BY {ts_column}
+                LIMIT :limit
+            """), {"cutoff": cutoff, "limit": args.batch_size}).all()
+            if not rows:
+                break
+            conn.execute(
+                text(f"UPDATE {table} SET id = :new_id WHERE id = :old_id AND {ts_column} = :ts"),
+                [{"new_id": uuid7_at(row.ts), "old_id": row.id, "ts": row.ts} for row in rows],
+            )
+            conn.commit()
+        total += len(rows)
+        print(f"  {total} rows")
+
+    print(f"  Rebuilding indexes of {table}...")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"REINDEX TABLE CONCURRENTLY {table}"))
+    print(f"  {table}: {total} rows re-keyed in {time.perf_counter() - started:.1f}s")
+
+print("Re-keying complete.")
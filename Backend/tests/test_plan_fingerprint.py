@@ -0,0 +1,41 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Platform'))
+
+# plan_fingerprint has no database imports: no mocks needed
+from plan_fingerprint import context_hash
+
+
+def _context(conditions, symptoms, medications):
+    """Profile fields shaped as analyze_patient stores them on Patient."""
+    return {
+        "profile": {
+            "age": 64,
+            "gender": "Male",
+            "known_conditions": {"known_conditions": conditions},
+            "condition_tags": [],
+            "current_medications": {"medications": medications} if medications else {},
+            "reported_symptoms": {"initial_symptoms": symptoms},
+        },
+    }
+
+
+def test_clinical_fields_change_hash():
+    base = context_hash(_context("diabetes", "", "metformin"))
+    assert base != context_hash(_context("heart failure", "", "metformin")), "known_conditions ignored"
+    assert base != context_hash(_context("diabetes", "chest pain", "metformin")), "reported_symptoms ignored"
+    assert base != context_hash(_context("diabetes", "", "warfarin")), "current_medications ignored"
+    print("✅ Changing conditions, symptoms or medications changes the hash.")
+
+
+def test_order_and_case_insensitive():
+    a = context_hash(_context("Diabetes, Hypertension", "dizzy;  tired", "Metformin 500mg, Lisinopril 10mg"))
+    b = context_hash(_context("hypertension,diabetes", "Tired; Dizzy", "lisinopril 10mg,metformin 500mg"))
+    assert a == b, "hash depends on order / case / spacing"
+    print("✅ Order, case and spacing do not change the hash.")
+
+
+if __name__ == "__main__":
+    test_clinical_fields_change_hash()
+    test_order_and_case_insensitive()
@@ -0,0 +1,37 @@
+import client from './client';
+
+const POLL_INTERVAL_MS = 2000;
+const POLL_TIMEOUT_MS = 5 * 60 * 1000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// POST a plan generate/regenerate endpoint and resolve with the patient's tasks.
+// A 200 already carries the tasks; a 202 carries a plan job that is polled
+// until it finishes, then today's tasks are fetched.
+export async function requestDailyPlan(path, patientId) {
+    const response = await client.post(path);
+    if (response.status !== 202) {
+        return response.data;
+    }
+
+    let job = response.data;
+    const deadline = Date.now() + POLL_TIMEOUT_MS;
+    while (job.status === 'QUEUED' || job.status === 'RUNNING') {
+        if (Date.now() > deadline) {
+            throw new Error('Plan generation is taking longer than expected. Please check back shortly.');
+        }
+        await sleep(POLL_INTERVAL_MS);
+        job = (await client.get(`/tasks/jobs/${job.job_id}`)).data;
+    }
+
+    if (job.status === 'FAILED') {
+        const error = new Error(job.error || 'Failed to generate plan.');
+        error.response = { data: { detail: job.error || 'Failed to generate plan. Please try again.' } };
+        throw error;
+    }
+
+    return (await client.get(`/tasks/${patientId}`)).data;
+}
+
+export const generateDailyPlan = (patientId) => requestDailyPlan(`/tasks/generate/${patientId}`, patientId);
+export const regenerateDailyPlan = (patientId) => requestDailyPlan(`/tasks/regenerate/${patientId}`, patientId);
@@ -7,6 +7,7 @@ import {
     Video, Mic, MicOff, Send, Phone, Clock, FileText, User, Sparkles, Utensils, ShieldCheck, Trash2, MessageSquare, PhoneCall, AlertTriangle
 } from 'lucide-react';
 import client from '../api/client';
+import { generateDailyPlan } from '../api/planJobs';
 import { useAuth } from '../contexts/AuthContext';
 import { cn } from '../utils/cn';
 import VideoCallModal from '../components/VideoCallModal';
@@ -396,8 +397,7 @@ const CaretakerAssessmentMonitor = () => {
     const generateAiPlan = async () => {
         setGeneratingPlan(true);
         try {
-            const response = await client.post(`/tasks/generate/${patientId}`);
-            setTasks(response.data); // Update with new tasks
+            setTasks(await generateDailyPlan(patientId)); // Update with new tasks
         } catch (error) {
             console.error("Failed to generate plan", error);
             const msg = error.response?.data?.detail || "Failed to generate plan. Please try again.";
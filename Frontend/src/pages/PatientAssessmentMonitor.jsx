@@ -8,6 +8,7 @@ import {
     MapPin, Search, X
 } from 'lucide-react';
 import client from '../api/client';
+import { generateDailyPlan } from '../api/planJobs';
 import { useAuth } from '../contexts/AuthContext';
 import { cn } from '../utils/cn';
 import VideoCallModal from '../components/VideoCallModal';
@@ -963,8 +964,7 @@ const PatientAssessmentMonitor = () => {
     const generateAiPlan = async () => {
         setGeneratingPlan(true);
         try {
-            const response = await client.post(`/tasks/generate/${patientId}`);
-            setTasks(response.data);
+            setTasks(await generateDailyPlan(patientId));
         } catch (error) {
             console.error("Failed to generate plan", error);
             const msg = error.response?.data?.detail || "Failed to generate plan. Please try again.";
@@ -3,6 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import { Activity, Calendar, Clock, AlertTriangle, CheckCircle, Plus, Copy, Sparkles, Utensils, Loader2, Pill, ShieldCheck } from 'lucide-react';
 import { format } from 'date-fns';
 import client from '../api/client';
+import { generateDailyPlan } from '../api/planJobs';
 import { cn } from '../utils/cn';
 import { useAuth } from '../contexts/AuthContext';
 import { getWsUrl } from '../utils/websocket';
@@ -62,8 +63,7 @@ const PatientDashboardPage = () => {
     const generateAiPlan = async () => {
         setGeneratingPlan(true);
         try {
-            const response = await client.post(`/tasks/generate/${patient.id}`);
-            setTasks(response.data); // Update with new tasks
+            setTasks(await generateDailyPlan(patient.id)); // Update with new tasks
         } catch (error) {
             console.error("Failed to generate plan", error);
             const msg = error.response?.data?.detail || "Failed to generate plan. Please try again.";